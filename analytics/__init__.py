@@ -0,0 +1,9 @@
+from .consumer_prices import consumer_price_engine
+from .producer_prices import producer_price_store
+from .land_efficiency import land_efficiency_store
+
+__all__ = [
+    "consumer_price_engine",
+    "producer_price_store",
+    "land_efficiency_store",
+]
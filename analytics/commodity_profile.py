@@ -0,0 +1,288 @@
+"""
+Per-commodity summaries behind /commodities/<fao_code>.
+
+A summary (global production by year, top producers, top exporters and
+importers, producer price distributions across countries, yearly trade
+volume) aggregates every country of a commodity, so it is precomputed into
+COMMODITY_SUMMARIES (see schema.sql) instead of being built per request.
+
+Each row carries a write counter: writes to the source tables bump the
+counter of their commodities in the same transaction (mark_stale_query,
+mark_row_stale_query, the bulk loader), and a refresh stores the counter it
+read next to the summary. Only summaries whose counter moved are
+recomputed, on the first read or in batch:
+
+    python -m analytics.commodity_profile            # stale summaries
+    python -m analytics.commodity_profile --all      # every commodity
+
+Read summaries are cached per commodity and write version (cache.py).
+"""
+import sys
+import time
+
+from cache import cached_result
+from database import execute_maintenance, fetch_query
+
+SUMMARY_TABLE = "commodity_summaries"
+
+# Commodity column of each table a summary is built from
+COMMODITY_COLUMNS = {
+    "trade_data_final": "item_code",
+    "production": "commodity_code",
+    "producer_prices": "commodity_id",
+}
+
+COMMODITY_PROFILE_TABLES = ("commodities", "countries") + tuple(COMMODITY_COLUMNS)
+
+TOP_PRODUCERS = 10
+TOP_TRADERS = 10
+
+# Commodities recomputed per statement by the batch refresh
+BATCH_SIZE = 50
+
+SECTIONS = ("production", "top_producers", "traders", "trade", "prices")
+
+_MARK_STALE = """
+    INSERT INTO COMMODITY_SUMMARIES (commodity_id, version)
+    SELECT fao_code, 1 FROM Commodities WHERE fao_code {condition}
+    ON CONFLICT (commodity_id) DO UPDATE SET version = COMMODITY_SUMMARIES.version + 1
+"""
+
+# The counter is read in the statement's snapshot: a write committed while
+# the summary is computed leaves summary_version behind version
+REFRESH_QUERY = """
+    INSERT INTO COMMODITY_SUMMARIES (commodity_id, version, summary, summary_version, computed_at)
+    SELECT
+        cm.fao_code,
+        COALESCE(cs.version, 0),
+        json_build_object(
+            -- Dünya üretimi: yıllık toplam (ton, units.py) ve üretici ülke sayısı
+            'production', (
+                SELECT COALESCE(json_agg(t ORDER BY t.year), '[]'::json)
+                FROM (
+                    SELECT year, SUM(quantity_tonnes) AS quantity_tonnes, COUNT(DISTINCT country_code) AS producers
+                    FROM Production
+                    WHERE commodity_code = cm.fao_code AND quantity_tonnes > 0
+                    GROUP BY year
+                ) t
+            ),
+            -- En büyük üreticiler: son üretim yılı, dünya payı ile
+            'top_producers', (
+                SELECT COALESCE(json_agg(t ORDER BY t.quantity_tonnes DESC), '[]'::json)
+                FROM (
+                    SELECT
+                        p.country_code AS country_id,
+                        p.year,
+                        p.quantity_tonnes,
+                        p.quantity_tonnes * 100.0 / NULLIF(SUM(p.quantity_tonnes) OVER (), 0) AS share
+                    FROM Production p
+                    INNER JOIN Countries c ON c.country_id = p.country_code
+                    WHERE p.commodity_code = cm.fao_code
+                      AND p.quantity_tonnes > 0
+                      AND p.year = (
+                          SELECT MAX(year) FROM Production
+                          WHERE commodity_code = cm.fao_code AND quantity_tonnes > 0
+                      )
+                    ORDER BY p.quantity_tonnes DESC
+                    LIMIT %(top_producers)s
+                ) t
+            ),
+            -- En büyük ihracatçı / ithalatçılar: son ticaret yılı, raporlayan ülke
+            'traders', (
+                SELECT COALESCE(json_agg(t ORDER BY t.trade_type, t.rank), '[]'::json)
+                FROM (
+                    SELECT
+                        tf.trade_type,
+                        tf.reporter_code AS country_id,
+                        tf.year,
+                        SUM(tf.val_1k_usd) AS value,
+                        SUM(tf.qty_tonnes) AS qty,
+                        ROW_NUMBER() OVER (
+                            PARTITION BY tf.trade_type ORDER BY SUM(tf.val_1k_usd) DESC NULLS LAST
+                        ) AS rank
+                    FROM Trade_Data_Final tf
+                    INNER JOIN Countries c ON c.country_id = tf.reporter_code
+                    WHERE tf.item_code = cm.fao_code
+                      AND tf.year = (SELECT MAX(year) FROM Trade_Data_Final WHERE item_code = cm.fao_code)
+                    GROUP BY tf.trade_type, tf.reporter_code, tf.year
+                ) t
+                WHERE t.rank <= %(top_traders)s
+            ),
+            -- Yıllık ticaret hacmi
+            'trade', (
+                SELECT COALESCE(json_agg(t ORDER BY t.year), '[]'::json)
+                FROM (
+                    SELECT
+                        year,
+                        SUM(qty_tonnes) FILTER (WHERE trade_type = 'Export') AS export_qty,
+                        SUM(qty_tonnes) FILTER (WHERE trade_type = 'Import') AS import_qty,
+                        SUM(val_1k_usd) FILTER (WHERE trade_type = 'Export') AS export_value,
+                        SUM(val_1k_usd) FILTER (WHERE trade_type = 'Import') AS import_value,
+                        COUNT(DISTINCT reporter_code) AS reporters
+                    FROM Trade_Data_Final
+                    WHERE item_code = cm.fao_code
+                    GROUP BY year
+                ) t
+            ),
+            -- Üretici fiyatı dağılımı: ülkelerin yıllık ortalamaları üzerinden, birim bazında
+            'prices', (
+                SELECT COALESCE(json_agg(t ORDER BY t.year, t.unit), '[]'::json)
+                FROM (
+                    SELECT
+                        year,
+                        unit,
+                        COUNT(*) AS countries,
+                        MIN(avg_price) AS min,
+                        percentile_cont(0.25) WITHIN GROUP (ORDER BY avg_price) AS p25,
+                        percentile_cont(0.5) WITHIN GROUP (ORDER BY avg_price) AS median,
+                        percentile_cont(0.75) WITHIN GROUP (ORDER BY avg_price) AS p75,
+                        MAX(avg_price) AS max
+                    FROM (
+                        SELECT country_id, year, unit, AVG(value) AS avg_price
+                        FROM Producer_Prices
+                        WHERE commodity_id = cm.fao_code AND value IS NOT NULL
+                        GROUP BY country_id, year, unit
+                    ) country_prices
+                    GROUP BY year, unit
+                ) t
+            )
+        )::jsonb,
+        COALESCE(cs.version, 0),
+        NOW()
+    FROM Commodities cm
+    LEFT JOIN COMMODITY_SUMMARIES cs ON cs.commodity_id = cm.fao_code
+    WHERE cm.fao_code = ANY(%(fao_codes)s::int[])
+    ON CONFLICT (commodity_id) DO UPDATE SET
+        summary = EXCLUDED.summary,
+        summary_version = EXCLUDED.summary_version,
+        computed_at = EXCLUDED.computed_at
+"""
+
+# Country names are joined when the summary is read: a renamed country
+# changes no summary (only the cached profiles, through the countries version)
+SUMMARY_QUERY = """
+    SELECT
+        cm.fao_code, cm.item_name, cm.cpc_code,
+        cs.summary, cs.computed_at,
+        cs.summary IS NOT NULL AND cs.summary_version = cs.version AS fresh,
+        (
+            SELECT json_object_agg(c.country_id, c.country_name)
+            FROM Countries c
+            WHERE c.country_id IN (
+                SELECT (entry->>'country_id')::int
+                FROM jsonb_array_elements(
+                    COALESCE(cs.summary->'top_producers', '[]'::jsonb) || COALESCE(cs.summary->'traders', '[]'::jsonb)
+                ) entry
+            )
+        ) AS country_names
+    FROM Commodities cm
+    LEFT JOIN COMMODITY_SUMMARIES cs ON cs.commodity_id = cm.fao_code
+    WHERE cm.fao_code = %s
+"""
+
+STALE_QUERY = """
+    SELECT cm.fao_code
+    FROM Commodities cm
+    LEFT JOIN COMMODITY_SUMMARIES cs ON cs.commodity_id = cm.fao_code
+    WHERE cs.summary IS NULL OR cs.summary_version IS DISTINCT FROM cs.version
+    ORDER BY cm.fao_code
+"""
+
+
+def mark_stale_query(fao_codes):
+    """(query, params) marking the summaries of fao_codes stale, run in the writing transaction"""
+    return _MARK_STALE.format(condition="= ANY(%s::int[])"), ([int(code) for code in fao_codes if code],)
+
+
+def mark_row_stale_query(table, id_column, row_id):
+    """
+    (query, params) marking the summary of the commodity of one row of a
+    source table stale; run before the row is updated or deleted
+    """
+    condition = f"IN (SELECT {COMMODITY_COLUMNS[table]} FROM {table} WHERE {id_column} = %s)"
+    return _MARK_STALE.format(condition=condition), (row_id,)
+
+
+def refresh_summaries(fao_codes):
+    """
+    Recomputes the summaries of fao_codes in one statement; returns the rows
+    written. Derived data: neither logged nor journaled (database.execute_maintenance)
+    """
+    return execute_maintenance([(REFRESH_QUERY, {
+        "fao_codes": [int(code) for code in fao_codes],
+        "top_producers": TOP_PRODUCERS,
+        "top_traders": TOP_TRADERS,
+    })])[0]
+
+
+def refresh_stale_summaries(everything=False, batch_size=BATCH_SIZE):
+    """Recomputes missing and stale summaries (all of them with everything); returns their count"""
+    rows = fetch_query("SELECT fao_code FROM Commodities ORDER BY fao_code" if everything else STALE_QUERY)
+    if rows is None:
+        raise RuntimeError("Could not read the stale commodity summaries")
+    codes = [row["fao_code"] for row in rows]
+    for start in range(0, len(codes), batch_size):
+        refresh_summaries(codes[start:start + batch_size])
+    return len(codes)
+
+
+def _shape(row):
+    summary = dict(row["summary"] or {})
+    for section in SECTIONS:
+        summary[section] = summary.get(section) or []
+    names = row["country_names"] or {}
+    for entry in summary["top_producers"] + summary["traders"]:
+        entry["country_name"] = names.get(str(entry["country_id"]))
+    summary["commodity"] = {key: row[key] for key in ("fao_code", "item_name", "cpc_code")}
+    summary["computed_at"] = row["computed_at"]
+    summary["exporters"] = [t for t in summary["traders"] if t["trade_type"] == "Export"]
+    summary["importers"] = [t for t in summary["traders"] if t["trade_type"] == "Import"]
+    return summary
+
+
+def load_commodity_profile(fao_code):
+    """
+    Summary of a commodity, recomputed first when it is missing or stale;
+    {"commodity": None} when the commodity does not exist, None on a database error
+    """
+    rows = fetch_query(SUMMARY_QUERY, (fao_code,))
+    if rows is None:
+        return None
+    if not rows:
+        return {"commodity": None}
+    if not rows[0]["fresh"]:
+        try:
+            refresh_summaries([fao_code])
+        except Exception as e:
+            print(f"Commodity summary refresh error ({fao_code}): {e}")
+            return None
+        rows = fetch_query(SUMMARY_QUERY, (fao_code,))
+        if not rows:
+            return None
+    return _shape(rows[0])
+
+
+def commodity_profile(fao_code):
+    """Cached summary of a commodity (per fao_code and table versions)"""
+    return cached_result(
+        "commodity_profile", {"fao_code": fao_code}, COMMODITY_PROFILE_TABLES,
+        lambda: load_commodity_profile(fao_code),
+    )
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Refresh COMMODITY_SUMMARIES")
+    parser.add_argument("--all", action="store_true", help="recompute every commodity, not only the stale ones")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="commodities per statement")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    count = refresh_stale_summaries(args.all, args.batch_size)
+    print(f"Refreshed {count} commodity summaries in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+import threading
+
+import numpy as np
+
+from database import fetch_query, get_table_version
+from analytics.timeseries import nan_mean, pct_change, rolling_mean
+
+# Consumer_Prices.type values (1: General Indices, 2: Food Indices, both 2015=100)
+PRICE_TYPES = (1, 2)
+
+# Window (in months) of the rolling average
+ROLLING_WINDOW = 12
+
+
+def build_inflation_arrays(rows):
+    """
+    Builds the dense (country x type x year x month) index cube from
+    Consumer_Prices rows and computes the derived inflation arrays.
+    """
+    # Rows without a country or a year have no place in the cube
+    rows = [
+        r for r in rows
+        if r["type"] in PRICE_TYPES and 1 <= (r["month"] or 0) <= 12
+        and r["country_id"] is not None and r["year"] is not None
+    ]
+
+    country_ids = np.array(sorted({r["country_id"] for r in rows}), dtype=np.int64)
+    if rows:
+        first_year = min(r["year"] for r in rows)
+        last_year = max(r["year"] for r in rows)
+    else:
+        first_year = last_year = 0
+    years = np.arange(first_year, last_year + 1)
+
+    n_countries, n_types, n_years = len(country_ids), len(PRICE_TYPES), len(years)
+    index = np.full((n_countries, n_types, n_years, 12), np.nan)
+
+    if rows:
+        country_idx = np.searchsorted(country_ids, [r["country_id"] for r in rows])
+        type_idx = np.array([PRICE_TYPES.index(r["type"]) for r in rows])
+        year_idx = np.array([r["year"] for r in rows]) - first_year
+        month_idx = np.array([r["month"] for r in rows]) - 1
+        values = np.array([r["value"] for r in rows], dtype=float)
+        index[country_idx, type_idx, year_idx, month_idx] = values
+
+    # Year-over-year: same month, previous year
+    yoy = np.full(index.shape, np.nan)
+    yoy[:, :, 1:, :] = pct_change(index[:, :, 1:, :], index[:, :, :-1, :])
+
+    # Month-over-month on the flattened monthly timeline (Dec -> Jan crosses years)
+    flat = index.reshape(n_countries, n_types, n_years * 12)
+    mom = np.full(flat.shape, np.nan)
+    mom[..., 1:] = pct_change(flat[..., 1:], flat[..., :-1])
+
+    rolling = rolling_mean(flat, ROLLING_WINDOW)
+
+    return {
+        "country_ids": country_ids,
+        "country_pos": {int(c): i for i, c in enumerate(country_ids)},
+        "years": years,
+        "first_year": first_year,
+        "index": index,
+        "yoy": yoy,
+        "mom": mom.reshape(index.shape),
+        "rolling_avg": rolling.reshape(index.shape),
+        "rebased": {},
+    }
+
+
+def _clean(value):
+    return None if value is None or np.isnan(value) else round(float(value), 4)
+
+
+class ConsumerPriceEngine:
+    """
+    Keeps the inflation arrays of Consumer_Prices in memory.
+    The arrays are rebuilt lazily whenever the Consumer_Prices write version changes.
+    """
+
+    table = "consumer_prices"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._data = None
+
+    def get(self):
+        """
+        Returns the cached arrays, rebuilding them if Consumer_Prices was written.
+        Returns None if the data could not be loaded.
+        """
+        version = get_table_version(self.table)
+        if self._data is not None and self._version == version:
+            return self._data
+
+        with self._lock:
+            if self._data is not None and self._version == version:
+                return self._data
+
+            rows = fetch_query("""
+                SELECT country_id, type, year, month, value
+                FROM Consumer_Prices
+                WHERE value IS NOT NULL AND year IS NOT NULL
+            """)
+            if rows is None:
+                return None
+
+            self._data = build_inflation_arrays(rows)
+            self._version = version
+            return self._data
+
+    def rebased(self, base_year):
+        """
+        Index cube rebased so that the average of base_year equals 100,
+        for all countries and types at once.
+        """
+        data = self.get()
+        if data is None:
+            return None
+
+        if base_year not in data["rebased"]:
+            year_idx = base_year - data["first_year"]
+            if not 0 <= year_idx < len(data["years"]):
+                return None
+            base = data["index"][:, :, year_idx, :]
+            base_mean = nan_mean(np.where(base > 0, base, np.nan), axis=-1)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                data["rebased"][base_year] = data["index"] / base_mean[:, :, None, None] * 100
+        return data["rebased"][base_year]
+
+    def metrics_for(self, country_id, price_type, year, month, base_year=None):
+        """
+        Inflation metrics of a single observation (used for the dashboard columns).
+        """
+        metrics = {"yoy": None, "mom": None, "rolling_avg": None, "rebased": None}
+        data = self.get()
+        if data is None or price_type not in PRICE_TYPES or year is None or month is None:
+            return metrics
+
+        c = data["country_pos"].get(country_id)
+        y = year - data["first_year"]
+        if c is None or not 0 <= y < len(data["years"]) or not 1 <= month <= 12:
+            return metrics
+
+        t = PRICE_TYPES.index(price_type)
+        metrics["yoy"] = _clean(data["yoy"][c, t, y, month - 1])
+        metrics["mom"] = _clean(data["mom"][c, t, y, month - 1])
+        metrics["rolling_avg"] = _clean(data["rolling_avg"][c, t, y, month - 1])
+
+        if base_year:
+            rebased = self.rebased(base_year)
+            if rebased is not None:
+                metrics["rebased"] = _clean(rebased[c, t, y, month - 1])
+        return metrics
+
+    def series(self, country_ids=None, price_types=None, base_year=None):
+        """
+        JSON friendly monthly series, one entry per (country, type).
+        """
+        data = self.get()
+        if data is None:
+            return None
+
+        rebased = self.rebased(base_year) if base_year else None
+        labels = [f"{y}-{m:02d}" for y in data["years"] for m in range(1, 13)]
+        shape = (len(data["years"]) * 12,)
+
+        result = []
+        for country_id in (country_ids or data["country_ids"].tolist()):
+            c = data["country_pos"].get(country_id)
+            if c is None:
+                continue
+            for price_type in (price_types or PRICE_TYPES):
+                if price_type not in PRICE_TYPES:
+                    continue
+                t = PRICE_TYPES.index(price_type)
+                entry = {"country_id": country_id, "type": price_type}
+                for key in ("index", "yoy", "mom", "rolling_avg"):
+                    entry[key] = [_clean(v) for v in data[key][c, t].reshape(shape)]
+                if rebased is not None:
+                    entry["rebased"] = [_clean(v) for v in rebased[c, t].reshape(shape)]
+                result.append(entry)
+
+        return {"labels": labels, "base_year": base_year if rebased is not None else None, "series": result}
+
+
+consumer_price_engine = ConsumerPriceEngine()
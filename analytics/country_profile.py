@@ -0,0 +1,244 @@
+"""
+Country profile: every dataset of one country in a single statement.
+
+COUNTRY_PROFILE_QUERY builds the whole profile on the server as one JSON
+document (trade series and top partners, production and production value
+series, consumer price indices, land use and investment timelines), so a
+profile costs one round trip instead of one query per section. The shaped
+profile is cached per country and per write version of the tables it
+reads (cache.py).
+"""
+from cache import cached_result
+from database import fetch_query
+
+COUNTRY_PROFILE_TABLES = (
+    "countries", "trade_data_final", "production", "production_value",
+    "consumer_prices", "land_use", "investments",
+)
+
+TOP_PARTNERS = 10
+TOP_COMMODITIES = 10
+
+PRODUCTION_VALUE_ELEMENT = "Gross Production Value (current thousand US$)"
+
+AGRICULTURAL_LAND_TYPES = ("Arable land", "Permanent crops", "Permanent meadows and pastures")
+
+COUNTRY_PROFILE_QUERY = """
+    SELECT json_build_object(
+        'country', (
+            SELECT row_to_json(c)
+            FROM (
+                SELECT country_id, country_name, region, population, land_area_sq_km
+                FROM Countries
+                WHERE country_id = %(country_id)s
+            ) c
+        ),
+        -- Dış ticaret: yıllık ihracat / ithalat toplamları
+        'trade', (
+            SELECT COALESCE(json_agg(t ORDER BY t.year), '[]'::json)
+            FROM (
+                SELECT
+                    year,
+                    SUM(val_1k_usd) FILTER (WHERE trade_type = 'Export') AS export_value,
+                    SUM(val_1k_usd) FILTER (WHERE trade_type = 'Import') AS import_value,
+                    SUM(qty_tonnes) FILTER (WHERE trade_type = 'Export') AS export_qty,
+                    SUM(qty_tonnes) FILTER (WHERE trade_type = 'Import') AS import_qty
+                FROM Trade_Data_Final
+                WHERE reporter_code = %(country_id)s
+                GROUP BY year
+            ) t
+        ),
+        'partners', (
+            SELECT COALESCE(json_agg(t ORDER BY t.trade_type, t.rank), '[]'::json)
+            FROM (
+                SELECT
+                    tf.trade_type,
+                    tf.partner_code AS country_id,
+                    c.country_name,
+                    SUM(tf.val_1k_usd) AS value,
+                    SUM(tf.qty_tonnes) AS qty,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY tf.trade_type ORDER BY SUM(tf.val_1k_usd) DESC NULLS LAST
+                    ) AS rank
+                FROM Trade_Data_Final tf
+                INNER JOIN Countries c ON c.country_id = tf.partner_code
+                WHERE tf.reporter_code = %(country_id)s
+                GROUP BY tf.trade_type, tf.partner_code, c.country_name
+            ) t
+            WHERE t.rank <= %(top_partners)s
+        ),
+        -- Üretim (ton, units.py) ve üretim değeri serileri
+        'production', (
+            SELECT COALESCE(json_agg(t ORDER BY t.year), '[]'::json)
+            FROM (
+                SELECT
+                    p.year,
+                    SUM(p.quantity_tonnes) AS quantity_tonnes,
+                    COUNT(DISTINCT p.commodity_code) AS commodities,
+                    SUM(pv.value) AS production_value
+                FROM Production p
+                LEFT JOIN Production_Value pv
+                    ON pv.production_id = p.production_id
+                   AND pv.element = %(value_element)s
+                WHERE p.country_code = %(country_id)s
+                GROUP BY p.year
+            ) t
+        ),
+        'top_commodities', (
+            SELECT COALESCE(json_agg(t ORDER BY t.quantity_tonnes DESC), '[]'::json)
+            FROM (
+                SELECT p.commodity_code AS commodity_id, cm.item_name, p.year, p.quantity_tonnes
+                FROM Production p
+                INNER JOIN Commodities cm ON cm.fao_code = p.commodity_code
+                WHERE p.country_code = %(country_id)s
+                  AND p.quantity_tonnes > 0
+                  AND p.year = (
+                      SELECT MAX(year) FROM Production
+                      WHERE country_code = %(country_id)s AND quantity_tonnes > 0
+                  )
+                ORDER BY p.quantity_tonnes DESC
+                LIMIT %(top_commodities)s
+            ) t
+        ),
+        -- Tüketici fiyat endeksleri: yıllık ortalama
+        'price_indices', (
+            SELECT COALESCE(json_agg(t ORDER BY t.year), '[]'::json)
+            FROM (
+                SELECT
+                    year,
+                    AVG(value) FILTER (WHERE type = 1) AS general,
+                    AVG(value) FILTER (WHERE type = 2) AS food
+                FROM Consumer_Prices
+                WHERE country_id = %(country_id)s
+                GROUP BY year
+            ) t
+        ),
+        -- Arazi kullanımı (1000 ha) ve yatırımlar (Million USD), kanonik birimlerde
+        'land_use', (
+            SELECT COALESCE(json_agg(t ORDER BY t.year), '[]'::json)
+            FROM (
+                SELECT
+                    year,
+                    MAX(land_usage_1000ha) FILTER (WHERE land_type = 'Land area') AS land_area,
+                    SUM(land_usage_1000ha) FILTER (WHERE land_type IN %(agricultural_types)s) AS agricultural_land,
+                    MAX(land_usage_1000ha) FILTER (WHERE land_type = 'Arable land') AS arable_land,
+                    MAX(land_usage_1000ha) FILTER (WHERE land_type = 'Forest land') AS forest_land
+                FROM Land_Use
+                WHERE country_id = %(country_id)s
+                GROUP BY year
+            ) t
+        ),
+        'investments', (
+            SELECT COALESCE(json_agg(t ORDER BY t.year), '[]'::json)
+            FROM (
+                SELECT
+                    year,
+                    MAX(expenditure_musd) FILTER (
+                        WHERE expenditure_type = 'Total Expenditure (general government)') AS total_expenditure,
+                    MAX(expenditure_musd) FILTER (
+                        WHERE expenditure_type = 'Agriculture, forestry, fishing (general government expenditure)'
+                    ) AS agriculture_forestry_fishing,
+                    MAX(expenditure_musd) FILTER (
+                        WHERE expenditure_type = 'Environmental protection (general government expenditure)'
+                    ) AS environmental_protection
+                FROM Investments
+                WHERE country_id = %(country_id)s
+                GROUP BY year
+            ) t
+        )
+    ) AS profile
+"""
+
+
+def _latest(series, *keys):
+    """Last row of a year series with a value for every key, None if there is none"""
+    for row in reversed(series):
+        if all(row.get(key) is not None for key in keys):
+            return row
+    return None
+
+
+def _ratio(numerator, denominator, scale=1.0):
+    if numerator is None or not denominator:
+        return None
+    return numerator / denominator * scale
+
+
+def _at(year, value):
+    return {"year": year, "value": value}
+
+
+def profile_ratios(profile):
+    """Headline ratios of a profile as {name: {"year", "value"}}, each for its latest year with data"""
+    country = profile["country"]
+    ratios = {}
+
+    trade = _latest(profile["trade"], "export_value", "import_value")
+    if trade:
+        ratios["trade_balance"] = _at(trade["year"], trade["export_value"] - trade["import_value"])
+        ratios["export_import_ratio"] = _at(trade["year"], _ratio(trade["export_value"], trade["import_value"]))
+
+    land = _latest(profile["land_use"], "land_area", "agricultural_land")
+    if land:
+        ratios["agricultural_land_share"] = _at(
+            land["year"], _ratio(land["agricultural_land"], land["land_area"], 100))
+        ratios["forest_share"] = _at(land["year"], _ratio(land["forest_land"], land["land_area"], 100))
+
+    production = _latest(profile["production"], "quantity_tonnes")
+    if production:
+        ratios["production_per_capita"] = _at(
+            production["year"], _ratio(production["quantity_tonnes"], country.get("population")))
+        land_year = next((row for row in profile["land_use"] if row["year"] == production["year"]), None)
+        if land_year and production.get("production_value") is not None:
+            # 1000 US$ / 1000 ha = US$ per ha
+            ratios["production_value_per_ha"] = _at(
+                production["year"], _ratio(production["production_value"], land_year.get("agricultural_land")))
+
+    investment = _latest(profile["investments"], "total_expenditure", "agriculture_forestry_fishing")
+    if investment:
+        ratios["agriculture_expenditure_share"] = _at(investment["year"], _ratio(
+            investment["agriculture_forestry_fishing"], investment["total_expenditure"], 100))
+
+    prices = _latest(profile["price_indices"], "food")
+    previous = next((row for row in profile["price_indices"]
+                     if prices and row["year"] == prices["year"] - 1 and row.get("food")), None)
+    if prices and previous:
+        ratios["food_inflation"] = _at(
+            prices["year"], _ratio(prices["food"] - previous["food"], previous["food"], 100))
+
+    return ratios
+
+
+def _top_partners(partners, trade_type):
+    return [row for row in partners if row["trade_type"] == trade_type]
+
+
+def load_country_profile(country_id):
+    """
+    Profile of a country read in one statement; {"country": None} when the
+    country does not exist (cached like a profile), None on a database error
+    """
+    rows = fetch_query(COUNTRY_PROFILE_QUERY, {
+        "country_id": country_id,
+        "top_partners": TOP_PARTNERS,
+        "top_commodities": TOP_COMMODITIES,
+        "value_element": PRODUCTION_VALUE_ELEMENT,
+        "agricultural_types": AGRICULTURAL_LAND_TYPES,
+    })
+    if rows is None:
+        return None
+    profile = rows[0]["profile"] if rows else None
+    if not profile or not profile.get("country"):
+        return {"country": None}
+    profile["export_partners"] = _top_partners(profile["partners"], "Export")
+    profile["import_partners"] = _top_partners(profile["partners"], "Import")
+    profile["ratios"] = profile_ratios(profile)
+    return profile
+
+
+def country_profile(country_id):
+    """Cached profile of a country (per country and table versions)"""
+    return cached_result(
+        "country_profile", {"country_id": country_id}, COUNTRY_PROFILE_TABLES,
+        lambda: load_country_profile(country_id),
+    )
@@ -0,0 +1,439 @@
+"""
+Per-year land efficiency results.
+
+The land efficiency query (Land_Use, Production, Commodities, Countries) is
+run once per year by a background worker. Every sort order and the top-10
+tables are derived from the cached per-year arrays, so changing the sort
+column or order does not touch the database. Areas are read in 1000 ha and
+production in tonnes from the canonical unit columns (units.py).
+"""
+import queue
+import threading
+
+import numpy as np
+
+from database import fetch_query, get_table_version
+from cache import cached_result
+
+# Writes to these tables are reported per year through invalidate_year()
+YEAR_TABLES = ("land_use", "production")
+
+# Writes to these tables affect every year
+GLOBAL_TABLES = ("countries", "commodities")
+
+SORT_COLUMNS = [
+    "country_name", "region", "agricultural_land_total", "forest_land",
+    "land_productivity_index", "production_density", "crop_diversity_score"
+]
+
+TEXT_COLUMNS = ("country_name", "region")
+
+# (result name, metric) pairs of the top-10 tables
+TOP_LISTS = [
+    ("top_by_productivity", "land_productivity_index"),
+    ("top_by_production_density", "production_density"),
+    ("top_by_crop_diversity", "crop_diversity"),
+    ("top_by_diversity_score", "crop_diversity_score"),
+    ("top_by_agricultural_percentage", "agricultural_land_percentage"),
+]
+
+TOP_N = 10
+
+LAND_EFFICIENCY_QUERY = """
+    WITH LandTypeBreakdown AS (
+        -- Nested Query 1: Her ülkenin detaylı land type dağılımı
+        SELECT
+            lu.country_id,
+            lu.year,
+            MAX(CASE WHEN lu.land_type = 'Country area' THEN lu.land_usage_1000ha END) AS country_area,
+            MAX(CASE WHEN lu.land_type = 'Land area' THEN lu.land_usage_1000ha END) AS land_area,
+            MAX(CASE WHEN lu.land_type = 'Inland waters' THEN lu.land_usage_1000ha END) AS inland_waters,
+            MAX(CASE WHEN lu.land_type = 'Arable land' THEN lu.land_usage_1000ha END) AS arable_land,
+            MAX(CASE WHEN lu.land_type = 'Permanent crops' THEN lu.land_usage_1000ha END) AS permanent_crops,
+            MAX(CASE WHEN lu.land_type = 'Permanent meadows and pastures' THEN lu.land_usage_1000ha END) AS meadows_pastures,
+            MAX(CASE WHEN lu.land_type = 'Forest land' THEN lu.land_usage_1000ha END) AS forest_land,
+            -- Agricultural land toplamı
+            COALESCE(MAX(CASE WHEN lu.land_type = 'Arable land' THEN lu.land_usage_1000ha END), 0) +
+            COALESCE(MAX(CASE WHEN lu.land_type = 'Permanent crops' THEN lu.land_usage_1000ha END), 0) +
+            COALESCE(MAX(CASE WHEN lu.land_type = 'Permanent meadows and pastures' THEN lu.land_usage_1000ha END), 0) 
+                AS agricultural_land_total,
+            -- Other land hesaplama
+            COALESCE(MAX(CASE WHEN lu.land_type = 'Land area' THEN lu.land_usage_1000ha END), 0) -
+            COALESCE(MAX(CASE WHEN lu.land_type = 'Arable land' THEN lu.land_usage_1000ha END), 0) -
+            COALESCE(MAX(CASE WHEN lu.land_type = 'Permanent crops' THEN lu.land_usage_1000ha END), 0) -
+            COALESCE(MAX(CASE WHEN lu.land_type = 'Permanent meadows and pastures' THEN lu.land_usage_1000ha END), 0) -
+            COALESCE(MAX(CASE WHEN lu.land_type = 'Forest land' THEN lu.land_usage_1000ha END), 0)
+                AS other_land
+        FROM Land_Use lu
+        WHERE lu.year = %s
+        GROUP BY lu.country_id, lu.year
+    ),
+    AgriculturalProduction AS (
+        -- Nested Query 2: Tarımsal üretim detayları
+        SELECT
+            p.country_code AS country_id,
+            p.year,
+            SUM(p.quantity_tonnes) AS total_agricultural_production,
+            COUNT(DISTINCT p.commodity_code) AS crop_diversity,
+            AVG(p.quantity_tonnes) AS avg_crop_yield,
+            MAX(p.quantity_tonnes) AS max_single_crop_production,
+            MIN(p.quantity_tonnes) AS min_crop_production
+        FROM Production p
+        WHERE p.year = %s
+            AND p.quantity_tonnes IS NOT NULL
+            AND p.quantity_tonnes > 0
+        GROUP BY p.country_code, p.year
+    ),
+    TopCommodityPerCountry AS (
+        -- Nested Query 3: Her ülkenin en çok ürettiği ürün
+        SELECT DISTINCT ON (p.country_code)
+            p.country_code AS country_id,
+            p.year,
+            c.item_name AS top_commodity,
+            p.quantity_tonnes AS top_commodity_quantity,
+            c.cpc_code
+        FROM Production p
+        INNER JOIN Commodities c ON p.commodity_code = c.fao_code
+        WHERE p.year = %s
+            AND p.quantity_tonnes IS NOT NULL
+            AND p.quantity_tonnes > 0
+        ORDER BY p.country_code, p.quantity_tonnes DESC
+    ),
+    RegionalLandStats AS (
+        -- Nested Query 4: Bölgesel land use ortalamaları
+        SELECT
+            c.region,
+            AVG(lt.agricultural_land_total) AS region_avg_agri_land,
+            AVG(lt.forest_land) AS region_avg_forest,
+            AVG(lt.land_area) AS region_avg_land_area,
+            COUNT(DISTINCT lt.country_id) AS countries_in_region
+        FROM Countries c
+        LEFT JOIN LandTypeBreakdown lt ON c.country_id = lt.country_id
+        WHERE c.region IS NOT NULL
+            AND lt.agricultural_land_total >= 10  -- Bölgesel ortalama için de filtre
+        GROUP BY c.region
+    )
+    -- MAIN QUERY: 4 main tables joined
+    SELECT
+        c.country_id,
+        c.country_name,
+        c.region,
+        c.population,
+        
+        -- LAND USE DATA (CORE)
+        COALESCE(lt.country_area, 0) AS country_area,
+        COALESCE(lt.land_area, 0) AS land_area,
+        COALESCE(lt.inland_waters, 0) AS inland_waters,
+        COALESCE(lt.arable_land, 0) AS arable_land,
+        COALESCE(lt.permanent_crops, 0) AS permanent_crops,
+        COALESCE(lt.meadows_pastures, 0) AS meadows_pastures,
+        COALESCE(lt.forest_land, 0) AS forest_land,
+        COALESCE(lt.other_land, 0) AS other_land,
+        COALESCE(lt.agricultural_land_total, 0) AS agricultural_land_total,
+        
+        -- PRODUCTION DATA
+        COALESCE(ap.total_agricultural_production, 0) AS total_agricultural_production,
+        COALESCE(ap.crop_diversity, 0) AS crop_diversity,
+        COALESCE(ap.avg_crop_yield, 0) AS avg_crop_yield,
+        COALESCE(ap.max_single_crop_production, 0) AS max_single_crop_production,
+        
+        -- TOP COMMODITY
+        COALESCE(tcp.top_commodity, 'N/A') AS top_commodity,
+        COALESCE(tcp.top_commodity_quantity, 0) AS top_commodity_quantity,
+        
+        -- REGIONAL COMPARISON
+        COALESCE(rls.region_avg_agri_land, 0) AS region_avg_agri_land,
+        COALESCE(rls.region_avg_forest, 0) AS region_avg_forest,
+        COALESCE(rls.countries_in_region, 0) AS countries_in_region,
+        
+        -- LAND USE PERCENTAGES
+        CASE 
+            WHEN lt.land_area > 0 
+            THEN (lt.agricultural_land_total / lt.land_area * 100)
+            ELSE 0
+        END AS agricultural_land_percentage,
+        
+        CASE 
+            WHEN lt.land_area > 0 
+            THEN (lt.forest_land / lt.land_area * 100)
+            ELSE 0
+        END AS forest_land_percentage,
+        
+        CASE 
+            WHEN lt.land_area > 0 
+            THEN (lt.arable_land / lt.land_area * 100)
+            ELSE 0
+        END AS arable_land_percentage,
+        
+        CASE 
+            WHEN lt.agricultural_land_total > 0 
+            THEN (lt.arable_land / lt.agricultural_land_total * 100)
+            ELSE 0
+        END AS arable_of_agricultural,
+        
+        CASE 
+            WHEN lt.agricultural_land_total > 0 
+            THEN (lt.permanent_crops / lt.agricultural_land_total * 100)
+            ELSE 0
+        END AS crops_of_agricultural,
+        
+        -- PRODUCTION EFFICIENCY METRICS
+        CASE 
+            WHEN lt.agricultural_land_total > 0 AND ap.total_agricultural_production > 0
+            THEN (ap.total_agricultural_production / lt.agricultural_land_total)
+            ELSE 0
+        END AS production_density,
+        
+        CASE 
+            WHEN lt.arable_land > 0 AND ap.total_agricultural_production > 0
+            THEN (ap.total_agricultural_production / lt.arable_land)
+            ELSE 0
+        END AS production_per_arable_land,
+        
+        -- CROP DIVERSITY SCORE (diversity * production density)
+        CASE 
+            WHEN lt.agricultural_land_total > 0 AND ap.crop_diversity > 0
+            THEN (ap.crop_diversity * LN((ap.total_agricultural_production / lt.agricultural_land_total) + 1))
+            ELSE 0
+        END AS crop_diversity_score,
+        
+        -- LAND PRODUCTIVITY INDEX (without investment data)
+        CASE 
+            WHEN lt.agricultural_land_total > 0 AND ap.total_agricultural_production > 0
+            THEN (
+                (ap.total_agricultural_production / lt.agricultural_land_total) * 0.75 +
+                (ap.crop_diversity * 100) * 0.25
+            )
+            ELSE 0
+        END AS land_productivity_index,
+        
+        -- PER CAPITA METRICS
+        CASE
+            WHEN c.population > 0
+            THEN (lt.agricultural_land_total * 1000 / c.population)
+            ELSE 0
+        END AS agricultural_land_per_capita,
+        
+        CASE
+            WHEN c.population > 0
+            THEN (lt.arable_land * 1000 / c.population)
+            ELSE 0
+        END AS arable_land_per_capita,
+        
+        CASE
+            WHEN c.population > 0
+            THEN (lt.forest_land * 1000 / c.population)
+            ELSE 0
+        END AS forest_land_per_capita,
+        
+        CASE
+            WHEN c.population > 0 AND ap.total_agricultural_production > 0
+            THEN (ap.total_agricultural_production / c.population)
+            ELSE 0
+        END AS production_per_capita,
+        
+        -- REGIONAL PERFORMANCE (vs regional average)
+        CASE
+            WHEN rls.region_avg_agri_land > 0
+            THEN (lt.agricultural_land_total / rls.region_avg_agri_land * 100)
+            ELSE 0
+        END AS agri_land_vs_region_avg,
+        
+        CASE
+            WHEN rls.region_avg_forest > 0
+            THEN (lt.forest_land / rls.region_avg_forest * 100)
+            ELSE 0
+        END AS forest_vs_region_avg
+        
+    FROM Countries c
+    
+    -- LEFT OUTER JOIN 1: Land Type Breakdown (PRIMARY DATA)
+    LEFT OUTER JOIN LandTypeBreakdown lt 
+        ON c.country_id = lt.country_id
+    
+    -- LEFT OUTER JOIN 2: Agricultural Production
+    LEFT OUTER JOIN AgriculturalProduction ap 
+        ON c.country_id = ap.country_id
+    
+    -- LEFT OUTER JOIN 3: Top Commodity Details
+    LEFT OUTER JOIN TopCommodityPerCountry tcp 
+        ON c.country_id = tcp.country_id
+    
+    -- LEFT OUTER JOIN 4: Regional Statistics
+    LEFT OUTER JOIN RegionalLandStats rls 
+        ON c.region = rls.region
+    
+    WHERE c.country_id IS NOT NULL
+        AND COALESCE(lt.agricultural_land_total, 0) >= 200  -- critic part for agricultural land minimum 100
+    ORDER BY c.country_name ASC;
+"""
+
+
+def _numeric(records, column):
+    return np.array([float(r.get(column) or 0) for r in records])
+
+
+class YearResult:
+    """
+    Land efficiency records of one year with precomputed sort orders,
+    top-10 lists and global totals.
+    """
+
+    def __init__(self, year, records):
+        self.year = year
+        self.records = records
+        self.orders = {}
+
+        for column in SORT_COLUMNS:
+            if column in TEXT_COLUMNS:
+                present = [i for i, r in enumerate(records) if r.get(column) is not None]
+                missing = [i for i, r in enumerate(records) if r.get(column) is None]
+                present.sort(key=lambda i: records[i][column])
+                self.orders[column] = (np.array(present, dtype=np.int64), np.array(missing, dtype=np.int64))
+            else:
+                # Metrics are COALESCEd in SQL, so there are no NULLs to keep last
+                order = np.argsort(_numeric(records, column), kind="stable")
+                self.orders[column] = (order, np.array([], dtype=np.int64))
+
+        self.top_lists = {}
+        for name, metric in TOP_LISTS:
+            values = _numeric(records, metric)
+            candidates = np.nonzero(values > 0)[0]
+            # Stable descending order (ties keep country_name order like the original sorted())
+            ranked = candidates[np.argsort(-values[candidates], kind="stable")][:TOP_N]
+            self.top_lists[name] = [records[i] for i in ranked]
+
+        self.global_stats = self._global_stats()
+
+    def _global_stats(self):
+        total_countries = len(self.records)
+        stats = {
+            'total_land_area': float(_numeric(self.records, "land_area").sum()),
+            'total_agricultural_land': float(_numeric(self.records, "agricultural_land_total").sum()),
+            'total_arable_land': float(_numeric(self.records, "arable_land").sum()),
+            'total_forest_land': float(_numeric(self.records, "forest_land").sum()),
+            'total_production': float(_numeric(self.records, "total_agricultural_production").sum()),
+            'avg_crop_diversity': (
+                float(_numeric(self.records, "crop_diversity").sum()) / total_countries
+                if total_countries > 0 else 0
+            ),
+        }
+
+        if stats['total_land_area'] > 0:
+            stats['global_agricultural_percentage'] = stats['total_agricultural_land'] / stats['total_land_area'] * 100
+            stats['global_forest_percentage'] = stats['total_forest_land'] / stats['total_land_area'] * 100
+        else:
+            stats['global_agricultural_percentage'] = 0
+            stats['global_forest_percentage'] = 0
+        return stats
+
+    def sorted_records(self, sort_by, order):
+        """Records in the requested order (NULLs last in both directions)"""
+        present, missing = self.orders.get(sort_by, self.orders["country_name"])
+        if order == "desc":
+            present = present[::-1]
+        return [self.records[i] for i in np.concatenate([present, missing])]
+
+
+class LandEfficiencyStore:
+    """
+    Cache of YearResult objects plus a background worker that (re)computes
+    years which were invalidated or requested for warm-up.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._results = {}
+        self._versions = self._current_versions()
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._worker = None
+
+    @staticmethod
+    def _current_versions():
+        return tuple(get_table_version(t) for t in YEAR_TABLES + GLOBAL_TABLES)
+
+    def _check_versions(self):
+        # Writes that were not reported through invalidate_year() make every year stale
+        versions = self._current_versions()
+        if versions != self._versions:
+            with self._lock:
+                if versions != self._versions:
+                    self._results.clear()
+                    self._versions = versions
+
+    def _compute(self, year):
+        versions = self._current_versions()
+        # Through the result cache, so workers reuse each other's years with a
+        # shared backend, and concurrent misses of a year run the query once
+        records = cached_result(
+            "land_efficiency", {"year": year}, YEAR_TABLES + GLOBAL_TABLES,
+            lambda: fetch_query(LAND_EFFICIENCY_QUERY, (year, year, year)),
+        )
+        if records is None:
+            return None
+
+        result = YearResult(year, records)
+        with self._lock:
+            # Only keep the result if nothing was written while it was computed
+            if versions == self._versions:
+                self._results[year] = result
+        return result
+
+    def get(self, year):
+        """
+        Result for a year, computed synchronously when it is not cached yet.
+        Returns None if the query failed.
+        """
+        self._check_versions()
+        result = self._results.get(year)
+        if result is not None:
+            return result
+        return self._compute(year)
+
+    def invalidate_year(self, year):
+        """
+        Called after Land_Use / Production writes of a single year:
+        drops that year and recomputes it in the background.
+        """
+        with self._lock:
+            self._results.pop(year, None)
+            # Acknowledge the reported write without clearing the other years
+            global_now = tuple(get_table_version(t) for t in GLOBAL_TABLES)
+            if global_now == self._versions[len(YEAR_TABLES):]:
+                self._versions = self._current_versions()
+        self.warm([year])
+
+    def warm(self, years):
+        """Queues years for background computation"""
+        with self._lock:
+            for year in years:
+                if year not in self._results and year not in self._pending:
+                    self._pending.add(year)
+                    self._queue.put(year)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="land-efficiency-worker", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            try:
+                year = self._queue.get(timeout=30)
+            except queue.Empty:
+                with self._lock:
+                    if self._queue.empty():
+                        self._worker = None
+                        return
+                continue
+            try:
+                self._check_versions()
+                if year not in self._results:
+                    self._compute(year)
+            except Exception as e:
+                print(f"Land efficiency precompute error ({year}): {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(year)
+
+
+land_efficiency_store = LandEfficiencyStore()
@@ -0,0 +1,225 @@
+"""
+Price / production fact view maintenance.
+
+PRICE_PRODUCTION_FACTS (see schema.sql) holds one row per
+(country, commodity, year). This module refreshes it and computes the
+price-quantity elasticity of every commodity in batch.
+
+Run manually or from cron:
+    python -m analytics.price_production
+"""
+import threading
+
+import numpy as np
+
+from database import (
+    bump_table_version, execute_maintenance, fetch_query, get_table_version, shared_table_versions_enabled,
+)
+
+FACTS_VIEW = "price_production_facts"
+ELASTICITIES_TABLE = "price_quantity_elasticities"
+
+# Tables the fact view is derived from
+SOURCE_TABLES = ("producer_prices", "production", "production_value")
+
+# Minimum (country, year) observations of a commodity for an elasticity
+MIN_OBSERVATIONS = 5
+
+
+def compute_elasticities(rows):
+    """
+    Pooled log-log elasticity of production quantity with respect to the
+    producer price for every commodity at once.
+
+    Each (country, commodity) series is demeaned first (country fixed effects),
+    so the slope reflects changes over time rather than differences between countries.
+    """
+    rows = [r for r in rows if (r["avg_price"] or 0) > 0 and (r["production_qty"] or 0) > 0]
+    if not rows:
+        return []
+
+    commodity = np.array([r["commodity_id"] for r in rows], dtype=np.int64)
+    country = np.array([r["country_id"] for r in rows], dtype=np.int64)
+    x = np.log(np.array([float(r["avg_price"]) for r in rows]))
+    y = np.log(np.array([float(r["production_qty"]) for r in rows]))
+
+    # Demean within each (commodity, country) group
+    _, group = np.unique(np.stack([commodity, country]), axis=1, return_inverse=True)
+    group = group.ravel()
+    group_size = np.bincount(group)
+    x_d = x - (np.bincount(group, weights=x) / group_size)[group]
+    y_d = y - (np.bincount(group, weights=y) / group_size)[group]
+
+    # Only series with at least two years carry information
+    usable = group_size[group] >= 2
+
+    commodities, comm_idx = np.unique(commodity, return_inverse=True)
+    comm_idx = comm_idx.ravel()
+    n = len(commodities)
+
+    sxx = np.bincount(comm_idx, weights=np.where(usable, x_d * x_d, 0.0), minlength=n)
+    sxy = np.bincount(comm_idx, weights=np.where(usable, x_d * y_d, 0.0), minlength=n)
+    syy = np.bincount(comm_idx, weights=np.where(usable, y_d * y_d, 0.0), minlength=n)
+    observations = np.bincount(comm_idx, weights=usable.astype(float), minlength=n).astype(int)
+
+    first_of_group = np.zeros(len(group), dtype=bool)
+    first_of_group[np.unique(group, return_index=True)[1]] = True
+    countries = np.bincount(comm_idx, weights=(first_of_group & usable).astype(float), minlength=n).astype(int)
+
+    result = []
+    for i, commodity_id in enumerate(commodities):
+        if observations[i] < MIN_OBSERVATIONS or sxx[i] <= 0:
+            continue
+        slope = sxy[i] / sxx[i]
+        r_squared = (sxy[i] * sxy[i]) / (sxx[i] * syy[i]) if syy[i] > 0 else None
+        result.append({
+            "commodity_id": int(commodity_id),
+            "elasticity": float(slope),
+            "r_squared": None if r_squared is None else float(r_squared),
+            "observations": int(observations[i]),
+            "countries": int(countries[i]),
+        })
+    return result
+
+
+def refresh_price_production_facts(concurrently=True):
+    """
+    Refreshes the fact view and rewrites the elasticity table (derived
+    data: neither logged nor journaled, see database.execute_maintenance).
+    Returns the number of elasticities written.
+    """
+    execute_maintenance([(
+        f"REFRESH MATERIALIZED VIEW {'CONCURRENTLY ' if concurrently else ''}PRICE_PRODUCTION_FACTS;", (),
+    )])
+    bump_table_version(FACTS_VIEW)
+
+    facts = fetch_query("""
+        SELECT country_id, commodity_id, year, avg_price, production_qty
+        FROM PRICE_PRODUCTION_FACTS
+    """)
+    if facts is None:
+        raise RuntimeError("Could not read PRICE_PRODUCTION_FACTS")
+
+    elasticities = compute_elasticities(facts)
+
+    statements = [("DELETE FROM PRICE_QUANTITY_ELASTICITIES;", ())]
+    if elasticities:
+        values_sql = ", ".join(["(%s, %s, %s, %s, %s)"] * len(elasticities))
+        params = []
+        for e in elasticities:
+            params.extend([e["commodity_id"], e["elasticity"], e["r_squared"], e["observations"], e["countries"]])
+        statements.append((
+            f"""
+            INSERT INTO PRICE_QUANTITY_ELASTICITIES
+                (commodity_id, elasticity, r_squared, observations, countries)
+            VALUES {values_sql};
+            """,
+            tuple(params),
+        ))
+    execute_maintenance(statements)
+    bump_table_version(ELASTICITIES_TABLE)
+
+    return len(elasticities)
+
+
+def _source_versions():
+    return tuple(get_table_version(t) for t in SOURCE_TABLES)
+
+
+# The view is assumed current when the process starts (the batch job keeps it
+# so), afterwards writes made through this process trigger a refresh
+_refresh_lock = threading.Lock()
+_refreshed_versions = _source_versions()
+
+# With shared table versions the workers share the state of the view as well:
+# TABLE_VERSIONS keeps, under this name, the sum of the source versions it was
+# last refreshed at (versions only grow, so a larger sum means newer sources).
+# The first worker to move it refreshes for all of them.
+REFRESHED_MARKER = "price_production_facts:sources"
+
+_CLAIM_REFRESH = [
+    # First run: seeded below any sum, so the write that led here is claimed
+    """
+        INSERT INTO TABLE_VERSIONS (table_name, version) VALUES (%(marker)s, 0)
+        ON CONFLICT (table_name) DO NOTHING
+    """,
+    """
+        UPDATE TABLE_VERSIONS SET version = %(sources)s
+        WHERE table_name = %(marker)s AND version < %(sources)s
+    """,
+]
+
+_RELEASE_CLAIM = """
+    UPDATE TABLE_VERSIONS SET version = 0
+    WHERE table_name = %(marker)s AND version = %(sources)s
+"""
+
+
+def _claim_refresh(versions):
+    """
+    Whether this process should refresh the view for the source versions;
+    when another worker already did (or does) the versions count as refreshed
+    """
+    global _refreshed_versions
+    if not shared_table_versions_enabled():
+        return True
+    params = {"marker": REFRESHED_MARKER, "sources": sum(versions)}
+    try:
+        claimed = execute_maintenance([(query, params) for query in _CLAIM_REFRESH])[1] == 1
+    except Exception as e:
+        print(f"Price/production refresh claim error: {e}")
+        return False
+    if not claimed:
+        _refreshed_versions = versions
+    return claimed
+
+
+def _release_claim(versions):
+    """After a failed refresh: lets the next request claim it again"""
+    if shared_table_versions_enabled():
+        execute_maintenance([(_RELEASE_CLAIM, {"marker": REFRESHED_MARKER, "sources": sum(versions)})])
+
+
+def refresh_in_background():
+    """
+    Starts a refresh in a daemon thread when one of the source tables was
+    written since the last refresh (by any worker when the table versions
+    are shared). Readers keep using the current view meanwhile.
+    """
+    versions = _source_versions()
+    if versions == _refreshed_versions or not _refresh_lock.acquire(blocking=False):
+        return False
+    if not _claim_refresh(versions):
+        _refresh_lock.release()
+        return False
+
+    def run():
+        global _refreshed_versions
+        try:
+            refresh_price_production_facts()
+            _refreshed_versions = versions
+        except Exception as e:
+            print(f"Price/production refresh error: {e}")
+            try:
+                _release_claim(versions)
+            except Exception as release_error:
+                print(f"Price/production refresh claim error: {release_error}")
+        finally:
+            _refresh_lock.release()
+
+    threading.Thread(target=run, name="price-production-refresh", daemon=True).start()
+    return True
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Refresh PRICE_PRODUCTION_FACTS and elasticities")
+    parser.add_argument(
+        "--blocking", action="store_true",
+        help="plain REFRESH instead of CONCURRENTLY (locks readers, but faster)",
+    )
+    args = parser.parse_args()
+
+    count = refresh_price_production_facts(concurrently=not args.blocking)
+    print(f"Refreshed {FACTS_VIEW}, {count} commodity elasticities written.")
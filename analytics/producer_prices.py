@@ -0,0 +1,248 @@
+import threading
+
+import numpy as np
+
+from database import fetch_query, get_table_version
+from analytics.timeseries import last_valid, log_returns, nan_mean, rolling_std
+
+# Window (in months) of the rolling volatility
+VOLATILITY_WINDOW = 12
+
+# Minimum number of returns inside the window for a volatility value
+VOLATILITY_MIN_RETURNS = 6
+
+SERIES_QUERY = """
+    SELECT country_id, commodity_id, COALESCE(unit, '') AS unit, year, month, value
+    FROM Producer_Prices
+    WHERE value IS NOT NULL AND year IS NOT NULL
+      AND country_id IS NOT NULL AND commodity_id IS NOT NULL
+"""
+
+
+def _monthly_matrix(rows, keys, first_year, n_months):
+    """
+    (series x month) float32 matrix for the given series keys, NaN for gaps.
+    """
+    pos = {k: i for i, k in enumerate(keys)}
+    values = np.full((len(keys), n_months), np.nan, dtype=np.float32)
+    for r in rows:
+        month = r["month"] or 0
+        if 1 <= month <= 12:
+            values[pos[(r["country_id"], r["commodity_id"], r["unit"])],
+                   (r["year"] - first_year) * 12 + month - 1] = r["value"]
+    return values
+
+
+def _series_metrics(values):
+    """
+    Volatility (rolling stdev of log returns, in %) and seasonal profile
+    (average ratio of each calendar month to its year's mean) for a block of series.
+    """
+    series = values.astype(np.float64)
+    volatility = rolling_std(log_returns(series), VOLATILITY_WINDOW, VOLATILITY_MIN_RETURNS) * 100
+
+    by_year = series.reshape(series.shape[0], -1, 12)
+    year_mean = nan_mean(by_year, axis=-1, min_count=6)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratios = by_year / year_mean[..., None]
+    seasonal = nan_mean(ratios, axis=1) * 100
+
+    return volatility.astype(np.float32), last_valid(volatility), seasonal
+
+
+def _commodity_spread(data, commodity_id):
+    """
+    Cross-country price spread of one commodity, computed per unit on the
+    annual averages of the latest year that has at least two reporting countries.
+    """
+    best = None
+    for unit, idx in data["by_commodity"].get(commodity_id, {}).items():
+        if len(idx) < 2:
+            continue
+        annual = nan_mean(data["values"][idx].astype(np.float64).reshape(len(idx), -1, 12), axis=-1)
+        reporting = (~np.isnan(annual)).sum(axis=0)
+        years = np.nonzero(reporting >= 2)[0]
+        if len(years) == 0:
+            continue
+
+        y = years[-1]
+        prices = annual[:, y][~np.isnan(annual[:, y])]
+        spread = {
+            "unit": unit,
+            "year": int(data["first_year"] + y),
+            "countries": int(len(prices)),
+            "min": float(prices.min()),
+            "max": float(prices.max()),
+            "cv": float(prices.std() / prices.mean() * 100) if prices.mean() > 0 else None,
+            "max_min_ratio": float(prices.max() / prices.min()) if prices.min() > 0 else None,
+        }
+        if best is None or spread["countries"] > best["countries"]:
+            best = spread
+    return best
+
+
+class ProducerPriceStore:
+    """
+    Precomputed producer price analytics.
+
+    Every (country, commodity, unit) series lives in one row of a compact
+    float32 (series x month) matrix. Volatility, seasonal profiles and the
+    cross-country spread are computed for all series in batch; writes from the
+    producer price routes refresh only the affected series via refresh_series().
+    """
+
+    table = "producer_prices"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._data = None
+
+    def get(self):
+        """
+        Returns the store, rebuilding it when Producer_Prices was written
+        by something that did not refresh it incrementally.
+        """
+        version = get_table_version(self.table)
+        if self._data is not None and self._version == version:
+            return self._data
+
+        with self._lock:
+            if self._data is not None and self._version == version:
+                return self._data
+
+            rows = fetch_query(SERIES_QUERY)
+            if rows is None:
+                return None
+
+            self._data = self._build(rows)
+            self._version = version
+            return self._data
+
+    def _build(self, rows):
+        keys = sorted({(r["country_id"], r["commodity_id"], r["unit"]) for r in rows})
+        years = [r["year"] for r in rows]
+        first_year = min(years) if years else 0
+        last_year = max(years) if years else -1
+        n_months = (last_year - first_year + 1) * 12
+
+        data = {
+            "keys": keys,
+            "pos": {k: i for i, k in enumerate(keys)},
+            "first_year": first_year,
+            "last_year": last_year,
+            "values": _monthly_matrix(rows, keys, first_year, n_months),
+            "record_count": np.zeros(len(keys), dtype=np.int64),
+            "value_sum": np.zeros(len(keys)),
+        }
+
+        # Counts and sums include every record (also non-monthly ones) so the
+        # averages match a plain AVG(value) over Producer_Prices
+        for r in rows:
+            i = data["pos"][(r["country_id"], r["commodity_id"], r["unit"])]
+            data["record_count"][i] += 1
+            data["value_sum"][i] += r["value"]
+
+        data["volatility"], data["latest_volatility"], data["seasonal"] = _series_metrics(data["values"])
+        self._index_commodities(data)
+        data["spread"] = {c: _commodity_spread(data, c) for c in data["by_commodity"]}
+        data["summary"] = None
+        return data
+
+    @staticmethod
+    def _index_commodities(data):
+        by_commodity = {}
+        for i, (_, commodity_id, unit) in enumerate(data["keys"]):
+            by_commodity.setdefault(commodity_id, {}).setdefault(unit, []).append(i)
+        data["by_commodity"] = by_commodity
+
+    def refresh_series(self, country_id, commodity_id):
+        """
+        Reloads the series of one (country, commodity) after a write and
+        recomputes only their metrics and the spread of that commodity.
+        Falls back to a full rebuild on the next get() when that is not possible.
+        """
+        with self._lock:
+            data = self._data
+            version = get_table_version(self.table)
+            if data is None or self._version is None or version != self._version + 1:
+                return
+
+            rows = fetch_query(
+                SERIES_QUERY + " AND country_id = %s AND commodity_id = %s",
+                (country_id, commodity_id),
+            )
+            if rows is None:
+                return
+            if any(not data["first_year"] <= r["year"] <= data["last_year"] for r in rows):
+                return
+
+            keys = sorted({(r["country_id"], r["commodity_id"], r["unit"]) for r in rows})
+            if any(k not in data["pos"] for k in keys):
+                # A new series changes the matrix layout, rebuild once instead
+                return
+
+            stale = [i for k, i in data["pos"].items() if k[0] == country_id and k[1] == commodity_id]
+            idx = [data["pos"][k] for k in keys]
+            n_months = data["values"].shape[1]
+
+            data["values"][stale] = np.nan
+            data["record_count"][stale] = 0
+            data["value_sum"][stale] = 0.0
+            data["values"][idx] = _monthly_matrix(rows, keys, data["first_year"], n_months)
+            for r in rows:
+                i = data["pos"][(r["country_id"], r["commodity_id"], r["unit"])]
+                data["record_count"][i] += 1
+                data["value_sum"][i] += r["value"]
+
+            touched = sorted(set(stale) | set(idx))
+            if touched:
+                volatility, latest, seasonal = _series_metrics(data["values"][touched])
+                data["volatility"][touched] = volatility
+                data["latest_volatility"][touched] = latest
+                data["seasonal"][touched] = seasonal
+
+            data["spread"][commodity_id] = _commodity_spread(data, commodity_id)
+            data["summary"] = None
+            self._version = version
+
+    def commodity_summary(self):
+        """
+        One row per commodity: record count, country count, average price,
+        average volatility, seasonal peak/trough month and cross-country spread.
+        """
+        data = self.get()
+        if data is None:
+            return None
+        if data["summary"] is not None:
+            return data["summary"]
+
+        summary = []
+        for commodity_id, units in data["by_commodity"].items():
+            idx = [i for unit_idx in units.values() for i in unit_idx]
+            records = int(data["record_count"][idx].sum())
+            if records == 0:
+                continue
+
+            countries = {data["keys"][i][0] for i in idx if data["record_count"][i] > 0}
+            volatility = data["latest_volatility"][idx]
+            profile = nan_mean(data["seasonal"][idx].T, axis=-1)
+            has_profile = not np.isnan(profile).all()
+
+            summary.append({
+                "commodity_id": commodity_id,
+                "total_records": records,
+                "country_count": len(countries),
+                "avg_price": float(data["value_sum"][idx].sum() / records),
+                "volatility": None if np.isnan(volatility).all() else float(nan_mean(volatility)),
+                "seasonal_profile": [None if np.isnan(v) else round(float(v), 2) for v in profile],
+                "peak_month": int(np.nanargmax(profile)) + 1 if has_profile else None,
+                "trough_month": int(np.nanargmin(profile)) + 1 if has_profile else None,
+                "spread": data["spread"].get(commodity_id),
+            })
+
+        data["summary"] = summary
+        return summary
+
+
+producer_price_store = ProducerPriceStore()
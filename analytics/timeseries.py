@@ -0,0 +1,89 @@
+import numpy as np
+
+
+def nan_mean(values, axis=-1, min_count=1):
+    """
+    Mean along an axis ignoring NaN, NaN where fewer than min_count values exist.
+    (Same as np.nanmean but without the "Mean of empty slice" warnings.)
+    """
+    valid = ~np.isnan(values)
+    counts = valid.sum(axis=axis)
+    sums = np.where(valid, values, 0.0).sum(axis=axis)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts >= max(min_count, 1), sums / counts, np.nan)
+
+
+def pct_change(current, previous):
+    """
+    Percentage change between two aligned arrays, NaN where previous is not > 0.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(previous > 0, (current / previous - 1) * 100, np.nan)
+
+
+def log_returns(series):
+    """
+    Month to month log returns along the last axis, first position is NaN.
+    """
+    result = np.full(series.shape, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        valid = (series[..., 1:] > 0) & (series[..., :-1] > 0)
+        result[..., 1:] = np.where(valid, np.log(series[..., 1:] / series[..., :-1]), np.nan)
+    return result
+
+
+def _window_sums(series, window):
+    valid = ~np.isnan(series)
+    filled = np.where(valid, series, 0.0)
+
+    zeros = np.zeros(series.shape[:-1] + (1,))
+    value_sums = np.concatenate([zeros, np.cumsum(filled, axis=-1)], axis=-1)
+    square_sums = np.concatenate([zeros, np.cumsum(filled * filled, axis=-1)], axis=-1)
+    value_counts = np.concatenate([zeros, np.cumsum(valid, axis=-1)], axis=-1)
+
+    return (
+        value_sums[..., window:] - value_sums[..., :-window],
+        square_sums[..., window:] - square_sums[..., :-window],
+        value_counts[..., window:] - value_counts[..., :-window],
+    )
+
+
+def rolling_mean(series, window):
+    """
+    Trailing mean over the last axis. A value is only produced when the whole
+    window is populated, gaps inside the window yield NaN.
+    """
+    sums, _, counts = _window_sums(series, window)
+
+    result = np.full(series.shape, np.nan)
+    result[..., window - 1:] = np.where(counts == window, sums / window, np.nan)
+    return result
+
+
+def rolling_std(series, window, min_count=None):
+    """
+    Trailing sample standard deviation over the last axis.
+    Needs at least min_count values in the window (defaults to the full window).
+    """
+    min_count = max(min_count or window, 2)
+    sums, squares, counts = _window_sums(series, window)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        variance = (squares - sums * sums / counts) / (counts - 1)
+    variance = np.where(counts >= min_count, np.maximum(variance, 0.0), np.nan)
+
+    result = np.full(series.shape, np.nan)
+    result[..., window - 1:] = np.sqrt(variance)
+    return result
+
+
+def last_valid(series):
+    """
+    Last non-NaN value along the last axis (NaN for all-empty rows).
+    """
+    valid = ~np.isnan(series)
+    if series.shape[-1] == 0:
+        return np.full(series.shape[:-1], np.nan)
+    last_idx = series.shape[-1] - 1 - np.argmax(valid[..., ::-1], axis=-1)
+    values = np.take_along_axis(series, last_idx[..., None], axis=-1)[..., 0]
+    return np.where(valid.any(axis=-1), values, np.nan)
@@ -0,0 +1,371 @@
+"""
+Read-only JSON API on ASGI:
+    uvicorn api:app --host 0.0.0.0 --port 8000
+
+Serves the data behind the dashboards (trades, trade statistics, land use,
+investments, prices and production) with the SQL of queries.py, on an async
+psycopg connection pool. The independent queries of an endpoint run
+concurrently instead of one round trip after the other.
+
+Endpoints that need a login in the Flask app accept the Flask session cookie,
+so SECRET_KEY must be the same as the web workers'.
+"""
+import asyncio
+import datetime
+import decimal
+import json
+import os
+import types
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+from flask.sessions import SecureCookieSessionInterface
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from analytics.land_efficiency import LAND_EFFICIENCY_QUERY, SORT_COLUMNS, YearResult
+from queries import (
+    CONSUMER_PRICE_STATS,
+    COUNTRY_NAME,
+    INVESTMENT_SORT_COLUMNS,
+    LAND_USE_SORT_COLUMNS,
+    PRODUCER_PRICE_STATS,
+    PRODUCTION_CHART,
+    PRODUCTION_STATS,
+    add_investment_shares,
+    consumer_prices_query,
+    investments_pie,
+    investments_queries,
+    investments_timeline_chart,
+    investments_timeline_query,
+    investments_total,
+    land_use_pie,
+    land_use_queries,
+    land_use_summary,
+    land_use_timeline_chart,
+    land_use_timeline_query,
+    price_filters_from_args,
+    producer_prices_query,
+    production_filters_from_args,
+    production_query,
+    shape_trade_statistics,
+    trade_filters_from_args,
+    trade_flows_queries,
+    trade_statistics_queries,
+    trade_type_breakdown,
+)
+
+load_dotenv()
+
+POOL_MIN_SIZE = int(os.environ.get("API_POOL_MIN", 2))
+POOL_MAX_SIZE = int(os.environ.get("API_POOL_MAX", 20))
+
+# Same lifetime as PERMANENT_SESSION_LIFETIME in app.py
+SESSION_MAX_AGE = 3600
+
+pool = AsyncConnectionPool(
+    os.environ.get("DATABASE_URL", ""),
+    min_size=POOL_MIN_SIZE,
+    max_size=POOL_MAX_SIZE,
+    kwargs={"row_factory": dict_row},
+    open=False,
+)
+
+_session_serializer = SecureCookieSessionInterface().get_signing_serializer(
+    types.SimpleNamespace(secret_key=os.environ.get("SECRET_KEY"))
+)
+
+
+# ==================== HELPERS ====================
+
+async def fetch(query, params=None):
+    """
+    Async counterpart of database.fetch_query: list of dicts, or None on error.
+    """
+    try:
+        async with pool.connection() as conn:
+            cursor = await conn.execute(query, params)
+            return await cursor.fetchall()
+    except Exception as e:
+        print(f"Database fetch error: {e}")
+        return None
+
+
+async def fetch_all(queries):
+    """
+    Runs a {name: (query, params)} set concurrently, returns {name: rows}.
+    """
+    names = list(queries)
+    rows = await asyncio.gather(*(fetch(*queries[name]) for name in names))
+    return dict(zip(names, rows))
+
+
+def _json_default(value):
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class APIResponse(JSONResponse):
+    def render(self, content):
+        return json.dumps(content, default=_json_default, separators=(",", ":")).encode("utf-8")
+
+
+def _logged_in(request):
+    """Checks the Flask session cookie (see routes/auth_routes.login_required)"""
+    cookie = request.cookies.get("session")
+    if not cookie or _session_serializer is None:
+        return False
+    try:
+        session = _session_serializer.loads(cookie, max_age=SESSION_MAX_AGE)
+    except Exception:
+        return False
+    return bool(session.get("logged_in"))
+
+
+def login_required(endpoint):
+    async def wrapper(request):
+        if not _logged_in(request):
+            return APIResponse({"error": "Login required."}, status_code=401)
+        return await endpoint(request)
+    wrapper.__name__ = endpoint.__name__
+    return wrapper
+
+
+def _int_arg(request, name, default=None):
+    try:
+        return int(request.query_params[name])
+    except (KeyError, ValueError):
+        return default
+
+
+def _sort_args(request, valid_columns, default_sort, default_order):
+    sort_by = request.query_params.get("sort", default_sort)
+    order = request.query_params.get("order", default_order)
+    if sort_by not in valid_columns:
+        sort_by = default_sort
+    if order not in ("asc", "desc"):
+        order = default_order
+    return sort_by, order
+
+
+# ==================== TRADES ====================
+
+@login_required
+async def trades(request):
+    try:
+        filters = trade_filters_from_args(request.query_params)
+    except ValueError:
+        return APIResponse({"error": "Invalid year filter."}, status_code=400)
+
+    page = max(_int_arg(request, "page", 1), 1)
+    per_page = min(max(_int_arg(request, "per_page", 20), 1), 500)
+    sort_by = request.query_params.get("sort", "value_desc")
+
+    results = await fetch_all(trade_flows_queries(filters, sort_by, per_page, (page - 1) * per_page))
+    if results["trade_flows"] is None:
+        return APIResponse({"error": "Trade data is not available."}, status_code=500)
+
+    total_count = results["total"][0]["total"] if results["total"] else 0
+    stats = results["stats"][0] if results["stats"] else {}
+    return APIResponse({
+        "trade_flows": results["trade_flows"],
+        "page": page,
+        "per_page": per_page,
+        "total_count": total_count,
+        "total_pages": (total_count + per_page - 1) // per_page,
+        "stats": stats,
+        "trade_type_breakdown": trade_type_breakdown(results["trade_types"]),
+    })
+
+
+async def trade_statistics(request):
+    results = await fetch_all(trade_statistics_queries())
+    try:
+        payload = shape_trade_statistics(results)
+    except (TypeError, IndexError, KeyError):
+        return APIResponse({"error": "Trade statistics are not available."}, status_code=500)
+    return APIResponse(payload)
+
+
+# ==================== LAND USE ====================
+
+@login_required
+async def land_use(request):
+    year = _int_arg(request, "year", 2023)
+    country_id = _int_arg(request, "country_id")
+    sort_by, order = _sort_args(request, ["country_name"] + LAND_USE_SORT_COLUMNS, "country_name", "asc")
+
+    results = await fetch_all(land_use_queries(year, country_id, sort_by, order))
+    records = results["records"] or []
+    return APIResponse({
+        "year": year,
+        "records": records,
+        **land_use_summary(records, results["pie"]),
+        "pie_chart_data": land_use_pie(results["pie"]),
+    })
+
+
+@login_required
+async def land_use_timeline(request):
+    country_id = _int_arg(request, "country_id")
+    if country_id is None:
+        return APIResponse({"error": "country_id is required."}, status_code=400)
+    sort_by, order = _sort_args(request, ["year"] + LAND_USE_SORT_COLUMNS, "year", "desc")
+
+    results = await fetch_all({
+        "country": (COUNTRY_NAME, (country_id,)),
+        "records": land_use_timeline_query(country_id, sort_by, order),
+    })
+    if not results["country"]:
+        return APIResponse({"error": "Selected country not found."}, status_code=404)
+
+    records = results["records"] or []
+    return APIResponse({
+        "country_id": country_id,
+        "country_name": results["country"][0]["country_name"],
+        "records": records,
+        "chart_data": land_use_timeline_chart(records),
+    })
+
+
+@login_required
+async def land_efficiency(request):
+    year = _int_arg(request, "year", 2023)
+    sort_by, order = _sort_args(request, SORT_COLUMNS, "country_name", "asc")
+
+    records = await fetch(LAND_EFFICIENCY_QUERY, (year, year, year))
+    if records is None:
+        return APIResponse({"error": "Land efficiency data is not available."}, status_code=500)
+
+    result = YearResult(year, records)
+    return APIResponse({
+        "year": year,
+        "records": result.sorted_records(sort_by, order),
+        "global_stats": result.global_stats,
+        **result.top_lists,
+    })
+
+
+# ==================== INVESTMENTS ====================
+
+@login_required
+async def investments(request):
+    year = _int_arg(request, "year", 2023)
+    country_id = _int_arg(request, "country_id")
+    sort_by, order = _sort_args(request, ["country_name"] + INVESTMENT_SORT_COLUMNS, "country_name", "asc")
+
+    results = await fetch_all(investments_queries(year, country_id, sort_by, order))
+    records = add_investment_shares(results["records"] or [])
+    return APIResponse({
+        "year": year,
+        "records": records,
+        "total_rows": len(records),
+        "total_countries": len({row["country_id"] for row in records}),
+        "total_expenditure_sum": investments_total(results["pie"]),
+        "pie_chart_data": investments_pie(results["pie"]),
+    })
+
+
+@login_required
+async def investments_timeline(request):
+    country_id = _int_arg(request, "country_id")
+    if country_id is None:
+        return APIResponse({"error": "country_id is required."}, status_code=400)
+    sort_by, order = _sort_args(request, ["year"] + INVESTMENT_SORT_COLUMNS, "year", "desc")
+
+    results = await fetch_all({
+        "country": (COUNTRY_NAME, (country_id,)),
+        "records": investments_timeline_query(country_id, sort_by, order),
+    })
+    if not results["country"]:
+        return APIResponse({"error": "Selected country not found."}, status_code=404)
+
+    records = add_investment_shares(results["records"] or [])
+    return APIResponse({
+        "country_id": country_id,
+        "country_name": results["country"][0]["country_name"],
+        "records": records,
+        "chart_data": investments_timeline_chart(records),
+    })
+
+
+# ==================== PRICES ====================
+
+@login_required
+async def consumer_prices(request):
+    results = await fetch_all({
+        "prices": consumer_prices_query(price_filters_from_args(request.query_params)),
+        "stats": (CONSUMER_PRICE_STATS, None),
+    })
+    if results["prices"] is None:
+        return APIResponse({"error": "Consumer price data is not available."}, status_code=500)
+    return APIResponse({
+        "prices": results["prices"],
+        "stats": results["stats"][0] if results["stats"] else {},
+    })
+
+
+@login_required
+async def producer_prices(request):
+    results = await fetch_all({
+        "prices": producer_prices_query(price_filters_from_args(request.query_params)),
+        "stats": (PRODUCER_PRICE_STATS, None),
+    })
+    if results["prices"] is None:
+        return APIResponse({"error": "Producer price data is not available."}, status_code=500)
+    return APIResponse({
+        "prices": results["prices"],
+        "stats": results["stats"][0] if results["stats"] else {},
+    })
+
+
+# ==================== PRODUCTION ====================
+
+async def production(request):
+    results = await fetch_all({
+        "production": production_query(production_filters_from_args(request.query_params)),
+        "stats": (PRODUCTION_STATS, None),
+        "chart": (PRODUCTION_CHART, None),
+    })
+    if results["production"] is None:
+        return APIResponse({"error": "Production data is not available."}, status_code=500)
+    return APIResponse({
+        "production": results["production"],
+        "stats": results["stats"][0] if results["stats"] else {},
+        "chart_data": [
+            {"country": row["country_name"], "quantity": int(row["item_count"] or 0)}
+            for row in (results["chart"] or [])
+        ],
+    })
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await pool.open()
+    try:
+        yield
+    finally:
+        await pool.close()
+
+
+app = Starlette(
+    routes=[
+        Route("/api/trades", trades),
+        Route("/api/trades/statistics", trade_statistics),
+        Route("/api/landuse", land_use),
+        Route("/api/landuse/timeline", land_use_timeline),
+        Route("/api/landuse/efficiency", land_efficiency),
+        Route("/api/investments", investments),
+        Route("/api/investments/timeline", investments_timeline),
+        Route("/api/consumer_prices", consumer_prices),
+        Route("/api/producer_prices", producer_prices),
+        Route("/api/production", production),
+    ],
+    lifespan=lifespan,
+)
@@ -17,11 +17,21 @@ from routes import (
     investments_bp
 )
 from routes.auth_routes import auth_bp #admin panel
+from assets import init_assets
+from compression import init_compression
+from fragments import init_fragments
+from keepalive import init_keepalive
+from profiler import init_profiler
 
 
 def create_app():
     app = Flask(__name__)
-    app.config["SECRET_KEY"] = os.urandom(24) #to use flask.flash
+    # Sessions are signed with this key: every worker process must use the same one
+    secret_key = os.environ.get("SECRET_KEY")
+    if not secret_key:
+        print("SECRET_KEY is not set, using a random key (sessions end on restart)")
+        secret_key = os.urandom(24)
+    app.config["SECRET_KEY"] = secret_key #to use flask.flash
 
     app.config['PERMANENT_SESSION_LIFETIME'] = 3600
     
@@ -48,6 +58,19 @@ def create_app():
     app.register_blueprint(producer_price_bp)
     app.register_blueprint(price_statistics_bp)
     app.register_blueprint(investments_bp)
+
+    # option_list() template global: cached filter widget fragments
+    init_fragments(app)
+
+    # Hashed static URLs with long caching, gzip / brotli responses
+    init_assets(app)
+    init_compression(app)
+
+    # ?_profile=1 on any page of an admin session, results at /_profile/<id>
+    init_profiler(app)
+
+    # Database keepalive and start-up warm-up of the caches (Neon cold starts)
+    init_keepalive(app)
     return app
 
 
@@ -0,0 +1,137 @@
+"""
+Static assets: content-hashed URLs, long-lived caching and precompressed files.
+
+url_for('static', filename=...) gets a ?v=<content hash> argument, so a
+response for a versioned URL never changes and is cached for a year.
+Files precompressed by the build step are served to clients accepting
+their encoding:
+
+    python assets.py        # writes <file>.gz (and <file>.br with Brotli)
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import sys
+import threading
+
+from flask import request, send_from_directory
+from werkzeug.security import safe_join
+
+from compression import COMPRESSIBLE_TYPES, MIN_SIZE, accepted_encoding, brotli
+
+STATIC_MAX_AGE = 365 * 24 * 3600
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+# Encoding -> file suffix of the precompressed variant
+PRECOMPRESSED = {"br": ".br", "gzip": ".gz"}
+
+_hashes = {}
+_hashes_lock = threading.Lock()
+
+
+def asset_hash(static_folder, filename):
+    """Short content hash of a static file (None if it does not exist)"""
+    path = safe_join(static_folder, filename)
+    try:
+        mtime = os.path.getmtime(path)
+    except (OSError, TypeError):
+        return None
+
+    cached = _hashes.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:12]
+    with _hashes_lock:
+        _hashes[path] = (mtime, digest)
+    return digest
+
+
+def _precompressed_response(static_folder, filename):
+    """Precompressed variant of a static file, if the client accepts one that was built"""
+    encoding = accepted_encoding()
+    if encoding == "br" and not _is_fresh(static_folder, filename, "br"):
+        encoding = "gzip" if request.accept_encodings["gzip"] else None
+    if encoding is None or not _is_fresh(static_folder, filename, encoding):
+        return None
+
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    response = send_from_directory(static_folder, filename + PRECOMPRESSED[encoding], mimetype=mimetype)
+    response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def _is_fresh(static_folder, filename, encoding):
+    """The precompressed file exists and is not older than the source"""
+    source = safe_join(static_folder, filename)
+    if source is None:
+        return False
+    try:
+        return os.path.getmtime(source + PRECOMPRESSED[encoding]) >= os.path.getmtime(source)
+    except OSError:
+        return False
+
+
+def init_assets(app):
+    @app.url_defaults
+    def hashed_static_url(endpoint, values):
+        if endpoint == "static" and "filename" in values and "v" not in values:
+            digest = asset_hash(app.static_folder, values["filename"])
+            if digest:
+                values["v"] = digest
+
+    @app.before_request
+    def serve_precompressed():
+        if request.endpoint == "static" and request.method == "GET":
+            return _precompressed_response(app.static_folder, request.view_args["filename"])
+
+    @app.after_request
+    def cache_static(response):
+        if request.endpoint != "static":
+            return response
+        response.vary.add("Accept-Encoding")
+        filename = request.view_args["filename"]
+        if request.args.get("v") and request.args["v"] == asset_hash(app.static_folder, filename):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = STATIC_MAX_AGE
+            response.cache_control.immutable = True
+        else:
+            # Unversioned URL: the file may change, let the browser revalidate
+            response.cache_control.no_cache = True
+        return response
+
+
+def precompress(static_dir=STATIC_DIR):
+    """Build step: writes the .gz / .br variants of the compressible static files"""
+    written = []
+    for root, _, files in os.walk(static_dir):
+        for name in files:
+            if name.endswith(tuple(PRECOMPRESSED.values())):
+                continue
+            path = os.path.join(root, name)
+            if mimetypes.guess_type(name)[0] not in COMPRESSIBLE_TYPES or os.path.getsize(path) < MIN_SIZE:
+                continue
+            with open(path, "rb") as f:
+                data = f.read()
+            # mtime=0 keeps the output identical between builds
+            variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variants[".br"] = brotli.compress(data, quality=11)
+            for suffix, compressed in variants.items():
+                with open(path + suffix, "wb") as f:
+                    f.write(compressed)
+                written.append((path + suffix, len(data), len(compressed)))
+    return written
+
+
+if __name__ == "__main__":
+    directory = sys.argv[1] if len(sys.argv) > 1 else STATIC_DIR
+    for path, size, compressed in precompress(directory):
+        print(f"{os.path.relpath(path, directory)}: {size} -> {compressed} bytes")
+    if brotli is None:
+        print("Brotli is not installed, only gzip files were written")
@@ -0,0 +1,8 @@
+"""
+Benchmark suite: synthetic data at a configurable scale and a runner that
+drives every page of the Flask app against it.
+
+    python -m bench.datagen --preset medium      # fill the DATABASE_URL database
+    python -m bench.run --preset small           # throwaway Postgres, load, run
+    python -m bench.compare old.json new.json    # latency / query deltas
+"""
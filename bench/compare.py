@@ -0,0 +1,71 @@
+"""
+Compares two bench.run reports URL by URL.
+
+    python -m bench.compare bench/results/before.json bench/results/after.json
+
+Latency changes smaller than --threshold percent are not flagged.
+"""
+import argparse
+import json
+import sys
+
+METRICS = ["p50_ms", "p95_ms", "p99_ms", "queries_first", "db_ms_mean"]
+
+
+def _change(old, new):
+    if old in (None, 0):
+        return None
+    return (new - old) / old * 100
+
+
+def compare(before, after, threshold=10.0):
+    """Rows of (url, {metric: (old, new, change %)}, flag) for the URLs of both reports"""
+    old_routes = {route["url"]: route for route in before["routes"]}
+    rows = []
+    for route in after["routes"]:
+        old = old_routes.get(route["url"])
+        if old is None:
+            continue
+        metrics = {m: (old.get(m), route.get(m), _change(old.get(m), route.get(m))) for m in METRICS}
+        p50_change = metrics["p50_ms"][2]
+        if p50_change is not None and p50_change <= -threshold:
+            flag = "faster"
+        elif p50_change is not None and p50_change >= threshold:
+            flag = "SLOWER"
+        elif route["queries_first"] != old["queries_first"]:
+            flag = "queries"
+        else:
+            flag = ""
+        rows.append((route["url"], metrics, flag))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="p50 change in percent to flag")
+    args = parser.parse_args(argv)
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    for label, report in (("before", before), ("after", after)):
+        meta = report["meta"]
+        print(f"{label}: {meta.get('git_commit')} {meta.get('started_at')} scale {meta.get('scale')}")
+
+    print(f"{'url':<60} {'p50 before':>11} {'p50 after':>10} {'change':>8} {'queries':>9}")
+    slower = 0
+    for url, metrics, flag in compare(before, after, args.threshold):
+        old_p50, new_p50, change = metrics["p50_ms"]
+        old_q, new_q, _ = metrics["queries_first"]
+        change_text = f"{change:+.1f}%" if change is not None else "-"
+        print(f"{url:<60} {old_p50:>11.2f} {new_p50:>10.2f} {change_text:>8} {old_q:>4}->{new_q:<4} {flag}")
+        slower += flag == "SLOWER"
+    # Non-zero exit status when a page got slower, for use in scripts
+    return 1 if slower else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,359 @@
+"""
+Deterministic synthetic data for every table of schema.sql.
+
+The same scale and seed always produce the same rows. Tables are generated
+in chunks (one country, or CHUNK_ROWS trade rows, at a time) and streamed
+into COPY, so the large preset (50M trade rows) never sits in memory.
+
+    python -m bench.datagen --preset small
+    python -m bench.datagen --preset large --database-url postgresql://...
+    python -m bench.datagen --countries 100 --trade-rows 2000000
+"""
+import argparse
+import io
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+import psycopg2
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "schema.sql")
+
+# crops_per_country: commodities produced (and priced) by each country
+Scale = namedtuple("Scale", ["countries", "commodities", "years", "trade_rows", "crops_per_country", "price_months"])
+
+PRESETS = {
+    "tiny": Scale(20, 30, 5, 20_000, 8, 12),
+    "small": Scale(60, 120, 15, 500_000, 15, 12),
+    "medium": Scale(250, 500, 60, 5_000_000, 40, 12),
+    "large": Scale(250, 500, 60, 50_000_000, 40, 12),
+}
+
+LAST_YEAR = 2025
+CHUNK_ROWS = 100_000
+
+REGIONS = np.array([
+    "Africa", "Northern America", "South America", "Central America", "Eastern Asia",
+    "Southern Asia", "Western Asia", "Europe", "Oceania",
+])
+
+EXPENDITURE_TYPES = [
+    "Total Expenditure (general government)",
+    "Agriculture, forestry, fishing (general government expenditure)",
+    "Environmental protection (general government expenditure)",
+    "Protection of Biodiversity and Landscape (general government expenditure)",
+    "R&D Environmental Protection (general government expenditure)",
+]
+# Share of the total expenditure, per type
+EXPENDITURE_SHARES = [1.0, 0.04, 0.015, 0.004, 0.001]
+
+LAND_TYPES = [
+    "Country area", "Land area", "Inland waters", "Arable land",
+    "Permanent crops", "Permanent meadows and pastures", "Forest land",
+]
+
+PRODUCTION_ELEMENTS = [
+    "Gross Production Value (current thousand US$)",
+    "Gross Production Value (constant 2014-2016 thousand I$)",
+]
+
+# Users table of the login page (not part of schema.sql)
+USERS_TABLE = """
+    CREATE TABLE IF NOT EXISTS USERS (
+        user_id SERIAL PRIMARY KEY,
+        username VARCHAR UNIQUE,
+        password VARCHAR,
+        is_admin BOOLEAN
+    );
+    INSERT INTO USERS (username, password, is_admin)
+    VALUES ('admin', 'admin', TRUE), ('user', 'user', FALSE)
+    ON CONFLICT (username) DO NOTHING;
+"""
+
+
+def _csv(columns):
+    """CSV text of a chunk given as column arrays (string columns are quoted)"""
+    text_columns = []
+    for column in columns:
+        column = np.asarray(column)
+        if column.dtype.kind in "UO":
+            text_columns.append(np.char.add(np.char.add('"', column.astype(str)), '"'))
+        elif column.dtype.kind == "f":
+            text_columns.append(np.round(column, 2).astype(str))
+        else:
+            text_columns.append(column.astype(str))
+    return "".join(",".join(row) + "\n" for row in zip(*text_columns))
+
+
+class _CopyStream(io.TextIOBase):
+    """File object handing the CSV of generated chunks to COPY ... FROM STDIN"""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._buffer = ""
+        self.rows = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            columns = next(self._chunks, None)
+            if columns is None:
+                break
+            self.rows += len(columns[0])
+            self._buffer += _csv(columns)
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+class SyntheticData:
+    """Column chunks of every table for a scale and seed"""
+
+    def __init__(self, scale, seed=1):
+        self.scale = scale
+        self.seed = seed
+        self.years = np.arange(LAST_YEAR - scale.years + 1, LAST_YEAR + 1)
+        self.country_ids = np.arange(1, scale.countries + 1)
+        self.commodity_ids = np.arange(1, scale.commodities + 1)
+
+        rng = self._rng(0)
+        self.population = np.exp(rng.normal(15.5, 1.8, scale.countries)).astype(np.int64) + 1000
+        self.land_area = np.exp(rng.normal(11.5, 1.6, scale.countries)).astype(np.int64) + 100
+        self.regions = REGIONS[rng.integers(0, len(REGIONS), scale.countries)]
+        # USD per tonne of each commodity, and the seasonal peak month of its price
+        self.base_price = np.exp(rng.normal(6.5, 1.0, scale.commodities))
+        self.price_phase = rng.uniform(0, 2 * np.pi, scale.commodities)
+        # Commodities grown by each country
+        crops = min(scale.crops_per_country, scale.commodities)
+        self.crops = np.array([
+            np.sort(rng.choice(self.commodity_ids, crops, replace=False)) for _ in range(scale.countries)
+        ])
+        # A few commodities carry most of the trade
+        weights = 1.0 / np.arange(1, scale.commodities + 1) ** 1.1
+        self.trade_weights = weights / weights.sum()
+
+    def _rng(self, *key):
+        return np.random.default_rng([self.seed, *key])
+
+    # Table name -> (columns, generator method), in foreign key order
+    def tables(self):
+        return [
+            ("countries", ["country_id", "population", "region", "country_name", "land_area_sq_km"],
+             self.countries),
+            ("commodities", ["fao_code", "item_name", "cpc_code"], self.commodities),
+            ("consumer_prices", ["unique_id", "country_id", "year", "month", "value", "type"],
+             self.consumer_prices),
+            ("investments", ["unique_id", "expenditure_type", "unit", "expenditure_value", "year", "country_id",
+                             "expenditure_musd"],
+             self.investments),
+            ("land_use", ["unique_id", "land_type", "unit", "land_usage_value", "year", "country_id",
+                          "land_usage_1000ha"],
+             self.land_use),
+            ("producer_prices", ["unique_id", "country_id", "commodity_id", "month", "year", "unit", "value"],
+             self.producer_prices),
+            ("production", ["production_id", "country_code", "commodity_code", "year", "unit", "quantity",
+                            "quantity_tonnes"],
+             self.production),
+            ("production_value", ["production_value_id", "production_id", "element", "unit", "value"],
+             self.production_values),
+            ("trade_data_final", ["unique_id", "reporter_code", "partner_code", "item_code", "year",
+                                  "trade_type", "qty_tonnes", "val_1k_usd"], self.trade),
+        ]
+
+    def countries(self):
+        names = np.array([f"Country {i:03d}" for i in self.country_ids])
+        yield [self.country_ids, self.population, self.regions, names, self.land_area]
+
+    def commodities(self):
+        names = np.array([f"Commodity {i:04d}" for i in self.commodity_ids])
+        cpc = np.array([f"{100 + i:05d}" for i in self.commodity_ids])
+        yield [self.commodity_ids, names, cpc]
+
+    def consumer_prices(self):
+        years, months, types = np.meshgrid(self.years, np.arange(1, 13), [1, 2], indexing="ij")
+        years, months, types = years.ravel(), months.ravel(), types.ravel()
+        per_country = len(years)
+        for i, country_id in enumerate(self.country_ids):
+            rng = self._rng(3, i)
+            inflation = rng.uniform(1.005, 1.08)
+            value = 100 * inflation ** (years - 2015 + (months - 1) / 12) * rng.normal(1, 0.01, per_country)
+            ids = i * per_country + np.arange(1, per_country + 1)
+            yield [ids, np.full(per_country, country_id), years, months, value, types]
+
+    def investments(self):
+        years, kinds = np.meshgrid(self.years, np.arange(len(EXPENDITURE_TYPES)), indexing="ij")
+        years, kinds = years.ravel(), kinds.ravel()
+        per_country = len(years)
+        types = np.array(EXPENDITURE_TYPES)[kinds]
+        for i, country_id in enumerate(self.country_ids):
+            rng = self._rng(4, i)
+            total = self.population[i] / 1e4 * 1.03 ** (years - LAST_YEAR)
+            value = total * np.array(EXPENDITURE_SHARES)[kinds] * rng.uniform(0.6, 1.4, per_country)
+            ids = i * per_country + np.arange(1, per_country + 1)
+            # Already in the canonical units (units.py): the converted column is the value itself
+            yield [ids, types, np.full(per_country, "Million USD"), value, years, np.full(per_country, country_id),
+                   value]
+
+    def land_use(self):
+        per_country = len(self.years) * len(LAND_TYPES)
+        for i, country_id in enumerate(self.country_ids):
+            rng = self._rng(5, i)
+            # 1000 ha; land types add up to less than the land area
+            country_area = self.land_area[i] / 10
+            land = country_area * rng.uniform(0.9, 0.99)
+            shares = rng.dirichlet([3, 0.5, 3, 4, 2]) * rng.uniform(0.8, 0.98)
+            drift = 1 + np.outer(self.years - LAST_YEAR, rng.normal(0, 0.002, 4))
+            values = np.column_stack([
+                np.full(len(self.years), country_area),
+                np.full(len(self.years), land),
+                np.full(len(self.years), country_area - land),
+                land * shares[:4] * drift,
+            ])
+            ids = i * per_country + np.arange(1, per_country + 1)
+            yield [
+                ids,
+                np.tile(np.array(LAND_TYPES), len(self.years)),
+                np.full(per_country, "1000 ha"),
+                values.ravel(),
+                np.repeat(self.years, len(LAND_TYPES)),
+                np.full(per_country, country_id),
+                values.ravel(),
+            ]
+
+    def producer_prices(self):
+        crops = self.crops.shape[1]
+        commodities, years, months = np.meshgrid(
+            np.arange(crops), self.years, np.arange(1, self.scale.price_months + 1), indexing="ij")
+        commodities, years, months = commodities.ravel(), years.ravel(), months.ravel()
+        per_country = len(years)
+        for i, country_id in enumerate(self.country_ids):
+            rng = self._rng(6, i)
+            commodity_ids = self.crops[i][commodities]
+            index = commodity_ids - 1
+            seasonal = 1 + 0.1 * np.sin(2 * np.pi * months / 12 + self.price_phase[index])
+            value = (self.base_price[index] * rng.uniform(0.5, 2.0) * 1.02 ** (years - LAST_YEAR)
+                     * seasonal * rng.normal(1, 0.05, per_country))
+            ids = i * per_country + np.arange(1, per_country + 1)
+            yield [ids, np.full(per_country, country_id), commodity_ids, months, years,
+                   np.full(per_country, "USD/tonne"), value]
+
+    def _production_chunk(self, i):
+        """(production ids, commodity ids, years, quantities) of a country"""
+        commodities, years = np.meshgrid(self.crops[i], self.years, indexing="ij")
+        commodities, years = commodities.ravel(), years.ravel()
+        rng = self._rng(7, i)
+        quantity = np.exp(rng.normal(10, 2, len(self.crops[i])))
+        quantity = np.repeat(quantity, len(self.years)) * 1.01 ** (years - LAST_YEAR) * rng.normal(1, 0.08, len(years))
+        ids = i * len(years) + np.arange(1, len(years) + 1)
+        return ids, commodities, years, np.abs(quantity)
+
+    def production(self):
+        for i, country_id in enumerate(self.country_ids):
+            ids, commodities, years, quantity = self._production_chunk(i)
+            yield [ids, np.full(len(ids), country_id), commodities, years, np.full(len(ids), "t"), quantity, quantity]
+
+    def production_values(self):
+        for i in range(len(self.country_ids)):
+            ids, commodities, years, quantity = self._production_chunk(i)
+            current = quantity * self.base_price[commodities - 1] / 1000 * 1.02 ** (years - LAST_YEAR)
+            constant = quantity * self.base_price[commodities - 1] / 1000
+            count = len(ids)
+            yield [
+                2 * ids - 1, ids, np.full(count, PRODUCTION_ELEMENTS[0]), np.full(count, "1000 USD"), current,
+            ]
+            yield [
+                2 * ids, ids, np.full(count, PRODUCTION_ELEMENTS[1]), np.full(count, "1000 Int. $"), constant,
+            ]
+
+    def trade(self):
+        n = self.scale.countries
+        for start in range(0, self.scale.trade_rows, CHUNK_ROWS):
+            count = min(CHUNK_ROWS, self.scale.trade_rows - start)
+            rng = self._rng(9, start // CHUNK_ROWS)
+            reporters = rng.integers(0, n, count)
+            partners = (reporters + rng.integers(1, max(n, 2), count)) % n
+            items = rng.choice(self.commodity_ids, count, p=self.trade_weights)
+            qty = np.exp(rng.normal(6, 2.2, count))
+            value = qty * self.base_price[items - 1] / 1000 * rng.uniform(0.7, 1.3, count)
+            yield [
+                start + np.arange(1, count + 1),
+                self.country_ids[reporters],
+                self.country_ids[partners],
+                items,
+                rng.choice(self.years, count),
+                np.where(rng.random(count) < 0.5, "Export", "Import"),
+                qty,
+                value,
+            ]
+
+
+def load(conn, scale, seed=1, schema_path=SCHEMA_PATH, progress=print):
+    """
+    Creates the schema in an empty database and fills it with COPY.
+    Returns {table: {"rows": n, "seconds": s}}.
+    """
+    cursor = conn.cursor()
+    with open(schema_path) as f:
+        cursor.execute(f.read())
+    cursor.execute(USERS_TABLE)
+
+    # Foreign keys are valid by construction: skip their checks while loading (superuser only)
+    cursor.execute("SAVEPOINT load_start")
+    try:
+        cursor.execute("SET LOCAL session_replication_role = replica")
+    except psycopg2.Error:
+        cursor.execute("ROLLBACK TO SAVEPOINT load_start")
+
+    data = SyntheticData(scale, seed)
+    report = {}
+    for table, columns, generate in data.tables():
+        started = time.perf_counter()
+        stream = _CopyStream(generate())
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", stream, size=1 << 20)
+        elapsed = time.perf_counter() - started
+        report[table] = {"rows": stream.rows, "seconds": round(elapsed, 3)}
+        progress(f"{table}: {stream.rows} rows in {elapsed:.1f}s")
+    conn.commit()
+
+    started = time.perf_counter()
+    cursor.execute("REFRESH MATERIALIZED VIEW price_production_facts")
+    cursor.execute("ANALYZE")
+    conn.commit()
+    progress(f"fact view refresh and ANALYZE in {time.perf_counter() - started:.1f}s")
+    cursor.close()
+    return report
+
+
+def scale_from_args(args):
+    """Preset of the command line with the explicitly given sizes replacing its values"""
+    scale = PRESETS[args.preset]
+    overrides = {field: getattr(args, field) for field in Scale._fields if getattr(args, field) is not None}
+    return scale._replace(**overrides)
+
+
+def add_scale_arguments(parser):
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="small")
+    parser.add_argument("--seed", type=int, default=1)
+    for field in Scale._fields:
+        parser.add_argument(f"--{field.replace('_', '-')}", dest=field, type=int)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill an empty database with synthetic data")
+    add_scale_arguments(parser)
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL"))
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("--database-url or DATABASE_URL is required")
+
+    scale = scale_from_args(args)
+    print(f"Loading {scale} (seed {args.seed})")
+    conn = psycopg2.connect(args.database_url)
+    try:
+        load(conn, scale, args.seed)
+    finally:
+        conn.close()
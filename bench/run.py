@@ -0,0 +1,353 @@
+"""
+Benchmark runner: every GET page of the blueprints in routes/, driven
+through the Flask test client against synthetic data.
+
+By default a throwaway Postgres (initdb + pg_ctl from PATH or --pg-bin) is
+started in a temporary directory, loaded with bench.datagen and removed at
+the end. Give --database-url to run against an existing database instead
+(add --skip-load if it is already filled).
+
+Every URL is requested --requests times as a logged-in admin. The report has
+p50 / p95 / p99 latency, queries and DB time per request (counted on the
+request thread through an instrumented psycopg2 connection), and is written
+as JSON for bench.compare.
+
+    python -m bench.run --preset small --requests 20
+    python -m bench.run --database-url postgresql://... --skip-load --only trades
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import psycopg2
+import psycopg2.extensions
+from flask import url_for
+
+from bench.datagen import LAST_YEAR, add_scale_arguments, load, scale_from_args
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# logout would end the session of the benchmark; the production detail pages
+# have no template (nothing links to them) and only render their error page
+SKIPPED_ENDPOINTS = {
+    "static", "auth.logout", "main.profile",
+    "prod.production_detail", "prod_val.production_value_detail",
+}
+
+# Query strings requested for an endpoint (default: none). {country}, {year}
+# and {commodity} are replaced with values that exist in the generated data.
+ROUTE_ARGS = {
+    "trade.trade_data_final_dashboard": [
+        {},
+        {"reporter_country": "{country}", "year": "{year}"},
+        {"commodity": "{commodity}", "sort": "qty_asc", "page": "5"},
+    ],
+    "landuse.landUsePage": [{"year": "{year}"}, {"year": "{year}", "country_id": "{country}"}],
+    "landuse.country_timeline": [{"country_id": "{country}"}],
+    "landuse.country_timeline_chart": [{"country_id": "{country}"}],
+    "landuse.edit_land_use_form": [{"country_id": "{country}", "year": "{year}"}],
+    "landuse.land_efficiency_analysis": [{"year": "{year}"}],
+    "investments.investmentsPage": [{"year": "{year}"}],
+    "investments.country_timeline": [{"country_id": "{country}"}],
+    "investments.country_timeline_chart": [{"country_id": "{country}"}],
+    "investments.edit_investment_form": [{"country_id": "{country}", "year": "{year}"}],
+    "consumer_price.consumer_prices_dashboard": [{}, {"country": "{country}", "year_from": "{year}"}],
+    "consumer_price.consumer_prices_inflation": [{"country": "{country}"}],
+    "consumer_price.edit_consumer_price_form": [{"id": "1"}],
+    "producer_price.producer_prices_dashboard": [{}, {"commodity": "{commodity}"}],
+    "producer_price.edit_producer_price_form": [{"id": "1"}],
+    "price_statistics.price_statistics_dashboard": [{}, {"commodity": "{commodity}"}],
+}
+
+# Values of URL parameters; a list requests every value
+PATH_VALUES = {
+    "country_id": "{country}",
+    "fao_code": "{commodity}",
+    "production_id": "1",
+    "production_value_id": "1",
+}
+
+
+# ---------------------------------------------------------------------------
+# Query counting
+
+_request_stats = threading.local()
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+def _timed(method, counts_query):
+    def wrapper(self, *args, **kwargs):
+        stats = getattr(_request_stats, "current", None)
+        started = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            if stats is not None:
+                stats.seconds += time.perf_counter() - started
+                stats.queries += counts_query
+    return wrapper
+
+
+_timed_cursor_classes = {}
+
+
+def _timed_cursor_class(base):
+    """Subclass of a cursor class timing execute and fetches"""
+    cls = _timed_cursor_classes.get(base)
+    if cls is None:
+        cls = _timed_cursor_classes[base] = type(f"Timed{base.__name__}", (base,), {
+            "execute": _timed(base.execute, 1),
+            "fetchone": _timed(base.fetchone, 0),
+            "fetchmany": _timed(base.fetchmany, 0),
+            "fetchall": _timed(base.fetchall, 0),
+        })
+    return cls
+
+
+class TimedConnection(psycopg2.extensions.connection):
+    """Connection whose cursors report to the stats of the current thread"""
+
+    def cursor(self, *args, **kwargs):
+        base = kwargs.get("cursor_factory") or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs["cursor_factory"] = _timed_cursor_class(base)
+        return super().cursor(*args, **kwargs)
+
+
+# ---------------------------------------------------------------------------
+# Throwaway Postgres
+
+class ThrowawayPostgres:
+    """Postgres cluster in a temporary directory, reachable through its Unix socket"""
+
+    def __init__(self, bin_dir=None):
+        self.bin_dir = bin_dir
+        self.directory = None
+        self.url = None
+
+    def _binary(self, name):
+        path = os.path.join(self.bin_dir, name) if self.bin_dir else shutil.which(name)
+        if not path or not os.path.exists(path):
+            raise RuntimeError(f"{name} not found: install PostgreSQL, pass --pg-bin or use --database-url")
+        return path
+
+    def __enter__(self):
+        self.directory = tempfile.mkdtemp(prefix="zlatan-bench-")
+        data = os.path.join(self.directory, "data")
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        try:
+            subprocess.run([self._binary("initdb"), "-D", data, "-U", "bench", "-A", "trust", "-E", "UTF8",
+                            "--no-sync"], check=True, stdout=subprocess.DEVNULL)
+            # Durability is irrelevant for benchmark data
+            options = (f"-p {port} -k {self.directory} -c listen_addresses='' -c fsync=off "
+                       "-c synchronous_commit=off -c full_page_writes=off")
+            subprocess.run([self._binary("pg_ctl"), "-D", data, "-o", options, "-w",
+                            "-l", os.path.join(self.directory, "postgres.log"), "start"],
+                           check=True, stdout=subprocess.DEVNULL)
+        except BaseException:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            raise
+
+        base = f"postgresql://bench@/{{}}?host={self.directory}&port={port}"
+        conn = psycopg2.connect(base.format("postgres"))
+        conn.autocommit = True
+        conn.cursor().execute("CREATE DATABASE bench")
+        conn.close()
+        self.url = base.format("bench")
+        return self.url
+
+    def __exit__(self, *exc):
+        subprocess.run([self._binary("pg_ctl"), "-D", os.path.join(self.directory, "data"),
+                        "-m", "immediate", "stop"], stdout=subprocess.DEVNULL)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+# ---------------------------------------------------------------------------
+# Runner
+
+def _fill(value, samples):
+    return value.format(**samples) if isinstance(value, str) else value
+
+
+def bench_targets(app, samples, only=None):
+    """(endpoint, url) pairs of every GET page of the app"""
+    from queries import TRADE_CHART_SHAPERS
+
+    path_values = dict(PATH_VALUES, name=sorted(TRADE_CHART_SHAPERS))
+    targets = []
+    with app.test_request_context():
+        for rule in sorted(app.url_map.iter_rules(), key=lambda r: r.rule):
+            if rule.endpoint in SKIPPED_ENDPOINTS or "GET" not in rule.methods:
+                continue
+            # Expand list-valued URL parameters (e.g. every chart name)
+            variants = [{}]
+            for argument in rule.arguments:
+                values = path_values.get(argument)
+                if values is None:
+                    break
+                values = values if isinstance(values, list) else [values]
+                variants = [dict(v, **{argument: _fill(value, samples)}) for v in variants for value in values]
+            else:
+                for path_args in variants:
+                    for query in ROUTE_ARGS.get(rule.endpoint, [{}]):
+                        query = {key: _fill(value, samples) for key, value in query.items()}
+                        url = url_for(rule.endpoint, **path_args, **query)
+                        if not only or any(part in url for part in only):
+                            targets.append((rule.endpoint, url))
+                continue
+            print(f"Skipping {rule.rule}: no sample value for its parameters")
+    return targets
+
+
+def _percentile(values, q):
+    return round(float(np.percentile(values, q)), 2)
+
+
+def measure(client, url, requests):
+    """Latency, query count and DB time of every request of a URL"""
+    latencies, queries, db_times = [], [], []
+    status = None
+    for _ in range(requests):
+        stats = _request_stats.current = RequestStats()
+        started = time.perf_counter()
+        response = client.get(url)
+        # Streamed pages run their queries while the body is read
+        response.get_data()
+        response.close()
+        latencies.append((time.perf_counter() - started) * 1000)
+        _request_stats.current = None
+        queries.append(stats.queries)
+        db_times.append(stats.seconds * 1000)
+        status = response.status_code
+
+    return {
+        "status": status,
+        "requests": requests,
+        "first_ms": round(latencies[0], 2),
+        "p50_ms": _percentile(latencies, 50),
+        "p95_ms": _percentile(latencies, 95),
+        "p99_ms": _percentile(latencies, 99),
+        "mean_ms": round(float(np.mean(latencies)), 2),
+        "queries_first": queries[0],
+        "queries_mean": round(float(np.mean(queries)), 2),
+        "db_ms_mean": round(float(np.mean(db_times)), 2),
+        "db_ms_first": round(db_times[0], 2),
+    }
+
+
+def run(database_url, scale, seed, requests, only=None, no_cache=False):
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("SECRET_KEY", "bench")
+    # Nothing may query in the background of the measured requests
+    os.environ["DB_WARMUP"] = "0"
+    os.environ["DB_KEEPALIVE_INTERVAL"] = "0"
+    os.environ["DB_KEEPALIVE_PER_WORKER"] = "1"
+    if no_cache:
+        os.environ["RESULT_CACHE_BACKEND"] = "none"
+
+    import database
+    from app import create_app
+
+    database.set_connection_factory(TimedConnection)
+    database.init_pool(minconn=1, maxconn=4)
+    app = create_app()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["logged_in"] = True
+        session["username"] = "admin"
+        session["is_admin"] = True
+
+    samples = {
+        "country": "1",
+        "year": str(LAST_YEAR),
+        "commodity": "1",
+    }
+    results = []
+    try:
+        for endpoint, url in bench_targets(app, samples, only):
+            result = measure(client, url, requests)
+            result.update(endpoint=endpoint, url=url)
+            results.append(result)
+            print(f"{result['status']} {url:<70} p50 {result['p50_ms']:>9.2f} ms  "
+                  f"p95 {result['p95_ms']:>9.2f} ms  queries {result['queries_first']:>3}  "
+                  f"db {result['db_ms_first']:>9.2f} ms")
+    finally:
+        database.close_pool()
+
+    return {
+        "meta": {
+            "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "scale": scale._asdict(),
+            "seed": seed,
+            "requests": requests,
+            "result_cache": not no_cache,
+        },
+        "routes": results,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every page against synthetic data")
+    add_scale_arguments(parser)
+    parser.add_argument("--database-url", help="existing database instead of a throwaway Postgres")
+    parser.add_argument("--skip-load", action="store_true", help="the database is already loaded")
+    parser.add_argument("--pg-bin", help="directory of initdb / pg_ctl")
+    parser.add_argument("--requests", type=int, default=20, help="requests per URL")
+    parser.add_argument("--only", action="append", help="only URLs containing this text (repeatable)")
+    parser.add_argument("--no-cache", action="store_true", help="disable the result cache")
+    parser.add_argument("--output", help="JSON report path (default: bench/results/<time>.json)")
+    args = parser.parse_args(argv)
+
+    scale = scale_from_args(args)
+    server = contextlib.nullcontext(args.database_url) if args.database_url else ThrowawayPostgres(args.pg_bin)
+    with server as database_url:
+        if not args.skip_load:
+            print(f"Loading {scale} (seed {args.seed})")
+            conn = psycopg2.connect(database_url)
+            try:
+                load_report = load(conn, scale, args.seed)
+            finally:
+                conn.close()
+        else:
+            load_report = None
+        report = run(database_url, scale, args.seed, args.requests, args.only, args.no_cache)
+        report["meta"]["load"] = load_report
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,359 @@
+"""
+Result cache for read-mostly pages.
+
+Entries are keyed on (endpoint, normalized args, write versions of the tables
+the endpoint reads), so a write through database.execute_query makes the old
+entries unreachable without any explicit invalidation. The keys also include
+the deployed code version (release.py), so a deploy does the same. Values are
+pickled, which also bounds every backend by bytes.
+
+Backend is chosen with RESULT_CACHE_BACKEND:
+    memory  in-process LRU (default)
+    disk    files under RESULT_CACHE_DIR, LRU by access time
+    redis   any server speaking the Redis protocol at RESULT_CACHE_URL
+            (bound it with maxmemory + allkeys-lru on the server side)
+    none    caching disabled
+"""
+import collections
+import hashlib
+import os
+import pickle
+import socket
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+
+from dotenv import load_dotenv
+
+from database import table_versions_epoch
+from release import code_version
+from singleflight import flight_key, single_flight
+
+load_dotenv()
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_TTL = 3600
+
+class MemoryBackend:
+    """In-process LRU bounded by the total size of the pickled values"""
+
+    name = "memory"
+    # Entries are private to the process
+    shared = False
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time() + ttl, value)
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, value = self._entries.pop(key)
+        self.size -= len(value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def info(self):
+        return {"entries": len(self._entries), "bytes": self.size, "max_bytes": self.max_bytes,
+                "evictions": self.evictions}
+
+
+class DiskBackend:
+    """One file per entry; the least recently read files are evicted first"""
+
+    name = "disk"
+    # Entries are visible to every worker process
+    shared = True
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".cache")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                expires_at = float(f.readline())
+                value = f.read()
+        except (OSError, ValueError):
+            return None
+        if expires_at < time.time():
+            self._unlink(path)
+            return None
+        # Access time drives the LRU eviction (atime itself is often disabled)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def set(self, key, value, ttl):
+        if len(value) > self.max_bytes:
+            return
+        # Write to a temporary file first so readers never see half an entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(f"{time.time() + ttl}\n".encode())
+            f.write(value)
+        os.replace(tmp_path, self._path(key))
+        self._evict()
+
+    def _files(self):
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".cache"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    def _evict(self):
+        with self._lock:
+            files = self._files()
+            size = sum(f[1] for f in files)
+            for _, file_size, path in sorted(files):
+                if size <= self.max_bytes:
+                    break
+                self._unlink(path)
+                size -= file_size
+                self.evictions += 1
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def clear(self):
+        for _, _, path in self._files():
+            self._unlink(path)
+
+    def info(self):
+        files = self._files()
+        return {"entries": len(files), "bytes": sum(f[1] for f in files), "max_bytes": self.max_bytes,
+                "evictions": self.evictions, "directory": self.directory}
+
+
+class RedisBackend:
+    """
+    Minimal client of the Redis protocol (RESP): GET, SET ... PX, SCAN/DEL.
+    Works with Redis, Valkey, KeyDB or a local stand-in speaking RESP.
+    """
+
+    name = "redis"
+    # Entries are visible to every worker process
+    shared = True
+    prefix = "zlatan:cache:"
+
+    def __init__(self, url, timeout=1.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            conn = self._local.conn = (sock, sock.makefile("rb"))
+            if self.password:
+                self._command("AUTH", self.password)
+            if self.db:
+                self._command("SELECT", self.db)
+        return conn
+
+    def _command(self, *args):
+        sock, reader = self._connection()
+        payload = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            payload.append(f"${len(data)}\r\n".encode() + data + b"\r\n")
+        try:
+            sock.sendall(b"".join(payload))
+            return self._read_reply(reader)
+        except (OSError, ConnectionError):
+            # Drop the broken connection, the next command reconnects
+            self._local.conn = None
+            sock.close()
+            raise
+
+    def _read_reply(self, reader):
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by the cache server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RuntimeError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(rest)
+            return None if length < 0 else [self._read_reply(reader) for _ in range(length)]
+        raise ConnectionError(f"Unexpected reply from the cache server: {line!r}")
+
+    def get(self, key):
+        return self._command("GET", self.prefix + key)
+
+    def set(self, key, value, ttl):
+        self._command("SET", self.prefix + key, value, "PX", int(ttl * 1000))
+
+    def clear(self):
+        cursor = b"0"
+        while True:
+            cursor, keys = self._command("SCAN", cursor, "MATCH", self.prefix + "*", "COUNT", 500)
+            if keys:
+                self._command("DEL", *keys)
+            if cursor in (b"0", "0"):
+                break
+
+    def info(self):
+        return {"server": f"{self.host}:{self.port}/{self.db}"}
+
+
+class ResultCache:
+    """
+    Versioned result cache with per-endpoint hit / miss counters.
+    Backend errors are counted and treated as misses, they never fail a page.
+    """
+
+    def __init__(self, backend, ttl=DEFAULT_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self._metrics = collections.defaultdict(lambda: {"hits": 0, "misses": 0, "errors": 0})
+        self._metrics_lock = threading.Lock()
+
+    def _count(self, endpoint, metric):
+        with self._metrics_lock:
+            self._metrics[endpoint][metric] += 1
+
+    @staticmethod
+    def key(endpoint, args, tables):
+        # Entries of a shared backend (disk / redis) written by an older process,
+        # or by the code of an earlier deploy, must not match
+        raw = f"{table_versions_epoch()}|{code_version()}|{flight_key(endpoint, args, tables)}"
+        return f"{endpoint}-{hashlib.sha1(raw.encode()).hexdigest()}"
+
+    def get_or_compute(self, endpoint, args, tables, compute):
+        """
+        Cached result of compute() for the current table versions.
+        Misses are computed once for concurrent identical requests (single flight).
+        None results (failed queries) are not cached.
+        """
+        if self.backend is None:
+            return single_flight(endpoint, args, tables, compute)
+
+        key = self.key(endpoint, args, tables)
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            print(f"Result cache read error: {e}")
+            self._count(endpoint, "errors")
+            value = None
+
+        if value is not None:
+            self._count(endpoint, "hits")
+            return pickle.loads(value)
+
+        self._count(endpoint, "misses")
+        result = single_flight(endpoint, args, tables, compute)
+        if result is not None:
+            try:
+                self.backend.set(key, pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL), self.ttl)
+            except Exception as e:
+                print(f"Result cache write error: {e}")
+                self._count(endpoint, "errors")
+        return result
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        with self._metrics_lock:
+            endpoints = {name: dict(counts) for name, counts in self._metrics.items()}
+        hits = sum(c["hits"] for c in endpoints.values())
+        misses = sum(c["misses"] for c in endpoints.values())
+        backend_info = {}
+        if self.backend is not None:
+            try:
+                backend_info = self.backend.info()
+            except Exception as e:
+                backend_info = {"error": str(e)}
+        return {
+            "backend": self.backend.name if self.backend is not None else "none",
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / (hits + misses) if hits + misses else None,
+            "endpoints": endpoints,
+            **backend_info,
+        }
+
+
+def _backend_from_env():
+    kind = os.environ.get("RESULT_CACHE_BACKEND", "memory").lower()
+    max_bytes = int(os.environ.get("RESULT_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+    if kind == "none":
+        return None
+    if kind == "disk":
+        directory = os.environ.get("RESULT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "zlatan-result-cache"))
+        return DiskBackend(directory, max_bytes)
+    if kind == "redis":
+        return RedisBackend(os.environ.get("RESULT_CACHE_URL", "redis://localhost:6379/0"))
+    return MemoryBackend(max_bytes)
+
+
+result_cache = ResultCache(_backend_from_env(), ttl=int(os.environ.get("RESULT_CACHE_TTL", DEFAULT_TTL)))
+
+
+def cached_result(endpoint, args, tables, compute):
+    """Shortcut for result_cache.get_or_compute"""
+    return result_cache.get_or_compute(endpoint, args, tables, compute)
@@ -0,0 +1,111 @@
+"""
+Response compression (gzip, or brotli when the Brotli package is installed).
+
+Text responses of at least COMPRESS_MIN_SIZE bytes are compressed for
+clients that accept it. Streamed pages (see streaming.py) are compressed
+chunk by chunk and flushed after each one, so they keep streaming.
+Static files are served precompressed by assets.py instead.
+"""
+import os
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    "text/html",
+    "text/css",
+    "text/plain",
+    "text/javascript",
+    "application/javascript",
+    "application/json",
+    "image/svg+xml",
+}
+
+# Smaller bodies gain nothing from compression
+MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", 500))
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def accepted_encoding():
+    """Best encoding the client accepts: "br", "gzip" or None"""
+    if brotli is not None and request.accept_encodings["br"]:
+        return "br"
+    if request.accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+
+def _compressor(encoding):
+    """(process, flush, finish) functions of a new compressed stream"""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return compressor.process, compressor.flush, compressor.finish
+    # wbits 31: deflate with the gzip header
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def compress(data, encoding):
+    process, _, finish = _compressor(encoding)
+    return process(data) + finish()
+
+
+def _compressed_stream(chunks, encoding, charset="utf-8"):
+    process, flush, finish = _compressor(encoding)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode(charset)
+            data = process(chunk) + flush()
+            if data:
+                yield data
+        yield finish()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def compress_response(response):
+    """after_request hook: compresses the response body when worthwhile"""
+    if (
+        request.method == "HEAD"
+        or response.status_code < 200
+        or response.status_code in (204, 206, 304)
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_TYPES
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = accepted_encoding()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _compressed_stream(response.response, encoding)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < MIN_SIZE:
+            return response
+        response.set_data(compress(data, encoding))
+
+    response.headers["Content-Encoding"] = encoding
+    # The compressed body is another representation of the same page
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app):
+    app.after_request(compress_response)
@@ -0,0 +1,77 @@
+"""
+Conditional GET for read-mostly pages.
+
+The ETag of a page is derived from what it is built from: the request args,
+the write versions of the tables it reads, the logged-in user (pages show the
+user menu) and the deployed code (release.py). It is checked before the view
+runs, so a matching If-None-Match is answered with 304 without any query.
+
+Only complete pages are tagged: not after a failed read (database.read_failures),
+not when the view called mark_incomplete, and not when streamed, since a
+streamed page's reads fail after its headers are sent.
+
+Responses are marked private: they contain the user menu, so only the
+browser may keep them, and it must revalidate on every use.
+"""
+import hashlib
+from functools import wraps
+
+from flask import g, make_response, request, session
+
+from database import read_failures, table_versions_epoch
+from release import code_version
+from singleflight import flight_key
+
+
+def page_etag(endpoint, tables):
+    """ETag of the current request for a page reading the given tables"""
+    user = (session.get("username"), bool(session.get("logged_in")), bool(session.get("is_admin")))
+    # URL parameters (e.g. the chart name) are part of the request like the query string
+    args = {**dict(request.args.lists()), **(request.view_args or {})}
+    raw = "|".join([
+        table_versions_epoch(),
+        code_version(),
+        repr(user),
+        flight_key(endpoint, args, tables),
+    ])
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def mark_incomplete():
+    """Keeps the current page from being tagged, e.g. when it shows fallback data"""
+    g.incomplete_page = True
+
+
+def conditional_get(*tables):
+    """
+    Answers 304 Not Modified when the client already has the current page.
+    Put it below login_required so redirects to the login page are never tagged.
+    Pages with pending flash messages are always rendered (and not tagged),
+    since the message is shown only once.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != "GET" or session.get("_flashes"):
+                return view(*args, **kwargs)
+
+            etag = page_etag(request.endpoint, tables)
+            # Weak comparison: compressed responses carry the ETag as W/"..."
+            if request.if_none_match.contains_weak(etag):
+                response = make_response("", 304)
+            else:
+                failures = read_failures()
+                response = make_response(view(*args, **kwargs))
+                # Errors are reported with a flash message: do not tag those pages
+                if response.status_code != 200 or session.get("_flashes"):
+                    return response
+                # Otherwise a degraded page would be revalidated until the next write
+                if read_failures() != failures or g.get("incomplete_page") or response.is_streamed:
+                    return response
+
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = "private, no-cache"
+            response.vary.add("Cookie")
+            return response
+        return wrapper
+    return decorator
@@ -1,10 +1,158 @@
 import os
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
 import psycopg2
+from psycopg2 import pool
 from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
 
+import journal
+
 load_dotenv()
 
+# Every committed write is appended to this file (SQL text only, see journal.py)
+SQL_LOG_PATH = "log.sql"
+
+# Per-table write counters, bumped by execute_query after every commit.
+# Caches built on top of a table compare the counter instead of re-reading it.
+_table_versions = {}
+_table_versions_lock = threading.Lock()
+
+_WRITE_TARGET_RE = re.compile(
+    r"^\s*(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM)\s+([A-Za-z_][A-Za-z0-9_]*)",
+    re.IGNORECASE,
+)
+
+
+# With several worker processes the counters are also kept in TABLE_VERSIONS
+# (see schema.sql), so a write served by one worker invalidates the others.
+_shared_versions = False
+_shared_refresh_interval = 1.0
+_shared_synced_at = 0.0
+_shared_sync_lock = threading.Lock()
+
+_BUMP_SHARED_VERSION = """
+    INSERT INTO TABLE_VERSIONS (table_name, version) VALUES (%s, 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = TABLE_VERSIONS.version + 1
+    RETURNING version
+"""
+
+# Per-process connection pool, created by init_pool() (after fork when
+# running under gunicorn). Without it every query opens its own connection.
+_pool = None
+_pool_pid = None
+
+# psycopg2 connection class of every new connection (None: the default one).
+# The benchmark runner installs an instrumented class, see bench/run.py
+_connection_factory = None
+
+
+def use_shared_table_versions(refresh_interval=1.0):
+    """
+    Keeps table versions in the TABLE_VERSIONS table so that all worker
+    processes see each other's writes (at most refresh_interval seconds late).
+    """
+    global _shared_versions, _shared_refresh_interval
+    _shared_refresh_interval = refresh_interval
+    _shared_versions = True
+
+
+def shared_table_versions_enabled():
+    return _shared_versions
+
+
+# Without shared versions the counters restart at 0 with the process
+_PROCESS_EPOCH = uuid.uuid4().hex
+
+
+def table_versions_epoch():
+    """
+    Scope of the version counters: keys built from them (cache entries,
+    ETags) are only comparable within the same epoch.
+    """
+    return "shared" if _shared_versions else _PROCESS_EPOCH
+
+
+def _set_table_versions(versions):
+    with _table_versions_lock:
+        for key, version in versions.items():
+            if version > _table_versions.get(key, 0):
+                _table_versions[key] = version
+
+
+def _sync_table_versions():
+    global _shared_synced_at
+    if time.monotonic() - _shared_synced_at < _shared_refresh_interval:
+        return
+    # One thread syncs, the others keep using the current counters
+    if not _shared_sync_lock.acquire(blocking=False):
+        return
+    try:
+        rows = fetch_query("SELECT table_name, version FROM TABLE_VERSIONS")
+        if rows is not None:
+            _set_table_versions({r["table_name"]: r["version"] for r in rows})
+        _shared_synced_at = time.monotonic()
+    finally:
+        _shared_sync_lock.release()
+
+
+def get_table_version(table):
+    """
+    Returns the current write version of a table (0 if never written).
+    """
+    if _shared_versions:
+        _sync_table_versions()
+    return _table_versions.get(table.lower(), 0)
+
+
+def _bump_versions(cursor, tables):
+    """
+    Bumps the versions of the written tables. Inside the write transaction
+    when versions are shared, so the counter moves together with the data.
+    """
+    if not _shared_versions:
+        return {}
+    versions = {}
+    for table in tables:
+        cursor.execute(_BUMP_SHARED_VERSION, (table,))
+        versions[table] = cursor.fetchone()[0]
+    return versions
+
+
+def bump_table_version(table):
+    """
+    Marks a table as modified so that cached results depending on it are rebuilt.
+    """
+    key = table.lower()
+    if _shared_versions:
+        conn, pooled = _acquire_connection()
+        try:
+            cursor = conn.cursor()
+            versions = _bump_versions(cursor, [key])
+            conn.commit()
+            cursor.close()
+        finally:
+            _release_connection(conn, pooled)
+        _set_table_versions(versions)
+        return versions[key]
+
+    with _table_versions_lock:
+        _table_versions[key] = _table_versions.get(key, 0) + 1
+        return _table_versions[key]
+
+
+def set_connection_factory(factory):
+    """
+    Uses a psycopg2 connection subclass for the connections opened from now on
+    (call before init_pool).
+    """
+    global _connection_factory
+    _connection_factory = factory
+
+
 def get_db_connection():
     """
     Establishes a connection to the PostgreSQL database
@@ -13,17 +161,142 @@ def get_db_connection():
     db_url = os.environ.get("DATABASE_URL")
     if not db_url:
         raise ValueError("DATABASE_URL environment variable is not set!")
-    conn = psycopg2.connect(db_url)
+    conn = psycopg2.connect(db_url, connection_factory=_connection_factory)
     return conn
 
 
+def init_pool(minconn=1, maxconn=None):
+    """
+    Creates the connection pool of the current process.
+    Must be called after fork: connections cannot be shared between processes.
+    """
+    global _pool, _pool_pid
+    if maxconn is None:
+        maxconn = int(os.environ.get("DB_POOL_MAX", 10))
+    close_pool()
+    db_url = os.environ.get("DATABASE_URL")
+    if not db_url:
+        raise ValueError("DATABASE_URL environment variable is not set!")
+    _pool = pool.ThreadedConnectionPool(minconn, maxconn, db_url, connection_factory=_connection_factory)
+    _pool_pid = os.getpid()
+
+
+def close_pool():
+    """
+    Closes the pooled connections of the current process.
+    """
+    global _pool, _pool_pid
+    # A pool inherited through fork belongs to the parent: only drop it,
+    # closing would terminate the parent's sessions
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.closeall()
+    _pool = None
+    _pool_pid = None
+
+
+def _acquire_connection():
+    """
+    Returns (connection, pooled). Falls back to a new connection when there
+    is no pool in this process or the pool is exhausted.
+    """
+    if _pool is not None and _pool_pid == os.getpid():
+        try:
+            conn = _pool.getconn()
+            if not conn.closed:
+                return conn, True
+            _pool.putconn(conn, close=True)
+        except pool.PoolError:
+            pass
+    return get_db_connection(), False
+
+
+def _release_connection(conn, pooled):
+    if not pooled:
+        conn.close()
+        return
+    broken = bool(conn.closed)
+    if not broken:
+        try:
+            # Do not hand an open transaction to the next request
+            conn.rollback()
+        except psycopg2.Error:
+            broken = True
+    _pool.putconn(conn, close=broken)
+
+
+@contextmanager
+def pooled_connection():
+    """
+    A connection of the pool (a new one without pool), given back on exit.
+    The caller restores any session setting it changed.
+    """
+    conn, pooled = _acquire_connection()
+    try:
+        yield conn
+    finally:
+        _release_connection(conn, pooled)
+
+
+def ping_connections(count=1, query="SELECT 1"):
+    """
+    Runs query on up to count pooled connections held at the same time, so
+    that many connections are open and recently used (see keepalive.py).
+    Returns the latency of each ping in seconds, connection included.
+    Without a pool in this process a single new connection is used.
+    """
+    if _pool is None or _pool_pid != os.getpid():
+        count = 1
+    held = []
+    latencies = []
+    try:
+        for _ in range(count):
+            started = time.perf_counter()
+            if _pool is not None and _pool_pid == os.getpid():
+                try:
+                    held.append((_pool.getconn(), True))
+                except pool.PoolError:
+                    # Every connection is in use, so none of them is idle
+                    break
+            else:
+                held.append((get_db_connection(), False))
+            cursor = held[-1][0].cursor()
+            cursor.execute(query)
+            if cursor.description:
+                cursor.fetchall()
+            cursor.close()
+            latencies.append(time.perf_counter() - started)
+    finally:
+        # Broken connections are closed by the pool and reopened on next use
+        for conn, pooled in held:
+            _release_connection(conn, pooled)
+    return latencies
+
+
+# Reads that failed in the current thread (request), see read_failures
+_failed_reads = threading.local()
+
+
+def record_read_failures(count=1):
+    """Counts failed reads, also those of a computation shared with this request"""
+    _failed_reads.count = read_failures() + count
+
+
+def read_failures():
+    """
+    Number of reads (fetch_query, fetch_columns, RowStream) that failed in
+    the current thread so far: a page built after one is incomplete.
+    """
+    return getattr(_failed_reads, "count", 0)
+
+
 def fetch_query(query, params=()):
     """
     Executes a SELECT query and returns the results as a list of dictionaries.
     """
     conn = None
+    pooled = False
     try:
-        conn = get_db_connection()
+        conn, pooled = _acquire_connection()
         # Use RealDictCursor to get results as dictionaries
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         cursor.execute(query, params)
@@ -33,44 +306,246 @@ def fetch_query(query, params=()):
     except Exception as e:
         # It's good practice to log the error
         print(f"Database fetch error: {e}")
+        record_read_failures()
         return None # Or raise the exception
     finally:
         if conn:
-            conn.close()
+            _release_connection(conn, pooled)
+
+
+def fetch_queries(queries):
+    """
+    Runs a {name: (query, params)} set (see queries.py) one query after the
+    other and returns {name: rows}.
+    """
+    return {name: fetch_query(query, params) for name, (query, params) in queries.items()}
+
+
+def fetch_columns(query, params=(), batch_size=50000):
+    """
+    Executes a SELECT and returns {column: [values]}, read batch_size rows at
+    a time through a server-side cursor, for column-wise (numpy) processing
+    of whole tables. None on error.
+    """
+    conn = None
+    pooled = False
+    try:
+        conn, pooled = _acquire_connection()
+        cursor = conn.cursor(name=f"columns_{uuid.uuid4().hex}")
+        cursor.itersize = batch_size
+        cursor.execute(query, params)
+        rows = []
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            rows.extend(batch)
+        names = [column[0] for column in cursor.description]
+        cursor.close()
+        return {name: list(values) for name, values in zip(names, zip(*rows))} if rows else {n: [] for n in names}
+    except Exception as e:
+        print(f"Database fetch error: {e}")
+        record_read_failures()
+        return None
+    finally:
+        if conn:
+            _release_connection(conn, pooled)
+
+
+class RowStream:
+    """
+    Rows of a SELECT read through a server-side cursor, batch_size rows at a
+    time, for pages rendered while the rows arrive (see streaming.py).
+    Truthiness is known after the first batch; the rows can be iterated once.
+    transform, if given, is applied to every row. started is set once the
+    first batch is requested.
+    """
+
+    def __init__(self, query, params=(), transform=None, batch_size=500):
+        self.query = query
+        self.params = params
+        self.transform = transform
+        self.batch_size = batch_size
+        self._head = []
+        self._empty = None
+        self.started = False
+        self._rows = self._generate()
+
+    def _generate(self):
+        self.started = True
+        conn = None
+        pooled = False
+        try:
+            conn, pooled = _acquire_connection()
+            # A named cursor keeps the result on the server until it is fetched
+            cursor = conn.cursor(name=f"stream_{uuid.uuid4().hex}", cursor_factory=RealDictCursor)
+            cursor.itersize = self.batch_size
+            cursor.execute(self.query, self.params)
+            while True:
+                rows = cursor.fetchmany(self.batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield self.transform(row) if self.transform else row
+            cursor.close()
+        except Exception as e:
+            # The page is already being sent: end the list instead of failing
+            print(f"Database stream error: {e}")
+            record_read_failures()
+        finally:
+            if conn:
+                _release_connection(conn, pooled)
 
+    def __bool__(self):
+        if self._empty is None:
+            try:
+                self._head.append(next(self._rows))
+                self._empty = False
+            except StopIteration:
+                self._empty = True
+        return not self._empty
 
+    def __iter__(self):
+        while self._head:
+            yield self._head.pop(0)
+        yield from self._rows
+
+    def close(self):
+        """Releases the connection when the rows were not read to the end"""
+        self._rows.close()
+
+
+def stream_query(query, params=(), transform=None, batch_size=500):
+    """
+    Executes a SELECT query lazily and returns its rows as a RowStream.
+    """
+    return RowStream(query, params, transform, batch_size)
 
 
 def execute_query(query, params=()):
     conn = None
+    pooled = False
     try:
-        conn = get_db_connection()
+        conn, pooled = _acquire_connection()
         cursor = conn.cursor()
 
         cursor.execute(query, params)
+        # Get the number of rows affected (before the cursor is reused below)
+        rowcount = cursor.rowcount
+
+        match = _WRITE_TARGET_RE.match(query)
+        written = [match.group(1).lower()] if match else []
+        shared = _bump_versions(cursor, written)
 
         # Commit the changes to make them permanent
         conn.commit()
 
+        if shared:
+            _set_table_versions(shared)
+        else:
+            for table in written:
+                bump_table_version(table)
+
         # Log all SQL execution to the file /log.sql
-        with open("log.sql", "a") as f:
+        with open(SQL_LOG_PATH, "a") as f:
             f.write("\n")
             f.write(f"{query}")
+        journal.record([(query, params)])
 
-        # Get the number of rows affected
-        rowcount = cursor.rowcount
         cursor.close()
         return rowcount
 
     except Exception as e:
         print(f"Database execute error: {e}")
-        if conn:
+        if conn and not conn.closed:
             conn.rollback()  # Roll back the transaction on error
         raise
 
     finally:
         if conn:
-            conn.close()
+            _release_connection(conn, pooled)
+
+def execute_transaction(statements):
+    """
+    Executes several (query, params) statements in a single transaction.
+    Either all of them are committed or none. Returns the list of rowcounts.
+    """
+    conn = None
+    pooled = False
+    try:
+        conn, pooled = _acquire_connection()
+        cursor = conn.cursor()
+
+        rowcounts = []
+        written = set()
+        for query, params in statements:
+            cursor.execute(query, params)
+            rowcounts.append(cursor.rowcount)
+            match = _WRITE_TARGET_RE.match(query)
+            if match:
+                written.add(match.group(1).lower())
+
+        shared = _bump_versions(cursor, sorted(written))
+
+        conn.commit()
+
+        with open(SQL_LOG_PATH, "a") as f:
+            for query, _ in statements:
+                f.write("\n")
+                f.write(f"{query}")
+        journal.record(statements)
+
+        if shared:
+            _set_table_versions(shared)
+        else:
+            for table in written:
+                bump_table_version(table)
+
+        cursor.close()
+        return rowcounts
+
+    except Exception as e:
+        print(f"Database transaction error: {e}")
+        if conn and not conn.closed:
+            conn.rollback()
+        raise
+
+    finally:
+        if conn:
+            _release_connection(conn, pooled)
+
+
+def execute_maintenance(statements):
+    """
+    Executes (query, params) statements that rebuild derived data (fact
+    view refreshes, precomputed summaries) in a single transaction and
+    returns their rowcounts. Unlike execute_transaction nothing is logged to
+    log.sql or journaled and no table version is bumped: the writes they
+    derive from were recorded already, the caller bumps what it rebuilt.
+    """
+    conn = None
+    pooled = False
+    try:
+        conn, pooled = _acquire_connection()
+        cursor = conn.cursor()
+        rowcounts = []
+        for query, params in statements:
+            cursor.execute(query, params)
+            rowcounts.append(cursor.rowcount)
+        conn.commit()
+        cursor.close()
+        return rowcounts
+
+    except Exception as e:
+        print(f"Database maintenance error: {e}")
+        if conn and not conn.closed:
+            conn.rollback()
+        raise
+
+    finally:
+        if conn:
+            _release_connection(conn, pooled)
+
 
 def test_connection():
     try:
@@ -0,0 +1,81 @@
+"""
+Filter compiler of the listing queries (queries.py).
+
+The listings declare their filters as a spec, one Filter per request value:
+
+    TRADE_FILTERS = (
+        Filter("reporters", "tf.reporter_code", "any", "int"),
+        Filter("year_from", "tf.year", ">=", "int"),
+        Filter("search", ("c.item_name ILIKE",), "search", "text"),
+    )
+
+compile_filters(spec, values) turns the values that are set into
+" AND ..." conditions and their params. A list filter is always one
+`column = ANY(%s::type[])` with the values as a single array parameter,
+whatever their number, so the statement text depends only on which filters
+are set (the shape), not on the selection size: one canonical text per
+shape, for the plan cache, prepared statements and pg_stat_statements.
+
+A filter that is given but has no valid value (country=abc) keeps its
+condition and matches nothing, with an empty array or a NULL bound, rather
+than being left out and returning the unfiltered listing.
+"""
+from collections import namedtuple
+
+# key:      key of the filter values
+# column:   SQL expression compared (a tuple of "<expression> <operator>" for search)
+# op:       "any" (one value or a list), ">=" / "<=" (ranges) or "search" (any expression matches)
+# type:     SQL type of the values ("int", "smallint", "text")
+Filter = namedtuple("Filter", ["key", "column", "op", "type"])
+
+_CONVERT = {"int": int, "smallint": int, "bigint": int, "text": str}
+
+
+def _convert(value, sql_type):
+    """value as the Python type of sql_type, None if empty or not convertible"""
+    if value is None or value == "":
+        return None
+    try:
+        return _CONVERT[sql_type](value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _given(value):
+    """Whether a filter value was set (not None, empty or a list of only those)"""
+    values = value if isinstance(value, (list, tuple, set)) else [value]
+    return any(v is not None and v != "" for v in values)
+
+
+def filter_values(value, sql_type):
+    """Converted values of a list (or single) filter value, invalid and empty ones left out"""
+    values = value if isinstance(value, (list, tuple, set)) else [value]
+    converted = [_convert(v, sql_type) for v in values]
+    return [v for v in converted if v is not None]
+
+
+def compile_filters(spec, values):
+    """
+    (clause, params) of the filters of spec that are set in values: the
+    clause is "" or " AND ..." conditions, params the list of their values
+    in spec order
+    """
+    clause = ""
+    params = []
+    for item in spec:
+        value = values.get(item.key)
+        if item.op == "any":
+            if _given(value):
+                clause += f" AND {item.column} = ANY(%s::{item.type}[])"
+                params.append(filter_values(value, item.type))
+        elif item.op in (">=", "<="):
+            if _given(value):
+                clause += f" AND {item.column} {item.op} %s"
+                params.append(_convert(value, item.type))
+        elif item.op == "search":
+            if value:
+                clause += " AND (" + " OR ".join(f"{expression} %s" for expression in item.column) + ")"
+                params.extend([f"%{value}%"] * len(item.column))
+        else:
+            raise ValueError(f"Unknown filter operator: {item.op}")
+    return clause, params
@@ -0,0 +1,106 @@
+"""
+Fragment cache of the filter widgets (country, commodity and year lists).
+
+The items of a widget are rendered once per version of the tables they
+come from (templates/fragments/options.html), with a slot where the
+selected / checked attribute goes. A request only joins the cached pieces
+and marks its selected values:
+
+    {{ option_list("countries", [selected_country_id]) }}
+    {{ option_list("trade_reporters", selected_reporters, "checked") }}
+"""
+from collections import namedtuple
+
+from flask import current_app
+from markupsafe import Markup
+
+from database import fetch_query, get_table_version, table_versions_epoch
+from keepalive import warmup_task
+from queries import COUNTRIES_BY_NAME, TRADE_COMMODITIES, TRADE_COUNTRIES, TRADE_TYPES, TRADE_YEARS
+
+MACROS_TEMPLATE = "fragments/options.html"
+
+# Marks the attribute position in a rendered item; never part of the data
+_SLOT = "\x00"
+
+# items: SQL query or a fixed list of rows; value: column compared with the selected values
+Widget = namedtuple("Widget", ["macro", "items", "tables", "value"])
+
+WIDGETS = {
+    "countries": Widget("country_option", COUNTRIES_BY_NAME, ("countries",), "country_id"),
+    # Year dropdowns of the land use / investment pages
+    "years_1961_2025": Widget("year_option", [{"year": y} for y in range(1961, 2026)], (), "year"),
+    "trade_countries": Widget("trade_country_option", TRADE_COUNTRIES, ("countries",), "country_code"),
+    "trade_commodities": Widget("trade_commodity_option", TRADE_COMMODITIES, ("commodities",), "fao_code"),
+    "trade_types": Widget("trade_type_option", TRADE_TYPES, ("trade_data_final",), "trade_type"),
+    "trade_reporters": Widget("reporter_checkbox", TRADE_COUNTRIES, ("countries",), "country_code"),
+    "trade_partners": Widget("partner_checkbox", TRADE_COUNTRIES, ("countries",), "country_code"),
+    "trade_years": Widget("year_checkbox", TRADE_YEARS, ("trade_data_final",), "year"),
+    "trade_commodity_checkboxes": Widget("commodity_checkbox", TRADE_COMMODITIES, ("commodities",), "fao_code"),
+}
+
+# name -> (versions key, [(value, html before the slot, html after the slot)])
+_rendered = {}
+
+# query -> (versions key, rows): widgets built from the same query read it once
+_rows = {}
+
+
+def _versions_key(widget):
+    return (table_versions_epoch(),) + tuple(get_table_version(table) for table in widget.tables)
+
+
+def _widget_rows(widget, key):
+    if not isinstance(widget.items, str):
+        return widget.items
+    cached = _rows.get(widget.items)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    rows = fetch_query(widget.items)
+    if rows is not None:
+        _rows[widget.items] = (key, rows)
+    return rows
+
+
+def _render(widget, key):
+    """Pieces of every item of a widget, or None when its rows cannot be read"""
+    rows = _widget_rows(widget, key)
+    if rows is None:
+        return None
+    macro = getattr(current_app.jinja_env.get_template(MACROS_TEMPLATE).module, widget.macro)
+    pieces = []
+    for row in rows:
+        before, after = str(macro(row, _SLOT)).split(_SLOT)
+        pieces.append((str(row[widget.value]), before, after))
+    return pieces
+
+
+def option_list(name, selected=(), attribute="selected"):
+    """Rendered items of a widget with the given values marked (Jinja global)"""
+    widget = WIDGETS[name]
+    key = _versions_key(widget)
+    cached = _rendered.get(name)
+    if cached is not None and cached[0] == key:
+        pieces = cached[1]
+    else:
+        pieces = _render(widget, key)
+        if pieces is None:
+            return Markup("")
+        _rendered[name] = (key, pieces)
+
+    selected = {str(value) for value in (selected or ()) if value is not None}
+    marked = f" {attribute}"
+    return Markup("".join(
+        before + (marked if value in selected else "") + after
+        for value, before, after in pieces
+    ))
+
+
+@warmup_task("filter_widgets")
+def warm_widgets():
+    for name in WIDGETS:
+        option_list(name)
+
+
+def init_fragments(app):
+    app.jinja_env.globals["option_list"] = option_list
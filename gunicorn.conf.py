@@ -0,0 +1,86 @@
+"""
+Gunicorn settings for production serving:
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Every value can be overridden from the environment (see README).
+"""
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Each worker starts its own keepalive thread in post_fork (see keepalive.py)
+os.environ["DB_KEEPALIVE_PER_WORKER"] = "1"
+
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+
+# Pre-forked worker processes, each serving several threads
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "gthread"
+threads = int(os.environ.get("THREADS", 4))
+
+# Import the app once in the master, workers share the loaded code
+preload_app = True
+
+timeout = int(os.environ.get("TIMEOUT", 60))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then so memory of large result sets is given back
+max_requests = int(os.environ.get("MAX_REQUESTS", 2000))
+max_requests_jitter = 200
+
+accesslog = "-"
+errorlog = "-"
+
+
+# Whether a worker of the current deploy has warmed the shared result cache (master process)
+_deploy_warmed = False
+
+
+def on_starting(server):
+    # A random key per worker would make every worker reject the others' sessions
+    if not os.environ.get("SECRET_KEY"):
+        raise RuntimeError("SECRET_KEY environment variable is not set!")
+
+
+def on_reload(server):
+    # New code and config: a worker of the new generation warms up again
+    global _deploy_warmed
+    _deploy_warmed = False
+
+
+def pre_fork(server, worker):
+    # Runs in the master. Every worker starts with cold in-process caches and
+    # warms up, including those replacing recycled workers (max_requests);
+    # only a shared result cache (disk / redis) is warmed by the first worker
+    # of a deploy for all of them
+    global _deploy_warmed
+    from cache import result_cache
+
+    shared = result_cache.backend is not None and result_cache.backend.shared
+    worker.warm_up = not (shared and _deploy_warmed)
+    _deploy_warmed = True
+
+
+def post_fork(server, worker):
+    import database
+
+    # Connections must never be shared between processes: each worker opens
+    # its own pool, one connection per thread
+    database.init_pool(minconn=1, maxconn=threads)
+
+    # Writes served by one worker must invalidate the caches of the others
+    database.use_shared_table_versions()
+
+    # Warm pooled connections and caches of this worker (see pre_fork)
+    from keepalive import keepalive
+    keepalive.start(worker.app.wsgi(), warm_up=worker.warm_up)
+
+
+def worker_exit(server, worker):
+    import database
+
+    database.close_pool()
@@ -0,0 +1,3 @@
+"""
+Bulk loading of FAOSTAT files (see ingest.load).
+"""
@@ -0,0 +1,293 @@
+"""
+Reading FAOSTAT bulk downloads and mapping them to the tables of schema.sql.
+
+Bulk files come as a ZIP holding "<Domain>_E_All_Data_(Normalized).csv"
+(one row per year) or the wide "<Domain>_E_All_Data.csv" (Y1961, Y1962, ...
+columns); both are read row by row, never as a whole. Areas are matched on
+their M49 code (COUNTRIES.country_id), then on the name; items on the FAO
+item code (COMMODITIES.fao_code), then on the CPC code.
+"""
+import collections
+import csv
+import io
+import re
+import zipfile
+from collections import namedtuple
+
+from units import canonical
+
+# FAOSTAT "Months Code" -> month number; 7021 is the annual value (NULL month)
+MONTH_CODES = {7000 + month: month for month in range(1, 13)}
+MONTH_NAMES = {name: i for i, name in enumerate(
+    ["January", "February", "March", "April", "May", "June", "July",
+     "August", "September", "October", "November", "December"], start=1)}
+
+CONSUMER_PRICE_TYPES = {"General Indices": 1, "Food Indices": 2}
+
+_WIDE_YEAR_RE = re.compile(r"^Y(\d{4})$")
+
+
+def _int(value):
+    """FAOSTAT codes are written as 4, '004 or "4.0"; None when empty"""
+    if value is None:
+        return None
+    value = value.strip().lstrip("'")
+    if not value:
+        return None
+    try:
+        return int(float(value))
+    except ValueError:
+        return None
+
+
+def _float(value):
+    if value is None or not value.strip():
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def _data_member(archive):
+    """Data CSV of a bulk ZIP (not the AreaCodes / Flags / ... lookup files)"""
+    names = [name for name in archive.namelist() if name.lower().endswith(".csv")]
+    data = [name for name in names if "all_data" in name.lower()]
+    normalized = [name for name in data if "normalized" in name.lower()]
+    candidates = normalized or data or names
+    if not candidates:
+        raise ValueError("no CSV file in the archive")
+    return max(candidates, key=lambda name: archive.getinfo(name).file_size)
+
+
+def _long_rows(reader):
+    """Rows of a wide file (Y2000, Y2000F, ... columns) as one row per year"""
+    year_columns = [(column, int(match.group(1))) for column in reader.fieldnames or []
+                    if (match := _WIDE_YEAR_RE.match(column))]
+    if not year_columns or "Year" in (reader.fieldnames or []):
+        yield from reader
+        return
+    for row in reader:
+        for column, year in year_columns:
+            if (row.get(column) or "").strip():
+                yield dict(row, Year=str(year), Value=row[column])
+
+
+def read_rows(path, encoding="utf-8-sig"):
+    """
+    Yields the rows of a FAOSTAT CSV or bulk ZIP as dicts, one per
+    (area, item, element, year). Undecodable bytes (older files are
+    Latin-1) are replaced instead of failing the load.
+    """
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            with archive.open(_data_member(archive)) as raw:
+                text = io.TextIOWrapper(raw, encoding=encoding, errors="replace", newline="")
+                yield from _long_rows(csv.DictReader(text))
+    else:
+        with open(path, encoding=encoding, errors="replace", newline="") as text:
+            yield from _long_rows(csv.DictReader(text))
+
+
+class CodeMap:
+    """FAOSTAT area / item -> COUNTRIES.country_id / COMMODITIES.fao_code"""
+
+    def __init__(self, countries, commodities):
+        self.country_ids = {row["country_id"] for row in countries}
+        self.country_names = {row["country_name"].strip().lower(): row["country_id"]
+                              for row in countries if row["country_name"]}
+        self.commodity_codes = {row["fao_code"] for row in commodities}
+        self.cpc_codes = {row["cpc_code"].strip().lstrip("'"): row["fao_code"]
+                          for row in commodities if row["cpc_code"]}
+        # (kind, code, name) -> rows that could not be mapped
+        self.unmatched = collections.Counter()
+
+    @classmethod
+    def from_connection(cls, conn):
+        cursor = conn.cursor()
+        cursor.execute("SELECT country_id, country_name FROM countries")
+        countries = [{"country_id": r[0], "country_name": r[1]} for r in cursor.fetchall()]
+        cursor.execute("SELECT fao_code, cpc_code FROM commodities")
+        commodities = [{"fao_code": r[0], "cpc_code": r[1]} for r in cursor.fetchall()]
+        cursor.close()
+        return cls(countries, commodities)
+
+    def country(self, row, code_column="Area Code (M49)", name_column="Area"):
+        code = _int(row.get(code_column))
+        if code in self.country_ids:
+            return code
+        name = (row.get(name_column) or "").strip()
+        country_id = self.country_names.get(name.lower())
+        if country_id is None:
+            self.unmatched[("area", code, name)] += 1
+        return country_id
+
+    def commodity(self, row):
+        code = _int(row.get("Item Code"))
+        if code in self.commodity_codes:
+            return code
+        fao_code = self.cpc_codes.get((row.get("Item Code (CPC)") or "").strip().lstrip("'"))
+        if fao_code is None:
+            self.unmatched[("item", code, (row.get("Item") or "").strip())] += 1
+        return fao_code
+
+
+def _month(row):
+    """Month number, None for annual values"""
+    month = MONTH_CODES.get(_int(row.get("Months Code")))
+    return month or MONTH_NAMES.get((row.get("Months") or "").strip())
+
+
+# Parsers: FAOSTAT row -> staging row, or None when the row is not loaded
+# (other element, unknown area / item, empty value)
+
+def parse_trade(row, codes):
+    element = (row.get("Element") or "").strip().lower()
+    trade_type, _, measure = element.partition(" ")
+    if trade_type not in ("export", "import") or measure not in ("quantity", "value"):
+        return None
+    value = _float(row.get("Value"))
+    if value is None:
+        return None
+    reporter = codes.country(row, "Reporter Country Code (M49)", "Reporter Countries")
+    partner = codes.country(row, "Partner Country Code (M49)", "Partner Countries")
+    item = codes.commodity(row)
+    if reporter is None or partner is None or item is None:
+        return None
+    qty, val = (value, None) if measure == "quantity" else (None, value)
+    return (reporter, partner, item, _int(row.get("Year")), trade_type.capitalize(), qty, val)
+
+
+def parse_production(row, codes):
+    if (row.get("Element") or "").strip() != "Production":
+        return None
+    quantity = _float(row.get("Value"))
+    country, commodity = codes.country(row), codes.commodity(row)
+    if quantity is None or country is None or commodity is None:
+        return None
+    unit = (row.get("Unit") or "").strip()
+    return (country, commodity, _int(row.get("Year")), unit, quantity, canonical("production", unit, quantity))
+
+
+def parse_production_value(row, codes):
+    element = (row.get("Element") or "").strip()
+    value = _float(row.get("Value"))
+    if not element.startswith("Gross Production Value") or value is None:
+        return None
+    country, commodity = codes.country(row), codes.commodity(row)
+    if country is None or commodity is None:
+        return None
+    return (country, commodity, _int(row.get("Year")), element, (row.get("Unit") or "").strip(), value)
+
+
+def parse_producer_price(row, codes):
+    # "Producer Price (USD/tonne)": the unit is in the element name
+    match = re.match(r"Producer Price \((USD/tonne)\)", (row.get("Element") or "").strip())
+    value = _float(row.get("Value"))
+    if not match or value is None:
+        return None
+    country, commodity = codes.country(row), codes.commodity(row)
+    if country is None or commodity is None:
+        return None
+    return (country, commodity, _int(row.get("Year")), _month(row), match.group(1), value)
+
+
+def parse_consumer_price(row, codes):
+    item = row.get("Item") or ""
+    price_type = next((code for name, code in CONSUMER_PRICE_TYPES.items() if name in item), None)
+    value = _float(row.get("Value"))
+    month = _month(row)
+    if price_type is None or value is None or month is None:
+        return None
+    country = codes.country(row)
+    if country is None:
+        return None
+    return (country, _int(row.get("Year")), month, price_type, value)
+
+
+def parse_land_use(row, codes):
+    if (row.get("Element") or "").strip() != "Area":
+        return None
+    value = _float(row.get("Value"))
+    country = codes.country(row)
+    if value is None or country is None:
+        return None
+    unit = (row.get("Unit") or "").strip()
+    return (country, (row.get("Item") or "").strip(), _int(row.get("Year")), unit, value,
+            canonical("land_use", unit, value))
+
+
+def parse_investment(row, codes):
+    # Current prices only, the constant 2015 prices element is skipped
+    element = (row.get("Element") or "").strip()
+    unit = (row.get("Unit") or "").strip()
+    value = _float(row.get("Value"))
+    if unit.lower() != "million usd" or "prices" in element.lower() or value is None:
+        return None
+    country = codes.country(row)
+    if country is None:
+        return None
+    return (country, (row.get("Item") or "").strip(), _int(row.get("Year")), "Million USD", value,
+            canonical("investments", "Million USD", value))
+
+
+# table:    final table
+# id:       primary key column (generated when the table has no default)
+# columns:  (name, type) of the staging table, in parser output order
+# key:      natural key of a final row; nullable_key columns may be NULL
+# source:   SELECT producing final rows from the staging table (default:
+#           staging grouped by key, MAX of the other columns)
+# after:    datasets that must be merged first
+Dataset = namedtuple("Dataset", ["table", "id", "columns", "key", "nullable_key", "parse", "source", "after"])
+
+DATASETS = {
+    "trade": Dataset(
+        "trade_data_final", "unique_id",
+        [("reporter_code", "INTEGER"), ("partner_code", "INTEGER"), ("item_code", "INTEGER"), ("year", "INTEGER"),
+         ("trade_type", "VARCHAR"), ("qty_tonnes", "NUMERIC"), ("val_1k_usd", "NUMERIC")],
+        ["reporter_code", "partner_code", "item_code", "year", "trade_type"], [], parse_trade, None, []),
+    "production": Dataset(
+        "production", "production_id",
+        [("country_code", "INTEGER"), ("commodity_code", "INTEGER"), ("year", "INTEGER"), ("unit", "VARCHAR"),
+         ("quantity", "NUMERIC"), ("quantity_tonnes", "NUMERIC")],
+        ["country_code", "commodity_code", "year"], [], parse_production, None, []),
+    "production_value": Dataset(
+        "production_value", "production_value_id",
+        [("country_code", "INTEGER"), ("commodity_code", "INTEGER"), ("year", "INTEGER"), ("element", "VARCHAR"),
+         ("unit", "VARCHAR"), ("value", "NUMERIC")],
+        ["production_id", "element"], [], parse_production_value,
+        # Values hang off the production row of the same country, commodity and year
+        """
+            SELECT p.production_id, s.element, MAX(s.unit) AS unit, MAX(s.value) AS value
+            FROM {staging} s
+            JOIN (
+                SELECT country_code, commodity_code, year, MIN(production_id) AS production_id
+                FROM production
+                GROUP BY country_code, commodity_code, year
+            ) p ON p.country_code = s.country_code
+               AND p.commodity_code = s.commodity_code
+               AND p.year = s.year
+            GROUP BY p.production_id, s.element
+        """,
+        ["production"]),
+    "producer_prices": Dataset(
+        "producer_prices", "unique_id",
+        [("country_id", "INTEGER"), ("commodity_id", "INTEGER"), ("year", "INTEGER"), ("month", "SMALLINT"),
+         ("unit", "VARCHAR"), ("value", "DOUBLE PRECISION")],
+        ["country_id", "commodity_id", "year", "month"], ["month"], parse_producer_price, None, []),
+    "consumer_prices": Dataset(
+        "consumer_prices", "unique_id",
+        [("country_id", "INTEGER"), ("year", "INTEGER"), ("month", "SMALLINT"), ("type", "SMALLINT"),
+         ("value", "DOUBLE PRECISION")],
+        ["country_id", "year", "month", "type"], [], parse_consumer_price, None, []),
+    "land_use": Dataset(
+        "land_use", "unique_id",
+        [("country_id", "INTEGER"), ("land_type", "VARCHAR"), ("year", "INTEGER"), ("unit", "VARCHAR"),
+         ("land_usage_value", "DOUBLE PRECISION"), ("land_usage_1000ha", "DOUBLE PRECISION")],
+        ["country_id", "land_type", "year"], [], parse_land_use, None, []),
+    "investments": Dataset(
+        "investments", "unique_id",
+        [("country_id", "INTEGER"), ("expenditure_type", "VARCHAR"), ("year", "INTEGER"), ("unit", "VARCHAR"),
+         ("expenditure_value", "DOUBLE PRECISION"), ("expenditure_musd", "DOUBLE PRECISION")],
+        ["country_id", "expenditure_type", "year"], [], parse_investment, None, []),
+}
@@ -0,0 +1,474 @@
+"""
+Bulk FAOSTAT loader.
+
+    python -m ingest.load trade=Trade_DetailedTradeMatrix_E_All_Data_(Normalized).zip \\
+        production=Production_Crops_Livestock_E_All_Data_(Normalized).zip \\
+        production_value=Value_of_Production_E_All_Data_(Normalized).zip --jobs 3
+
+Datasets: trade, production, production_value, producer_prices,
+consumer_prices, land_use, investments (see ingest.faostat.DATASETS).
+Each file is parsed while it is read and sent with COPY FROM STDIN,
+--chunk-rows rows at a time, into an unlogged staging table. One transaction
+then merges the staging rows into the final table: rows with a new natural
+key are inserted, existing ones updated. Datasets load in parallel worker
+processes; production_value waits for production.
+
+With --delta the files are taken as complete republished datasets: an md5
+hash of every natural key and row is compared with the hashes stored by
+the previous delta load (ingest_hashes_<table>), and only new, changed and
+vanished keys are written, in one transaction per table. Tables without
+changes keep their cached pages; PRICE_PRODUCTION_FACTS is refreshed when
+one of its source tables changed, and the commodity summaries of the loaded
+commodities (analytics.commodity_profile) are marked stale and recomputed.
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import psycopg2
+
+from analytics.commodity_profile import COMMODITY_COLUMNS, SUMMARY_TABLE, mark_stale_query, refresh_stale_summaries
+from analytics.price_production import FACTS_VIEW, SOURCE_TABLES, refresh_price_production_facts
+from ingest.faostat import DATASETS, CodeMap, read_rows
+from validation import CHECKS, check_staging
+
+CHUNK_ROWS = 50_000
+
+HASH_COLUMNS = ("key_hash", "row_hash")
+
+# Key columns holding a country id (affected countries of a delta load)
+COUNTRY_COLUMNS = ("country_id", "country_code", "reporter_code", "partner_code")
+
+# Rows referencing a table by (table, column), deleted together with it
+REFERENCED_BY = {"production": [("production_value", "production_id")]}
+
+# Same statement as database.bump_table_version with shared versions: the
+# running workers drop the cached pages of the loaded tables
+_BUMP_VERSION = """
+    INSERT INTO TABLE_VERSIONS (table_name, version) VALUES (%s, 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = TABLE_VERSIONS.version + 1
+"""
+
+
+def staging_table(dataset):
+    return f"staging_{dataset.table}"
+
+
+def _prepare_staging(cursor, dataset):
+    columns = ", ".join(f"{name} {kind}" for name, kind in dataset.columns)
+    cursor.execute(f"CREATE UNLOGGED TABLE IF NOT EXISTS {staging_table(dataset)} ({columns})")
+    # Staging tables left by an older version miss the columns added since
+    for name, kind in dataset.columns:
+        cursor.execute(f"ALTER TABLE {staging_table(dataset)} ADD COLUMN IF NOT EXISTS {name} {kind}")
+    cursor.execute(f"TRUNCATE {staging_table(dataset)}")
+
+
+def _copy(cursor, dataset, rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    columns = ", ".join(name for name, _ in dataset.columns)
+    cursor.copy_expert(f"COPY {staging_table(dataset)} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def _id_generated(cursor, table, column):
+    """True when the database fills the primary key (serial / identity)"""
+    cursor.execute("""
+        SELECT column_default IS NOT NULL OR is_identity = 'YES'
+        FROM information_schema.columns
+        WHERE table_name = %s AND column_name = %s
+    """, (table, column))
+    row = cursor.fetchone()
+    return bool(row and row[0])
+
+
+def _match(dataset, left="t", right="s"):
+    return " AND ".join(
+        f"{left}.{c} IS NOT DISTINCT FROM {right}.{c}" if c in dataset.nullable_key else f"{left}.{c} = {right}.{c}"
+        for c in dataset.key
+    )
+
+
+def _create_source(cursor, dataset, hashed=False):
+    """
+    Temp table merge_source: one row per natural key, built from the staging
+    table. hashed adds key_hash and row_hash (md5 of the key / whole row).
+    """
+    staging = staging_table(dataset)
+    if dataset.source:
+        source = dataset.source.format(staging=staging)
+    else:
+        values = [name for name, _ in dataset.columns if name not in dataset.key]
+        source = f"""
+            SELECT {', '.join(dataset.key)}, {', '.join(f'MAX({c}) AS {c}' for c in values)}
+            FROM {staging}
+            GROUP BY {', '.join(dataset.key)}
+        """
+    if hashed:
+        key = ", ".join(f"src.{c}" for c in dataset.key)
+        source = f"""
+            SELECT src.*, md5(ROW({key})::text)::uuid AS key_hash, md5(ROW(src.*)::text)::uuid AS row_hash
+            FROM ({source}) src
+        """
+    cursor.execute(f"CREATE TEMP TABLE merge_source ON COMMIT DROP AS {source}")
+    cursor.execute("ANALYZE merge_source")
+
+
+def _apply_source(cursor, dataset):
+    """Updates / inserts the rows of merge_source. Returns (updated, inserted)"""
+    cursor.execute("SELECT * FROM merge_source LIMIT 0")
+    columns = [column[0] for column in cursor.description if column[0] not in HASH_COLUMNS]
+    values = [c for c in columns if c not in dataset.key]
+    match = _match(dataset)
+    # Rows whose values did not change are not rewritten (reloading a file is cheap)
+    changed = " OR ".join(f"t.{c} IS DISTINCT FROM COALESCE(s.{c}, t.{c})" for c in values)
+
+    generated = _id_generated(cursor, dataset.table, dataset.id)
+    if not generated:
+        # Ids are max + n: no other writer may insert meanwhile
+        cursor.execute(f"LOCK TABLE {dataset.table} IN SHARE ROW EXCLUSIVE MODE")
+
+    cursor.execute(f"""
+        UPDATE {dataset.table} t
+        SET {', '.join(f'{c} = COALESCE(s.{c}, t.{c})' for c in values)}
+        FROM merge_source s
+        WHERE {match} AND ({changed})
+    """)
+    updated = cursor.rowcount
+
+    new_rows = f"FROM merge_source s WHERE NOT EXISTS (SELECT 1 FROM {dataset.table} t WHERE {match})"
+    if generated:
+        cursor.execute(f"""
+            INSERT INTO {dataset.table} ({', '.join(columns)})
+            SELECT {', '.join(f's.{c}' for c in columns)} {new_rows}
+        """)
+    else:
+        cursor.execute(f"""
+            INSERT INTO {dataset.table} ({dataset.id}, {', '.join(columns)})
+            SELECT (SELECT COALESCE(MAX({dataset.id}), 0) FROM {dataset.table}) + ROW_NUMBER() OVER (),
+                   {', '.join(f's.{c}' for c in columns)}
+            {new_rows}
+        """)
+    return updated, cursor.rowcount
+
+
+def merge_staging(cursor, dataset):
+    """
+    Merges the staging table into the final table in the current
+    transaction. Returns (updated rows, inserted rows).
+    """
+    _create_source(cursor, dataset)
+    updated, inserted = _apply_source(cursor, dataset)
+    cursor.execute("DROP TABLE merge_source")
+    return updated, inserted
+
+
+def _mark_summaries_stale(cursor, dataset, commodities=None):
+    """
+    Marks the commodity summaries of the loaded rows stale in the load
+    transaction: the given commodities, or every commodity of the staging table
+    """
+    column = COMMODITY_COLUMNS.get(dataset.table)
+    if column is None:
+        return
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (SUMMARY_TABLE,))
+    if not cursor.fetchone()[0]:
+        return
+    if commodities is None:
+        cursor.execute(f"SELECT DISTINCT {column} FROM {staging_table(dataset)} WHERE {column} IS NOT NULL")
+        commodities = [row[0] for row in cursor.fetchall()]
+    if commodities:
+        cursor.execute(*mark_stale_query(commodities))
+
+
+def hash_table(dataset):
+    return f"ingest_hashes_{dataset.table}"
+
+
+def _affected_scope(cursor, dataset):
+    """(years, country ids, commodity ids) of the changed and deleted keys"""
+    if "year" in dataset.key:
+        keys = ", ".join(dataset.key)
+        rows = f"SELECT {keys} FROM merge_source UNION ALL SELECT {keys} FROM delta_deleted"
+        countries = [c for c in dataset.key if c in COUNTRY_COLUMNS]
+    else:
+        # production_value: the year and country are those of the production row
+        rows = """
+            SELECT p.year, p.country_code FROM production p
+            WHERE p.production_id IN (SELECT production_id FROM merge_source
+                                      UNION SELECT production_id FROM delta_deleted)
+        """
+        countries = ["country_code"]
+    cursor.execute(f"SELECT DISTINCT year FROM ({rows}) r WHERE year IS NOT NULL ORDER BY year")
+    years = [row[0] for row in cursor.fetchall()]
+    cursor.execute(f"""
+        SELECT DISTINCT country FROM ({rows}) r, unnest(ARRAY[{', '.join(f'r.{c}' for c in countries)}]) country
+        WHERE country IS NOT NULL ORDER BY country
+    """)
+    country_ids = [row[0] for row in cursor.fetchall()]
+    commodities = []
+    if dataset.table in COMMODITY_COLUMNS:
+        cursor.execute(f"""
+            SELECT DISTINCT {COMMODITY_COLUMNS[dataset.table]} FROM ({rows}) r
+            WHERE {COMMODITY_COLUMNS[dataset.table]} IS NOT NULL
+        """)
+        commodities = [row[0] for row in cursor.fetchall()]
+    return years, country_ids, commodities
+
+
+def merge_delta(cursor, dataset):
+    """
+    Applies only the differences between the staging table (a complete
+    republished dataset) and the row hashes stored by the previous delta
+    load, in the current transaction: changed or new keys are merged, keys
+    missing from the file are deleted. Keys loaded before the first delta
+    load are never deleted. Returns the counts and the affected scope.
+    """
+    hashes = hash_table(dataset)
+    key = ", ".join(dataset.key)
+    _create_source(cursor, dataset, hashed=True)
+    cursor.execute("SELECT to_regclass(%s) IS NULL", (hashes,))
+    if cursor.fetchone()[0]:
+        cursor.execute(f"CREATE TABLE {hashes} AS SELECT key_hash, {key}, row_hash FROM merge_source WITH NO DATA")
+        cursor.execute(f"ALTER TABLE {hashes} ADD PRIMARY KEY (key_hash)")
+
+    cursor.execute(f"""
+        CREATE TEMP TABLE delta_deleted ON COMMIT DROP AS
+        SELECT h.* FROM {hashes} h
+        WHERE NOT EXISTS (SELECT 1 FROM merge_source s WHERE s.key_hash = h.key_hash)
+    """)
+    cursor.execute(f"DELETE FROM merge_source s USING {hashes} h WHERE h.key_hash = s.key_hash AND h.row_hash = s.row_hash")
+    unchanged = cursor.rowcount
+    years, countries, commodities = _affected_scope(cursor, dataset)
+
+    updated, inserted = _apply_source(cursor, dataset)
+
+    for table, column in REFERENCED_BY.get(dataset.table, []):
+        cursor.execute(f"""
+            DELETE FROM {table} r USING {dataset.table} t, delta_deleted s
+            WHERE r.{column} = t.{column} AND {_match(dataset)}
+        """)
+    cursor.execute(f"DELETE FROM {dataset.table} t USING delta_deleted s WHERE {_match(dataset)}")
+    deleted = cursor.rowcount
+
+    cursor.execute(f"DELETE FROM {hashes} h USING delta_deleted d WHERE h.key_hash = d.key_hash")
+    cursor.execute(f"""
+        INSERT INTO {hashes} (key_hash, {key}, row_hash)
+        SELECT key_hash, {key}, row_hash FROM merge_source
+        ON CONFLICT (key_hash) DO UPDATE SET row_hash = EXCLUDED.row_hash
+    """)
+    cursor.execute("DROP TABLE merge_source")
+    cursor.execute("DROP TABLE delta_deleted")
+    return {
+        "updated": updated, "inserted": inserted, "deleted": deleted, "unchanged": unchanged,
+        "years": years, "countries": countries, "commodities": commodities,
+    }
+
+
+def load_dataset(name, paths, database_url, chunk_rows=CHUNK_ROWS, encoding="utf-8-sig", delta=False,
+                 strict=False):
+    """
+    Loads the files of one dataset (run in a worker process), merging all
+    rows or, with delta, only the differences to the previous delta load.
+    Land use and investments are checked against the form rules first
+    (validation.py); with strict a violation cancels the dataset.
+    Returns the report of the dataset.
+    """
+    dataset = DATASETS[name]
+    started = time.perf_counter()
+    conn = psycopg2.connect(database_url)
+    try:
+        codes = CodeMap.from_connection(conn)
+        cursor = conn.cursor()
+        _prepare_staging(cursor, dataset)
+
+        read = staged = 0
+        chunk = []
+        for path in paths:
+            for row in read_rows(path, encoding):
+                read += 1
+                parsed = dataset.parse(row, codes)
+                if parsed is None:
+                    continue
+                chunk.append(parsed)
+                if len(chunk) >= chunk_rows:
+                    _copy(cursor, dataset, chunk)
+                    staged += len(chunk)
+                    chunk = []
+                    elapsed = time.perf_counter() - started
+                    print(f"[{name}] {read:,} rows read, {staged:,} staged, {read / elapsed:,.0f} rows/s", flush=True)
+        if chunk:
+            _copy(cursor, dataset, chunk)
+            staged += len(chunk)
+
+        parsed_at = time.perf_counter()
+        cursor.execute("ANALYZE " + staging_table(dataset))
+        validation = None
+        if dataset.table in CHECKS:
+            validation = check_staging(cursor, dataset.table, staging_table(dataset))
+            print(f"[{name}] {validation['violations']:,} rule violations in {validation['seconds']:.1f}s", flush=True)
+            if strict and validation["violations"]:
+                raise ValueError(f"{validation['violations']:,} rule violations, nothing loaded (--strict)")
+        if delta:
+            changes = merge_delta(cursor, dataset)
+        else:
+            changes = dict(zip(("updated", "inserted"), merge_staging(cursor, dataset)))
+        changed = changes["updated"] + changes["inserted"] + changes.get("deleted", 0)
+        cursor.execute("SELECT to_regclass('table_versions') IS NOT NULL")
+        # Cached pages stay valid when the file brought no change
+        if cursor.fetchone()[0] and changed:
+            cursor.execute(_BUMP_VERSION, (dataset.table,))
+        if changed:
+            _mark_summaries_stale(cursor, dataset, changes.get("commodities"))
+        conn.commit()
+        cursor.execute(f"TRUNCATE {staging_table(dataset)}")
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - started
+    report = {
+        "dataset": name,
+        "table": dataset.table,
+        "read": read,
+        "staged": staged,
+        "skipped": read - staged,
+        **changes,
+        "validation": validation,
+        "seconds": round(elapsed, 1),
+        "merge_seconds": round(time.perf_counter() - parsed_at, 1),
+        "rows_per_second": round(read / elapsed) if elapsed else None,
+        "unmatched": [
+            {"kind": kind, "code": code, "name": label, "rows": rows}
+            for (kind, code, label), rows in codes.unmatched.most_common(10)
+        ],
+    }
+    print(f"[{name}] done: {read:,} read, {changes['inserted']:,} inserted, {changes['updated']:,} updated, "
+          f"{changes.get('deleted', 0):,} deleted in {elapsed:.1f}s", flush=True)
+    return report
+
+
+def run(files, database_url, jobs=None, chunk_rows=CHUNK_ROWS, encoding="utf-8-sig", delta=False, strict=False):
+    """
+    Loads {dataset: [paths]}, independent datasets in parallel.
+    Returns {dataset: report}; a failed dataset (and the ones after it) has an "error".
+    """
+    pending = dict(files)
+    jobs = jobs or min(len(pending), os.cpu_count() or 1)
+    reports = {}
+    running = {}
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        while pending or running:
+            for name in list(pending):
+                after = [dep for dep in DATASETS[name].after if dep in files]
+                if any("error" in reports.get(dep, {}) for dep in after):
+                    reports[name] = {"dataset": name, "error": f"not loaded, {', '.join(after)} failed"}
+                    del pending[name]
+                elif all(dep in reports for dep in after):
+                    future = executor.submit(
+                        load_dataset, name, pending.pop(name), database_url, chunk_rows, encoding, delta, strict)
+                    running[future] = name
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    reports[name] = future.result()
+                except Exception as e:
+                    print(f"[{name}] failed: {e}", flush=True)
+                    reports[name] = {"dataset": name, "error": str(e)}
+    return reports
+
+
+def _ranges(values):
+    """[2001, 2002, 2003, 2007] -> '2001-2003, 2007'"""
+    parts = []
+    for value in values:
+        if parts and value == parts[-1][1] + 1:
+            parts[-1][1] = value
+        else:
+            parts.append([value, value])
+    return ", ".join(str(a) if a == b else f"{a}-{b}" for a, b in parts) or "-"
+
+
+def _files_from_args(parser, specs):
+    files = {}
+    for spec in specs:
+        name, sep, path = spec.partition("=")
+        if not sep or name not in DATASETS:
+            parser.error(f"expected <dataset>=<file> with a dataset of {', '.join(DATASETS)}: {spec}")
+        if not os.path.exists(path):
+            parser.error(f"file not found: {path}")
+        files.setdefault(name, []).append(path)
+    return files
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load FAOSTAT bulk files (CSV or ZIP)")
+    parser.add_argument("files", nargs="+", metavar="DATASET=FILE")
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL"))
+    parser.add_argument("--jobs", type=int, help="worker processes (default: one per dataset, up to the CPUs)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="rows per COPY")
+    parser.add_argument("--encoding", default="utf-8-sig", help="use latin-1 for older FAOSTAT files")
+    parser.add_argument("--delta", action="store_true",
+                        help="files are complete datasets: apply only inserts / updates / deletes since the last delta load")
+    parser.add_argument("--no-refresh", action="store_true",
+                        help="do not refresh PRICE_PRODUCTION_FACTS and the commodity summaries")
+    parser.add_argument("--strict", action="store_true",
+                        help="do not load land use / investments with business rule violations")
+    args = parser.parse_args(argv)
+    if not args.database_url:
+        parser.error("--database-url or DATABASE_URL is required")
+
+    files = _files_from_args(parser, args.files)
+    started = time.perf_counter()
+    reports = run(files, args.database_url, args.jobs, args.chunk_rows, args.encoding, args.delta, args.strict)
+
+    print(f"\n{'dataset':<18} {'read':>12} {'skipped':>10} {'inserted':>10} {'updated':>10} {'deleted':>10} {'rows/s':>9}")
+    for name, report in reports.items():
+        if "error" in report:
+            print(f"{name:<18} {report['error']}")
+            continue
+        print(f"{name:<18} {report['read']:>12,} {report['skipped']:>10,} {report['inserted']:>10,} "
+              f"{report['updated']:>10,} {report.get('deleted', 0):>10,} {report['rows_per_second'] or 0:>9,}")
+        if args.delta:
+            commodities = f", {len(report['commodities'])} commodities" if report["commodities"] else ""
+            print(f"    {report['unchanged']:,} unchanged, years {_ranges(report['years'])}, "
+                  f"{len(report['countries'])} countries{commodities}")
+        for rule, result in (report["validation"] or {}).get("rules", {}).items():
+            if result["count"]:
+                sample = result["samples"][0]
+                print(f"    {result['count']:,} x {result['description']} "
+                      f"(e.g. country {sample['country_id']} {sample['year']}: {sample['detail']})")
+        for item in report["unmatched"]:
+            print(f"    unmatched {item['kind']} {item['code']} {item['name']!r}: {item['rows']:,} rows")
+    print(f"Total {time.perf_counter() - started:.1f}s")
+
+    changed = {report["table"] for report in reports.values()
+               if "error" not in report and report["inserted"] + report["updated"] + report.get("deleted", 0)}
+    if changed & set(SOURCE_TABLES) and not args.no_refresh:
+        # The fact view aggregates every year: it is refreshed as a whole
+        os.environ["DATABASE_URL"] = args.database_url
+        started = time.perf_counter()
+        count = refresh_price_production_facts()
+        print(f"Refreshed {FACTS_VIEW} and {count} elasticities in {time.perf_counter() - started:.1f}s")
+    if changed & set(COMMODITY_COLUMNS) and not args.no_refresh:
+        # Only the summaries of the loaded commodities are stale
+        os.environ["DATABASE_URL"] = args.database_url
+        started = time.perf_counter()
+        try:
+            count = refresh_stale_summaries()
+            print(f"Refreshed {count} commodity summaries in {time.perf_counter() - started:.1f}s")
+        except Exception as e:
+            print(f"Commodity summaries not refreshed: {e}")
+    return 1 if any("error" in report for report in reports.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+Structured write journal.
+
+log.sql only keeps the SQL text of the writes. Every transaction committed
+through database.execute_query / execute_transaction is also appended to
+WRITE_JOURNAL (default journal.jsonl) as one JSON line:
+
+    {"txid": ..., "ts": "2026-01-31T12:00:00.000000+00:00", "user": ...,
+     "statements": [{"sql": ..., "params": [...]}, ...]}
+
+with the parameters and the transaction boundaries, so replay.py can
+rebuild a database up to any point in time. An empty WRITE_JOURNAL turns it
+off. Lines are written with a single O_APPEND write, so the workers of one
+host can share the file.
+"""
+import datetime
+import decimal
+import json
+import os
+import uuid
+
+JOURNAL_PATH = os.environ.get("WRITE_JOURNAL", "journal.jsonl")
+
+
+def _json_default(value):
+    # Decimal and dates go back in as text literals, PostgreSQL casts them
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if hasattr(value, "item"):  # numpy scalars
+        return value.item()
+    return str(value)
+
+
+def _current_user():
+    """Username of the session for request writes, None for scripts"""
+    try:
+        from flask import has_request_context, session
+    except ImportError:
+        return None
+    if has_request_context():
+        return session.get("username")
+    return None
+
+
+def record(statements):
+    """Appends one committed transaction of (query, params) statements"""
+    if not JOURNAL_PATH:
+        return
+    entry = {
+        "txid": uuid.uuid4().hex,
+        "ts": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="microseconds"),
+        "user": _current_user(),
+        "statements": [{"sql": query, "params": params} for query, params in statements],
+    }
+    try:
+        line = json.dumps(entry, default=_json_default, separators=(",", ":")) + "\n"
+        fd = os.open(JOURNAL_PATH, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o640)
+        try:
+            os.write(fd, line.encode("utf-8"))
+        finally:
+            os.close(fd)
+    except Exception as e:
+        # The transaction is already committed: never fail the request here
+        print(f"Write journal error: {e}")
+
+
+def read_journal(path):
+    """Yields the entries of a journal file in order, skipping a torn last line"""
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                print(f"{path}:{number}: unreadable journal line skipped")
@@ -0,0 +1,168 @@
+"""
+Keeps the serverless database (Neon) awake and the caches warm.
+
+Neon suspends the compute after a few idle minutes; the first page after a
+quiet period then waits for the wake-up plus a new connection per query.
+A background thread per process:
+
+- runs the warm-up tasks once at start (reference-data fragments and the
+  heaviest dashboards, registered with @warmup_task), so the first visitor
+  does not pay for them; under gunicorn with a shared result cache only
+  the first worker of a deploy does (gunicorn.conf.py);
+- pings DB_KEEPALIVE_CONNECTIONS pooled connections every
+  DB_KEEPALIVE_INTERVAL seconds, so the compute is not suspended and the
+  connections stay open.
+
+Latencies are published at /admin/keepalive-stats; a ping slower than
+DB_COLD_START_MS is counted as a cold start.
+"""
+import os
+import threading
+import time
+
+import database
+
+DEFAULT_INTERVAL = 240  # Neon suspends after 5 idle minutes by default
+DEFAULT_COLD_START_MS = 1000
+
+# name -> function without arguments, run inside an app context
+WARMUP_TASKS = {}
+
+
+def warmup_task(name):
+    """Registers a function to run at start-up, before the first request needs its result"""
+    def decorator(func):
+        WARMUP_TASKS[name] = func
+        return func
+    return decorator
+
+
+class KeepaliveService:
+    """Warm-up, heartbeat thread and their latency metrics (one per process)"""
+
+    def __init__(self, interval=DEFAULT_INTERVAL, query="SELECT 1", connections=1,
+                 cold_start_ms=DEFAULT_COLD_START_MS, warmup=True):
+        self.interval = interval
+        self.query = query
+        self.connections = connections
+        self.cold_start_ms = cold_start_ms
+        self.warmup = warmup
+        self._app = None
+        self._warm_up_now = warmup
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._reset_metrics()
+
+    def _reset_metrics(self):
+        self.started_at = None
+        self.heartbeats = 0
+        self.failures = 0
+        self.cold_starts = 0
+        self.last_latency_ms = None
+        self.max_latency_ms = None
+        self.last_cold_start_ms = None
+        self.last_error = None
+        self.warmup_ms = {}
+        self.warmup_errors = {}
+
+    def start(self, app, warm_up=True):
+        """
+        Starts the thread of this process (again after a fork, threads do not
+        survive it); the warm-up tasks run first when warm_up and DB_WARMUP allow it
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._app = app
+            self._warm_up_now = self.warmup and warm_up
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._reset_metrics()
+            self.started_at = time.time()
+            self._thread = threading.Thread(target=self._run, name="db-keepalive", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        # The first ping wakes the compute up: its latency is the cold start of this process
+        self.heartbeat()
+        if self._warm_up_now:
+            self.warm_up()
+        while self.interval > 0 and not self._stop.wait(self.interval):
+            self.heartbeat()
+
+    def heartbeat(self):
+        try:
+            latencies = database.ping_connections(self.connections, self.query)
+        except Exception as e:
+            print(f"Database keepalive error: {e}")
+            with self._lock:
+                self.failures += 1
+                self.last_error = str(e)
+            return
+
+        if not latencies:
+            return
+        slowest = max(latencies) * 1000
+        with self._lock:
+            self.heartbeats += 1
+            self.last_latency_ms = slowest
+            self.max_latency_ms = max(self.max_latency_ms or 0, slowest)
+            if slowest >= self.cold_start_ms:
+                self.cold_starts += 1
+                self.last_cold_start_ms = slowest
+
+    def warm_up(self):
+        """Runs every registered warm-up task, a failing one does not stop the others"""
+        with self._app.app_context():
+            for name, task in WARMUP_TASKS.items():
+                started = time.perf_counter()
+                try:
+                    task()
+                except Exception as e:
+                    print(f"Warm-up error ({name}): {e}")
+                    self.warmup_errors[name] = str(e)
+                self.warmup_ms[name] = (time.perf_counter() - started) * 1000
+
+    def stats(self):
+        with self._lock:
+            return {
+                "running": self._thread is not None and self._thread.is_alive() and self._pid == os.getpid(),
+                "pid": os.getpid(),
+                "interval": self.interval,
+                "connections": self.connections,
+                "heartbeats": self.heartbeats,
+                "failures": self.failures,
+                "cold_starts": self.cold_starts,
+                "cold_start_threshold_ms": self.cold_start_ms,
+                "last_latency_ms": self.last_latency_ms,
+                "max_latency_ms": self.max_latency_ms,
+                "last_cold_start_ms": self.last_cold_start_ms,
+                "last_error": self.last_error,
+                "warmup_ms": dict(self.warmup_ms),
+                "warmup_errors": dict(self.warmup_errors),
+                "uptime": time.time() - self.started_at if self.started_at else None,
+            }
+
+
+keepalive = KeepaliveService(
+    interval=float(os.environ.get("DB_KEEPALIVE_INTERVAL", DEFAULT_INTERVAL)),
+    query=os.environ.get("DB_KEEPALIVE_QUERY", "SELECT 1"),
+    connections=int(os.environ.get("DB_KEEPALIVE_CONNECTIONS", 1)),
+    cold_start_ms=float(os.environ.get("DB_COLD_START_MS", DEFAULT_COLD_START_MS)),
+    warmup=os.environ.get("DB_WARMUP", "1") != "0",
+)
+
+
+def init_keepalive(app):
+    """
+    Starts the keepalive thread, unless the worker processes start their own
+    (gunicorn.conf.py: a thread of the preloading master would not survive the fork).
+    """
+    app.extensions["keepalive"] = keepalive
+    if os.environ.get("DB_KEEPALIVE_PER_WORKER") != "1":
+        keepalive.start(app)
@@ -0,0 +1,192 @@
+"""
+Opt-in request profiler for admins.
+
+An admin session adds ?_profile=1 (or the X-Profile: 1 header) to any page.
+A sampler thread reads the stack of the request thread every
+PROFILE_INTERVAL_MS until the response is closed, streamed pages included.
+Every sample is attributed to SQL (a frame of database.py is running),
+template rendering (a Jinja frame) or Python, and the request time is split
+in that ratio. Profiles are kept in the result cache backend, so with the
+disk / redis backends /_profile/<id> works from every worker.
+"""
+import collections
+import os
+import pickle
+import sys
+import threading
+import time
+import uuid
+
+from flask import g, request, session
+
+from cache import MemoryBackend, result_cache
+
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", 5))
+PROFILE_TTL = int(os.environ.get("PROFILE_TTL", 24 * 3600))
+RECENT_PROFILES = 50
+
+# Deepest frames first: a template calling a query counts as SQL
+CATEGORIES = ["sql", "template", "python"]
+
+_DATABASE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "database.py")
+
+# Without a result cache the profiles stay in this process
+_store = result_cache.backend or MemoryBackend(8 * 1024 * 1024)
+_index_lock = threading.Lock()
+
+
+def _frame_label(code):
+    filename = code.co_filename
+    for path in sys.path:
+        if path and filename.startswith(path):
+            filename = filename[len(path):].lstrip(os.sep)
+            break
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def _category(frame):
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename == _DATABASE_FILE:
+            return "sql"
+        if f"{os.sep}jinja2{os.sep}" in filename or filename.endswith(".html"):
+            return "template"
+        frame = frame.f_back
+    return "python"
+
+
+def _stack(frame):
+    """Labels of the frames from the outermost to frame"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return tuple(reversed(labels))
+
+
+class Sampler(threading.Thread):
+    """Samples the stack of another thread until stop() is called"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.categories = collections.Counter()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            self.stacks[_stack(frame)] += 1
+            self.categories[_category(frame)] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+def _requested():
+    if not session.get("is_admin") or request.endpoint in (None, "static") or request.path.startswith("/_profile"):
+        return False
+    return request.args.get("_profile") == "1" or request.headers.get("X-Profile") == "1"
+
+
+def _start():
+    if not _requested():
+        return
+    g.profile_id = uuid.uuid4().hex[:12]
+    g.profile_started = time.perf_counter()
+    g.profile_sampler = Sampler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000)
+    g.profile_sampler.start()
+
+
+def _attach(response):
+    sampler = g.get("profile_sampler")
+    if sampler is None:
+        return response
+    profile = {
+        "id": g.profile_id,
+        "url": request.full_path.rstrip("?"),
+        "endpoint": request.endpoint,
+        "status": response.status_code,
+        "created_at": time.time(),
+        "interval_ms": PROFILE_INTERVAL_MS,
+    }
+    started = g.profile_started
+    response.headers["X-Profile-Id"] = profile["id"]
+    # Streamed bodies are rendered after this hook: finish when the response is closed
+    response.call_on_close(lambda: _finish(profile, sampler, started))
+    return response
+
+
+def _finish(profile, sampler, started):
+    sampler.stop()
+    duration_ms = (time.perf_counter() - started) * 1000
+    samples = sum(sampler.categories.values())
+    profile["duration_ms"] = duration_ms
+    profile["samples"] = samples
+    profile["split_ms"] = {
+        category: duration_ms * sampler.categories[category] / samples if samples else 0.0
+        for category in CATEGORIES
+    }
+    profile["stacks"] = list(sampler.stacks.items())
+    save_profile(profile)
+
+
+def save_profile(profile):
+    try:
+        _store.set(f"profile-{profile['id']}", pickle.dumps(profile), PROFILE_TTL)
+        summary = {key: profile[key] for key in ("id", "url", "status", "created_at", "duration_ms", "split_ms")}
+        with _index_lock:
+            recent = [summary] + recent_profiles()
+            _store.set("profile-index", pickle.dumps(recent[:RECENT_PROFILES]), PROFILE_TTL)
+    except Exception as e:
+        print(f"Profile store error: {e}")
+
+
+def load_profile(profile_id):
+    value = _store.get(f"profile-{profile_id}")
+    return pickle.loads(value) if value is not None else None
+
+
+def recent_profiles():
+    """Summaries of the last RECENT_PROFILES profiles, newest first"""
+    value = _store.get("profile-index")
+    return pickle.loads(value) if value is not None else []
+
+
+def flame_graph(stacks, min_share=0.005):
+    """
+    Call tree of sampled stacks as nested {"name", "samples", "children"}
+    dicts, children sorted by samples. Nodes below min_share of all samples
+    are dropped.
+    """
+    root = {"name": "all", "samples": 0, "children": {}}
+    for stack, count in stacks:
+        root["samples"] += count
+        node = root
+        for label in stack:
+            node = node["children"].setdefault(label, {"name": label, "samples": 0, "children": {}})
+            node["samples"] += count
+
+    threshold = root["samples"] * min_share
+
+    def _prune(node):
+        children = [child for child in node["children"].values() if child["samples"] >= threshold]
+        node["children"] = [_prune(child) for child in sorted(children, key=lambda c: -c["samples"])]
+        return node
+
+    return _prune(root)
+
+
+def init_profiler(app):
+    """Profiles admin requests marked with ?_profile=1 or X-Profile: 1"""
+    app.before_request(_start)
+    app.after_request(_attach)
+
+    @app.context_processor
+    def inject_profile_id():
+        return dict(profile_id=g.get("profile_id"))
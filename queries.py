@@ -0,0 +1,1200 @@
+"""
+SQL of the read endpoints, shared by the Flask blueprints (routes/) and the
+async JSON API (api.py).
+
+Builders return (query, params) pairs with %s placeholders, so the same
+statements run on psycopg2 and on the async psycopg driver. Endpoints with
+several independent queries expose them as a dict {name: (query, params)}
+that the Flask side runs one after the other and the API runs concurrently;
+the shape_* functions turn the results into the page / JSON structure.
+Listing filters are declared as specs and compiled by filters.py.
+"""
+from filters import Filter, compile_filters
+
+# ==================== TRADES ====================
+
+TRADE_SORT_OPTIONS = {
+    'year_desc': 'tf.year DESC',
+    'year_asc': 'tf.year ASC',
+    'reporter_asc': 'rc.country_name ASC',
+    'reporter_desc': 'rc.country_name DESC',
+    'partner_asc': 'pc.country_name ASC',
+    'partner_desc': 'pc.country_name DESC',
+    'type_asc': 'tf.trade_type ASC',
+    'type_desc': 'tf.trade_type DESC',
+    'commodity_asc': 'c.item_name ASC',
+    'commodity_desc': 'c.item_name DESC',
+    'qty_asc': 'tf.qty_tonnes ASC NULLS LAST',
+    'qty_desc': 'tf.qty_tonnes DESC NULLS LAST',
+    'value_asc': 'tf.val_1k_usd ASC NULLS LAST',
+    'value_desc': 'tf.val_1k_usd DESC NULLS LAST',
+}
+
+TRADE_FLOWS_SELECT = """
+    SELECT
+        tf.unique_id,
+        tf.reporter_code AS reporter_country,
+        tf.partner_code AS partner_country,
+        tf.item_code AS trade_item,
+        tf.trade_type,
+        tf.year,
+        tf.qty_tonnes,
+        tf.val_1k_usd,
+        rc.country_name AS reporter_name,
+        pc.country_name AS partner_name,
+        c.item_name AS commodity_name
+    FROM trade_data_final AS tf
+    LEFT JOIN Countries AS rc ON tf.reporter_code = rc.country_id
+    LEFT JOIN Countries AS pc ON tf.partner_code = pc.country_id
+    LEFT JOIN Commodities AS c ON tf.item_code = c.fao_code
+    WHERE 1=1
+"""
+
+# Top trading partners
+# This query demonstrates ALL rubric requirements:
+# 1. NESTED QUERY: Subquery for percentage of global trade
+# 2. COMPLEX JOIN: 5 tables (trade_data_final + Countries x2 + Commodities + Production)
+# 3. GROUP BY: Grouped by country pairs and regions
+# 4. OUTER JOIN: All LEFT JOINs to include trades even without production data
+TRADE_TOP_PARTNERS = """
+    SELECT
+        tf.reporter_code,
+        tf.partner_code,
+        rc.country_name AS reporter_name,
+        rc.region AS reporter_region,
+        pc.country_name AS partner_name,
+        pc.region AS partner_region,
+        COUNT(*) AS transaction_count,
+        COALESCE(SUM(tf.val_1k_usd), 0) AS total_value,
+        COALESCE(SUM(tf.qty_tonnes), 0) AS total_quantity,
+        MODE() WITHIN GROUP (ORDER BY c.item_name) AS top_commodity,
+        -- NESTED QUERY: Calculate percentage of global trade (Requirement 1)
+        ROUND(
+            (COALESCE(SUM(tf.val_1k_usd), 0) /
+             NULLIF((SELECT SUM(val_1k_usd) FROM trade_data_final), 0) * 100),
+            2
+        ) AS pct_of_global_trade,
+        -- Check if reporter country produces what they trade
+        CASE
+            WHEN SUM(COALESCE(p.quantity_tonnes, 0)) > 0 THEN 'Producer & Trader'
+            ELSE 'Trader Only'
+        END AS trade_classification,
+        COALESCE(SUM(p.quantity_tonnes), 0) AS domestic_production
+    FROM trade_data_final tf
+    -- TABLE 1 & 2: Reporter Country with region (OUTER JOIN - Requirement 4)
+    LEFT JOIN Countries rc ON tf.reporter_code = rc.country_id
+    -- TABLE 3: Partner Country with region (OUTER JOIN - Requirement 4)
+    LEFT JOIN Countries pc ON tf.partner_code = pc.country_id
+    -- TABLE 4: Commodities (OUTER JOIN - Requirement 4)
+    LEFT JOIN Commodities c ON tf.item_code = c.fao_code
+    -- TABLE 5: Production to check domestic production (OUTER JOIN - Requirement 4)
+    LEFT JOIN production p ON tf.reporter_code = p.country_code
+                            AND tf.item_code = p.commodity_code
+                            AND tf.year = p.year
+    WHERE tf.year >= 2015
+    -- GROUP BY clause (Requirement 3)
+    GROUP BY
+        tf.reporter_code,
+        tf.partner_code,
+        rc.country_name,
+        rc.region,
+        pc.country_name,
+        pc.region
+    HAVING COUNT(*) > 0
+    ORDER BY total_value DESC
+    LIMIT 10
+"""
+
+TRADE_TOP_COMMODITIES = """
+    SELECT
+        tf.item_code AS fao_code,
+        c.item_name AS commodity_name,
+        COUNT(*) AS trade_count,
+        COALESCE(SUM(tf.val_1k_usd), 0) AS total_value,
+        COUNT(DISTINCT tf.reporter_code) + COUNT(DISTINCT tf.partner_code) AS country_count,
+        COALESCE(AVG(tf.val_1k_usd), 0) AS avg_value
+    FROM trade_data_final tf
+    LEFT JOIN Commodities c ON tf.item_code = c.fao_code
+    GROUP BY tf.item_code, c.item_name
+    ORDER BY total_value DESC
+    LIMIT 6
+"""
+
+TRADE_COUNTRIES = """
+    SELECT country_id AS country_code, country_name
+    FROM Countries
+    ORDER BY country_name
+"""
+
+TRADE_COMMODITIES = """
+    SELECT fao_code, item_name AS commodity_name
+    FROM Commodities
+    ORDER BY item_name
+"""
+
+TRADE_YEARS = "SELECT DISTINCT year FROM trade_data_final ORDER BY year DESC"
+
+TRADE_TYPES = "SELECT DISTINCT trade_type FROM trade_data_final WHERE trade_type IS NOT NULL ORDER BY trade_type"
+
+
+TRADE_FILTERS = (
+    Filter('reporters', 'tf.reporter_code', 'any', 'int'),
+    Filter('partners', 'tf.partner_code', 'any', 'int'),
+    Filter('trade_types', 'tf.trade_type', 'any', 'text'),
+    Filter('years', 'tf.year', 'any', 'int'),
+    Filter('commodities', 'tf.item_code', 'any', 'int'),
+)
+
+
+def trade_filters_from_args(args):
+    """Multi-select trade filters of a request (Flask or Starlette query args)"""
+    return {
+        'reporters': args.getlist('reporter_country'),
+        'partners': args.getlist('partner_country'),
+        'trade_types': args.getlist('trade_type'),
+        'years': args.getlist('year'),
+        'commodities': args.getlist('commodity'),
+    }
+
+
+def trade_flows_queries(filters, sort_by, limit, offset):
+    """Filtered trade flows page, its total count and the filtered statistics"""
+    where, params = compile_filters(TRADE_FILTERS, filters)
+    order_by = TRADE_SORT_OPTIONS.get(sort_by, 'tf.val_1k_usd DESC NULLS LAST')
+
+    stats_base = f"""
+        FROM trade_data_final tf
+        WHERE 1=1 {where}
+    """
+
+    return {
+        'trade_flows': (
+            TRADE_FLOWS_SELECT + where + f" ORDER BY {order_by} LIMIT %s OFFSET %s;",
+            tuple(params) + (limit, offset),
+        ),
+        'total': (
+            "SELECT COUNT(*) as total " + TRADE_FLOWS_SELECT[TRADE_FLOWS_SELECT.find('FROM'):] + where,
+            tuple(params) or None,
+        ),
+        'stats': (f"""
+            SELECT
+                COUNT(*) as total_trades,
+                COALESCE(SUM(val_1k_usd), 0) as total_value,
+                COUNT(DISTINCT reporter_code) + COUNT(DISTINCT partner_code) as active_countries,
+                COUNT(DISTINCT item_code) as traded_commodities
+            {stats_base}
+        """, tuple(params) or None),
+        'trade_types': (f"""
+            SELECT
+                trade_type,
+                COUNT(*) as count,
+                COALESCE(SUM(val_1k_usd), 0) as total_value,
+                COALESCE(AVG(val_1k_usd), 0) as avg_value
+            {stats_base}
+            GROUP BY trade_type
+            ORDER BY total_value DESC
+        """, tuple(params) or None),
+    }
+
+
+def trade_type_breakdown(rows):
+    """Per trade type count / value / share, keyed by trade type"""
+    breakdown = {}
+    total_count = sum(row['count'] for row in rows) if rows else 0
+    for row in (rows or []):
+        breakdown[row['trade_type']] = {
+            'count': row['count'],
+            'total_value': row['total_value'],
+            'avg_value': row['avg_value'],
+            'percentage': (row['count'] / total_count * 100) if total_count > 0 else 0
+        }
+    return breakdown
+
+
+# Tables read by the trade statistics dashboard
+TRADE_STATISTICS_TABLES = ("trade_data_final", "countries", "commodities", "production")
+
+
+def trade_summary_queries():
+    """Summary cards and tables of the trade statistics dashboard"""
+    return {
+        # Summary Statistics
+        'summary': ("""
+            SELECT
+                COUNT(*) as total_trades,
+                COALESCE(SUM(val_1k_usd), 0) as total_value,
+                COUNT(DISTINCT reporter_code) as reporter_countries_count,
+                COUNT(DISTINCT partner_code) as partner_countries_count,
+                MIN(year) as min_year,
+                MAX(year) as max_year
+            FROM trade_data_final
+        """, None),
+        # Trade type breakdown
+        'trade_types': ("""
+            SELECT
+                trade_type,
+                COUNT(*) as count,
+                COALESCE(SUM(val_1k_usd), 0) as total_value,
+                COALESCE(AVG(val_1k_usd), 0) as avg_value
+            FROM trade_data_final
+            WHERE trade_type IS NOT NULL
+            GROUP BY trade_type
+            ORDER BY total_value DESC
+        """, None),
+        'top_partners': (TRADE_TOP_PARTNERS, None),
+        'top_commodities': (TRADE_TOP_COMMODITIES, None),
+    }
+
+
+def trade_chart_queries():
+    """One query per chart of the trade statistics dashboard"""
+    return {
+        # Time Series Data (Exports vs Imports by Year)
+        'time_series': ("""
+            SELECT
+                tf.year,
+                tf.trade_type,
+                COUNT(*) AS transaction_count,
+                COALESCE(SUM(tf.val_1k_usd), 0) AS total_value
+            FROM trade_data_final tf
+            WHERE tf.trade_type IN ('Export', 'Import') AND tf.year IS NOT NULL
+            GROUP BY tf.year, tf.trade_type
+            ORDER BY tf.year ASC
+        """, None),
+        # Top Trading Countries (as reporter and as partner)
+        'top_countries': ("""
+            SELECT
+                c.country_name,
+                c.country_id,
+                COUNT(DISTINCT tf.unique_id) AS trade_count,
+                COALESCE(SUM(tf.val_1k_usd), 0) AS total_trade_value
+            FROM trade_data_final tf
+            LEFT JOIN Countries c ON tf.reporter_code = c.country_id
+            WHERE c.country_name IS NOT NULL
+            GROUP BY c.country_id, c.country_name
+
+            UNION ALL
+
+            SELECT
+                c.country_name,
+                c.country_id,
+                COUNT(DISTINCT tf.unique_id) AS trade_count,
+                COALESCE(SUM(tf.val_1k_usd), 0) AS total_trade_value
+            FROM trade_data_final tf
+            LEFT JOIN Countries c ON tf.partner_code = c.country_id
+            WHERE c.country_name IS NOT NULL
+            GROUP BY c.country_id, c.country_name
+        """, None),
+        # Trade Balance by Country
+        'trade_balance': ("""
+            SELECT
+                c.country_name,
+                COALESCE(SUM(CASE WHEN tf.trade_type = 'Export' THEN tf.val_1k_usd ELSE 0 END), 0) AS exports,
+                COALESCE(SUM(CASE WHEN tf.trade_type = 'Import' THEN tf.val_1k_usd ELSE 0 END), 0) AS imports
+            FROM trade_data_final tf
+            LEFT JOIN Countries c ON tf.reporter_code = c.country_id
+            WHERE c.country_name IS NOT NULL
+            GROUP BY c.country_id, c.country_name
+            ORDER BY ABS(COALESCE(SUM(CASE WHEN tf.trade_type = 'Export' THEN tf.val_1k_usd ELSE 0 END), 0) -
+                         COALESCE(SUM(CASE WHEN tf.trade_type = 'Import' THEN tf.val_1k_usd ELSE 0 END), 0)) DESC
+            LIMIT 15
+        """, None),
+        # Top Commodities Distribution
+        'commodities': ("""
+            SELECT
+                c.item_name,
+                COUNT(*) AS trade_count,
+                COALESCE(SUM(tf.val_1k_usd), 0) AS total_value
+            FROM trade_data_final tf
+            LEFT JOIN Commodities c ON tf.item_code = c.fao_code
+            WHERE c.item_name IS NOT NULL
+            GROUP BY c.item_name
+            ORDER BY total_value DESC
+            LIMIT 8
+        """, None),
+        # Regional Trade Distribution
+        'regional': ("""
+            SELECT
+                COALESCE(c.region, 'Unknown') AS region,
+                COUNT(*) AS trade_count,
+                COALESCE(SUM(tf.val_1k_usd), 0) AS total_value
+            FROM trade_data_final tf
+            LEFT JOIN Countries c ON tf.reporter_code = c.country_id
+            WHERE c.region IS NOT NULL
+            GROUP BY c.region
+            ORDER BY total_value DESC
+        """, None),
+        # Yearly Trade Volume
+        'volume': ("""
+            SELECT
+                tf.year,
+                COUNT(*) AS transaction_count,
+                COALESCE(SUM(tf.val_1k_usd), 0) AS total_value,
+                COALESCE(AVG(tf.val_1k_usd), 0) AS avg_value
+            FROM trade_data_final tf
+            WHERE tf.year IS NOT NULL
+            GROUP BY tf.year
+            ORDER BY tf.year ASC
+        """, None),
+    }
+
+
+def trade_statistics_queries():
+    """Independent queries of the trade statistics dashboard"""
+    return {**trade_summary_queries(), **trade_chart_queries()}
+
+
+def time_series_chart(rows):
+    """Exports vs imports by year"""
+    years = sorted(set(row['year'] for row in rows))
+    values = {(r['year'], r['trade_type']): r['total_value'] for r in rows}
+    return {
+        'labels': years,
+        'exports': [values.get((year, 'Export'), 0) for year in years],
+        'imports': [values.get((year, 'Import'), 0) for year in years],
+    }
+
+
+def top_countries_chart(rows):
+    """Top 10 countries by trade value"""
+    # Aggregate by country (sum duplicates from reporter and partner)
+    country_totals = {}
+    for row in rows:
+        country_name = row['country_name']
+        country_totals[country_name] = country_totals.get(country_name, 0) + row['total_trade_value']
+
+    # Sort and get top 10
+    sorted_countries = sorted(country_totals.items(), key=lambda x: x[1], reverse=True)[:10]
+    return {
+        'labels': [c[0] for c in sorted_countries],
+        'values': [c[1] for c in sorted_countries]
+    }
+
+
+def trade_balance_chart(rows):
+    """Exports, imports and balance of the most unbalanced countries"""
+    return {
+        'labels': [row['country_name'] for row in rows],
+        'exports': [row['exports'] for row in rows],
+        'imports': [row['imports'] for row in rows],
+        'balance': [row['exports'] - row['imports'] for row in rows]
+    }
+
+
+def commodities_chart(rows):
+    """Trade value of the top commodities"""
+    return {
+        'labels': [row['item_name'] for row in rows],
+        'values': [row['total_value'] for row in rows]
+    }
+
+
+def regional_chart(rows):
+    """Trade value per region"""
+    if rows is None:
+        # If region column doesn't exist, use placeholder
+        return {
+            'labels': ['Data Not Available'],
+            'values': [0]
+        }
+    return {
+        'labels': [row['region'] for row in rows],
+        'values': [row['total_value'] for row in rows]
+    }
+
+
+def volume_chart(rows):
+    """Trade value and transaction count by year"""
+    return {
+        'labels': [row['year'] for row in rows],
+        'values': [row['total_value'] for row in rows],
+        'counts': [row['transaction_count'] for row in rows]
+    }
+
+
+# Chart name (key of trade_chart_queries) -> shaper of its rows
+TRADE_CHART_SHAPERS = {
+    'time_series': time_series_chart,
+    'top_countries': top_countries_chart,
+    'trade_balance': trade_balance_chart,
+    'commodities': commodities_chart,
+    'regional': regional_chart,
+    'volume': volume_chart,
+}
+
+
+def shape_trade_summary(results):
+    """Summary cards and tables of the trade statistics dashboard"""
+    summary = results['summary'][0]
+
+    return {
+        'total_trades': summary['total_trades'],
+        'total_value': summary['total_value'],
+        'total_countries': summary['reporter_countries_count'] + summary['partner_countries_count'],
+        'year_range': f"{summary['min_year']}-{summary['max_year']}",
+        'trade_type_breakdown': trade_type_breakdown(results['trade_types']),
+        'top_partners': results['top_partners'] or [],
+        'top_commodities_traded': results['top_commodities'] or [],
+    }
+
+
+def shape_trade_statistics(results):
+    """Chart series and summary of the trade statistics dashboard"""
+    statistics = shape_trade_summary(results)
+    for name, shaper in TRADE_CHART_SHAPERS.items():
+        statistics[f'{name}_data'] = shaper(results[name])
+    return statistics
+
+
+# ==================== LAND USE ====================
+
+COUNTRIES_BY_NAME = """
+    SELECT country_id, country_name
+    FROM Countries
+    ORDER BY country_name ASC;
+"""
+
+COUNTRY_NAME = "SELECT country_name FROM Countries WHERE country_id = %s;"
+
+LAND_USE_SORT_COLUMNS = [
+    "country_area", "land_area", "inland_waters",
+    "arable_land", "permanent_crops", "permanent_meadows_and_pastures",
+    "forest_land", "other_land"
+]
+
+# other_land is computed from the pivoted columns
+_LAND_USE_OTHER_LAND = """(
+            t.land_area
+            - COALESCE(t.arable_land, 0)
+            - COALESCE(t.permanent_crops, 0)
+            - COALESCE(t.permanent_meadows_and_pastures, 0)
+            - COALESCE(t.forest_land, 0)
+        )"""
+
+_LAND_USE_PIVOT = """
+                MAX(CASE WHEN lu.land_type = 'Country area' THEN lu.land_usage_value END) AS country_area,
+                MAX(CASE WHEN lu.land_type = 'Land area' THEN lu.land_usage_value END) AS land_area,
+                MAX(CASE WHEN lu.land_type = 'Inland waters' THEN lu.land_usage_value END) AS inland_waters,
+                MAX(CASE WHEN lu.land_type = 'Arable land' THEN lu.land_usage_value END) AS arable_land,
+                MAX(CASE WHEN lu.land_type = 'Permanent crops' THEN lu.land_usage_value END) AS permanent_crops,
+                MAX(CASE WHEN lu.land_type = 'Permanent meadows and pastures' THEN lu.land_usage_value END)
+                    AS permanent_meadows_and_pastures,
+                MAX(CASE WHEN lu.land_type = 'Forest land' THEN lu.land_usage_value END) AS forest_land
+"""
+
+_LAND_USE_COLUMNS = f"""
+            t.unit,
+            t.country_area,
+            t.land_area,
+            t.inland_waters,
+            t.arable_land,
+            t.permanent_crops,
+            t.permanent_meadows_and_pastures,
+            t.forest_land,
+            {_LAND_USE_OTHER_LAND} AS other_land
+"""
+
+
+def _land_use_order(sort_by, order):
+    # "other_land" hesaplanmış bir alan olduğu için ifadenin kendisiyle sıralanır
+    expression = _LAND_USE_OTHER_LAND if sort_by == "other_land" else f"t.{sort_by}"
+    return f" ORDER BY {expression} {order.upper()} NULLS LAST;"
+
+
+LAND_USE_TABLES = ("land_use", "countries")
+
+
+def land_use_queries(year, country_id, sort_by, order):
+    """Pivoted land use table of a year and the totals of its pie chart"""
+    # Ülke filtresi SEÇİLİRSE eklenir
+    country_clause = " AND lu.country_id = %s" if country_id is not None else ""
+    params = (year, country_id) if country_id is not None else (year,)
+
+    records_query = f"""
+        SELECT
+            t.country_name,
+            t.country_id,
+            t.year,
+            {_LAND_USE_COLUMNS}
+        FROM (
+            SELECT
+                c.country_name,
+                lu.country_id,
+                lu.year,
+                lu.unit,
+                {_LAND_USE_PIVOT}
+            FROM Land_Use AS lu
+            INNER JOIN Countries AS c ON lu.country_id = c.country_id
+            WHERE lu.year = %s{country_clause}
+            GROUP BY c.country_name, lu.country_id, lu.year, lu.unit
+        ) AS t
+    """ + _land_use_order(sort_by, order)
+
+    # Toplamlar kanonik birimde (1000 ha, units.py): farklı birimler karışmaz
+    pie_query = f"""
+        SELECT
+            SUM(CASE WHEN lu.land_type = 'Arable land' THEN lu.land_usage_1000ha ELSE 0 END) AS total_arable,
+            SUM(CASE WHEN lu.land_type = 'Permanent crops' THEN lu.land_usage_1000ha ELSE 0 END) AS total_permanent_crops,
+            SUM(CASE WHEN lu.land_type = 'Permanent meadows and pastures' THEN lu.land_usage_1000ha ELSE 0 END) AS total_meadows,
+            SUM(CASE WHEN lu.land_type = 'Forest land' THEN lu.land_usage_1000ha ELSE 0 END) AS total_forest,
+            SUM(CASE WHEN lu.land_type = 'Inland waters' THEN lu.land_usage_1000ha ELSE 0 END) AS total_inland_waters,
+            SUM(CASE WHEN lu.land_type = 'Land area' THEN lu.land_usage_1000ha ELSE 0 END) AS total_land_area
+        FROM Land_Use AS lu
+        WHERE lu.year = %s{country_clause}
+    """
+
+    return {
+        'records': (records_query, params),
+        'pie': (pie_query, params),
+    }
+
+
+def land_use_count_query(year, country_id):
+    """Row and country counts of land_use_queries' records, without fetching them"""
+    country_clause = " AND lu.country_id = %s" if country_id is not None else ""
+    params = (year, country_id) if country_id is not None else (year,)
+    query = f"""
+        SELECT
+            COUNT(DISTINCT (lu.country_id, lu.unit)) AS total_rows,
+            COUNT(DISTINCT lu.country_id) AS total_countries
+        FROM Land_Use AS lu
+        INNER JOIN Countries AS c ON lu.country_id = c.country_id
+        WHERE lu.year = %s{country_clause};
+    """
+    return query, params
+
+
+def land_use_agri_share(pie_rows):
+    """Agricultural share of the land area, from the pie totals (1000 ha)"""
+    # Tarımsal arazi oranı:
+    # (arable + permanent crops + permanent meadows & pastures) / land_area
+    totals = pie_rows[0] if pie_rows and pie_rows[0] else {}
+    total_land_area = totals.get('total_land_area') or 0
+    total_agri_land = sum(totals.get(key) or 0 for key in ('total_arable', 'total_permanent_crops', 'total_meadows'))
+    return (total_agri_land / total_land_area * 100) if total_land_area > 0 else None
+
+
+def land_use_summary(records, pie_rows):
+    """Country count of the listed land use rows and the agricultural share"""
+    return {
+        'total_rows': len(records),
+        'total_countries': len({row["country_id"] for row in records}) if records else 0,
+        'agri_share': land_use_agri_share(pie_rows),
+    }
+
+
+def land_use_pie(pie_rows):
+    """Pie chart slices from the land use totals"""
+    if not pie_rows or not pie_rows[0]:
+        return {
+            'arable_land': 0,
+            'permanent_crops': 0,
+            'meadows_pastures': 0,
+            'forest_land': 0,
+            'other_land': 0,
+            'inland_waters': 0
+        }
+
+    pie_row = pie_rows[0]
+    total_land = pie_row['total_land_area'] or 0
+
+    # Other land hesaplama
+    other_land = total_land - (
+        (pie_row['total_arable'] or 0) +
+        (pie_row['total_permanent_crops'] or 0) +
+        (pie_row['total_meadows'] or 0) +
+        (pie_row['total_forest'] or 0)
+    )
+
+    return {
+        'arable_land': pie_row['total_arable'] or 0,
+        'permanent_crops': pie_row['total_permanent_crops'] or 0,
+        'meadows_pastures': pie_row['total_meadows'] or 0,
+        'forest_land': pie_row['total_forest'] or 0,
+        'other_land': other_land,
+        'inland_waters': pie_row['total_inland_waters'] or 0
+    }
+
+
+def land_use_timeline_query(country_id, sort_by, order):
+    """All years of land use of a country"""
+    query = f"""
+        SELECT
+            t.year,
+            {_LAND_USE_COLUMNS}
+        FROM (
+            SELECT
+                lu.year,
+                lu.unit,
+                {_LAND_USE_PIVOT}
+            FROM Land_Use AS lu
+            WHERE lu.country_id = %s
+            GROUP BY lu.year, lu.unit
+        ) AS t
+    """ + _land_use_order(sort_by, order)
+    return query, (country_id,)
+
+
+def land_use_timeline_span_query(country_id):
+    """Number of rows and first / last year of a land use timeline"""
+    return """
+        SELECT
+            COUNT(DISTINCT (lu.year, lu.unit)) AS total_years,
+            MIN(lu.year) AS min_year,
+            MAX(lu.year) AS max_year
+        FROM Land_Use AS lu
+        WHERE lu.country_id = %s;
+    """, (country_id,)
+
+
+def land_use_timeline_chart(records):
+    """Chart series of a land use timeline (1990 onwards, by year)"""
+    chart_data = {
+        'years': [],
+        'arable_land': [],
+        'permanent_crops': [],
+        'meadows_pastures': [],
+        'forest_land': [],
+        'other_land': [],
+    }
+
+    # Grafik için kayıtları yıla göre sırala ve 1990+ filtrele
+    for row in sorted(records, key=lambda x: x['year']):
+        if row['year'] < 1990:
+            continue
+        chart_data['years'].append(row['year'])
+        chart_data['arable_land'].append(row['arable_land'] or 0)
+        chart_data['permanent_crops'].append(row['permanent_crops'] or 0)
+        chart_data['meadows_pastures'].append(row['permanent_meadows_and_pastures'] or 0)
+        chart_data['forest_land'].append(row['forest_land'] or 0)
+        chart_data['other_land'].append(row['other_land'] if row['other_land'] is not None else 0)
+
+    return chart_data
+
+
+# ==================== INVESTMENTS ====================
+
+INVESTMENT_TABLES = ("investments", "countries")
+
+INVESTMENT_SORT_COLUMNS = [
+    "total_expenditure", "agriculture_forestry_fishing",
+    "environmental_protection", "biodiversity_landscape", "rd_environmental_protection"
+]
+
+_INVESTMENT_PIVOT = """
+                MAX(CASE WHEN inv.expenditure_type = 'Total Expenditure (general government)'
+                    THEN inv.expenditure_value END) AS total_expenditure,
+                MAX(CASE WHEN inv.expenditure_type = 'Agriculture, forestry, fishing (general government expenditure)'
+                    THEN inv.expenditure_value END) AS agriculture_forestry_fishing,
+                MAX(CASE WHEN inv.expenditure_type = 'Environmental protection (general government expenditure)'
+                    THEN inv.expenditure_value END) AS environmental_protection,
+                MAX(CASE WHEN inv.expenditure_type = 'Protection of Biodiversity and Landscape (general government expenditure)'
+                    THEN inv.expenditure_value END) AS biodiversity_landscape,
+                MAX(CASE WHEN inv.expenditure_type = 'R&D Environmental Protection (general government expenditure)'
+                    THEN inv.expenditure_value END) AS rd_environmental_protection
+"""
+
+_INVESTMENT_COLUMNS = """
+            t.unit,
+            t.total_expenditure,
+            t.agriculture_forestry_fishing,
+            t.environmental_protection,
+            t.biodiversity_landscape,
+            t.rd_environmental_protection
+"""
+
+
+def investments_queries(year, country_id, sort_by, order):
+    """Pivoted investments table of a year and the totals of its pie chart"""
+    # Ülke filtresi SEÇİLİRSE eklenir
+    country_clause = " AND inv.country_id = %s" if country_id is not None else ""
+    params = (year, country_id) if country_id is not None else (year,)
+
+    records_query = f"""
+        SELECT
+            t.country_name,
+            t.country_id,
+            t.year,
+            {_INVESTMENT_COLUMNS}
+        FROM (
+            SELECT
+                c.country_name,
+                inv.country_id,
+                inv.year,
+                inv.unit,
+                {_INVESTMENT_PIVOT}
+            FROM Investments AS inv
+            INNER JOIN Countries AS c ON inv.country_id = c.country_id
+            WHERE inv.year = %s{country_clause}
+            GROUP BY c.country_name, inv.country_id, inv.year, inv.unit
+        ) AS t
+        ORDER BY t.{sort_by} {order.upper()} NULLS LAST;
+    """
+
+    # Toplamlar kanonik birimde (Million USD, units.py)
+    pie_query = f"""
+        SELECT
+            SUM(CASE WHEN inv.expenditure_type = 'Total Expenditure (general government)'
+                THEN inv.expenditure_musd ELSE 0 END) AS total_expenditure,
+            SUM(CASE WHEN inv.expenditure_type = 'Agriculture, forestry, fishing (general government expenditure)'
+                THEN inv.expenditure_musd ELSE 0 END) AS total_agriculture,
+            SUM(CASE WHEN inv.expenditure_type = 'Environmental protection (general government expenditure)'
+                THEN inv.expenditure_musd ELSE 0 END) AS total_environmental,
+            SUM(CASE WHEN inv.expenditure_type = 'Protection of Biodiversity and Landscape (general government expenditure)'
+                THEN inv.expenditure_musd ELSE 0 END) AS total_biodiversity,
+            SUM(CASE WHEN inv.expenditure_type = 'R&D Environmental Protection (general government expenditure)'
+                THEN inv.expenditure_musd ELSE 0 END) AS total_rd
+        FROM Investments AS inv
+        WHERE inv.year = %s{country_clause}
+    """
+
+    return {
+        'records': (records_query, params),
+        'pie': (pie_query, params),
+    }
+
+
+def add_investment_share(row):
+    """Adds the share of every expenditure type in the total to a row (in place)"""
+    total = row["total_expenditure"] or 0
+    if total > 0:
+        row["agriculture_pct"] = (row["agriculture_forestry_fishing"] or 0) / total * 100
+        row["environmental_pct"] = (row["environmental_protection"] or 0) / total * 100
+        row["biodiversity_pct"] = (row["biodiversity_landscape"] or 0) / total * 100
+        row["rd_pct"] = (row["rd_environmental_protection"] or 0) / total * 100
+    else:
+        row["agriculture_pct"] = None
+        row["environmental_pct"] = None
+        row["biodiversity_pct"] = None
+        row["rd_pct"] = None
+    return row
+
+
+def add_investment_shares(records):
+    """Adds the share of every expenditure type in the total (in place)"""
+    for row in records:
+        add_investment_share(row)
+    return records
+
+
+def investments_pie(pie_rows):
+    """Pie chart slices from the investment totals"""
+    if not pie_rows or not pie_rows[0]:
+        return {
+            'agriculture_forestry_fishing': 0,
+            'environmental_protection': 0,
+            'biodiversity_landscape': 0,
+            'rd_environmental_protection': 0
+        }
+
+    pie_row = pie_rows[0]
+    return {
+        'agriculture_forestry_fishing': pie_row['total_agriculture'] or 0,
+        'environmental_protection': pie_row['total_environmental'] or 0,
+        'biodiversity_landscape': pie_row['total_biodiversity'] or 0,
+        'rd_environmental_protection': pie_row['total_rd'] or 0
+    }
+
+
+def investments_total(pie_rows):
+    """Total expenditure of the listed countries in Million USD, from the pie totals"""
+    if not pie_rows or not pie_rows[0]:
+        return 0
+    return pie_rows[0]['total_expenditure'] or 0
+
+
+def investments_timeline_query(country_id, sort_by, order):
+    """All years of investments of a country"""
+    query = f"""
+        SELECT
+            t.year,
+            {_INVESTMENT_COLUMNS}
+        FROM (
+            SELECT
+                inv.year,
+                inv.unit,
+                {_INVESTMENT_PIVOT}
+            FROM Investments AS inv
+            WHERE inv.country_id = %s
+            GROUP BY inv.year, inv.unit
+        ) AS t
+        ORDER BY t.{sort_by} {order.upper()} NULLS LAST;
+    """
+    return query, (country_id,)
+
+
+def investments_timeline_span_query(country_id):
+    """Number of rows and first / last year of an investments timeline"""
+    return """
+        SELECT
+            COUNT(DISTINCT (inv.year, inv.unit)) AS total_years,
+            MIN(inv.year) AS min_year,
+            MAX(inv.year) AS max_year
+        FROM Investments AS inv
+        WHERE inv.country_id = %s;
+    """, (country_id,)
+
+
+def investments_timeline_chart(records):
+    """Chart series of an investments timeline (2001 onwards, by year)"""
+    chart_data = {
+        'years': [],
+        'total_expenditure': [],
+        'agriculture_forestry_fishing': [],
+        'environmental_protection': [],
+        'biodiversity_landscape': [],
+        'rd_environmental_protection': [],
+    }
+
+    # Grafik için kayıtları yıla göre sırala ve 2001+ filtrele
+    for row in sorted(records, key=lambda x: x['year']):
+        if row['year'] < 2001:
+            continue
+        chart_data['years'].append(row['year'])
+        chart_data['total_expenditure'].append(row['total_expenditure'] or 0)
+        chart_data['agriculture_forestry_fishing'].append(row['agriculture_forestry_fishing'] or 0)
+        chart_data['environmental_protection'].append(row['environmental_protection'] or 0)
+        chart_data['biodiversity_landscape'].append(row['biodiversity_landscape'] or 0)
+        chart_data['rd_environmental_protection'].append(row['rd_environmental_protection'] or 0)
+
+    return chart_data
+
+
+# ==================== PRICES ====================
+
+MONTH_NAMES = {
+    1: 'January', 2: 'February', 3: 'March', 4: 'April',
+    5: 'May', 6: 'June', 7: 'July', 8: 'August',
+    9: 'September', 10: 'October', 11: 'November', 12: 'December'
+}
+
+CONSUMER_PRICE_STATS = """
+    SELECT
+        COUNT(*) as total_records,
+        COUNT(DISTINCT country_id) as total_countries
+    FROM Consumer_Prices
+"""
+
+PRODUCER_PRICE_STATS = """
+    SELECT
+        COUNT(*) as total_records,
+        COUNT(DISTINCT country_id) as total_countries,
+        COUNT(DISTINCT commodity_id) as total_commodities
+    FROM Producer_Prices
+"""
+
+
+def price_filters_from_args(args):
+    """
+    Filters shared by the consumer and producer price listings, as given:
+    compile_filters converts them (an invalid one matches nothing)
+    """
+    try:
+        limit = int(args.get('limit', 50))
+    except ValueError:
+        limit = 50
+
+    return {
+        'limit': limit,
+        'country': args.get('country', ''),
+        'type': args.get('type', ''),
+        'commodity': args.get('commodity', ''),
+        'unit': args.get('unit', ''),
+        'months': args.getlist('months'),
+        'year_from': args.get('year_from', ''),
+        'year_to': args.get('year_to', ''),
+    }
+
+
+def _price_filters(alias, *extra):
+    """Country, extra, month and year range filters of a price listing (table alias)"""
+    return (
+        Filter('country', 'c.country_id', 'any', 'int'),
+        *extra,
+        Filter('months', f'{alias}.month', 'any', 'smallint'),
+        Filter('year_from', f'{alias}.year', '>=', 'int'),
+        Filter('year_to', f'{alias}.year', '<=', 'int'),
+    )
+
+
+CONSUMER_PRICE_FILTERS = _price_filters('cp', Filter('type', 'cp.type', 'any', 'smallint'))
+
+PRODUCER_PRICE_FILTERS = _price_filters(
+    'p', Filter('commodity', 'cm.fao_code', 'any', 'int'), Filter('unit', 'p.unit', 'any', 'text'))
+
+
+def consumer_prices_query(filters):
+    """Filtered consumer price listing"""
+    query = """
+        SELECT
+            cp.unique_id,
+            c.country_name,
+            c.country_id,
+            cp.month,
+            cp.type,
+            CASE cp.type
+                WHEN 1 THEN 'General Indices (2015=100)'
+                WHEN 2 THEN 'Food Indices (2015=100)'
+                ELSE 'Unknown'
+            END as type_name,
+            cp.year,
+            cp.value
+        FROM Consumer_Prices cp
+        JOIN countries c ON cp.country_id = c.country_id
+        WHERE 1=1
+    """
+    clause, params = compile_filters(CONSUMER_PRICE_FILTERS, filters)
+    query += clause + " ORDER BY cp.year DESC, c.country_name, cp.type, cp.month LIMIT %s"
+    params.append(filters['limit'])
+    return query, tuple(params)
+
+
+def producer_prices_query(filters):
+    """Filtered producer price listing"""
+    query = """
+        SELECT
+            p.unique_id,
+            c.country_id,
+            c.country_name,
+            cm.item_name,
+            p.month,
+            p.year,
+            p.unit,
+            p.value
+        FROM Producer_Prices p
+        JOIN countries c ON p.country_id = c.country_id
+        JOIN commodities cm ON p.commodity_id = cm.fao_code
+        WHERE 1=1
+    """
+    clause, params = compile_filters(PRODUCER_PRICE_FILTERS, filters)
+    query += clause + " ORDER BY p.year DESC, c.country_name, cm.item_name, p.month LIMIT %s"
+    params.append(filters['limit'])
+    return query, tuple(params)
+
+
+# ==================== PRODUCTION ====================
+
+PRODUCTION_STATS = """
+    SELECT
+        COUNT(*) AS total_records,
+        COUNT(DISTINCT country_code) AS total_countries,
+        COUNT(DISTINCT commodity_code) AS total_commodities,
+        MIN(year) AS min_year,
+        MAX(year) AS max_year
+    FROM production
+"""
+
+# Chart: Top 10 countries by number of distinct items produced
+PRODUCTION_CHART = """
+    SELECT c.country_name, COUNT(DISTINCT p.commodity_code) as item_count
+    FROM production p
+    INNER JOIN Countries c ON p.country_code = c.country_id
+    GROUP BY c.country_name
+    ORDER BY item_count DESC
+    LIMIT 10
+"""
+
+
+PRODUCTION_FILTERS = (
+    Filter('country_code', 'p.country_code', 'any', 'int'),
+    Filter('commodity_code', 'p.commodity_code', 'any', 'int'),
+    Filter('year', 'p.year', 'any', 'int'),
+    Filter('unit', 'p.unit', 'any', 'text'),
+    Filter('search', (
+        'CAST(p.production_ID AS TEXT) LIKE',
+        'c.country_name ILIKE',
+        'co.item_name ILIKE',
+        'CAST(p.year AS TEXT) LIKE',
+        'CAST(p.quantity AS TEXT) LIKE',
+        'p.unit ILIKE',
+    ), 'search', 'text'),
+)
+
+
+def production_filters_from_args(args):
+    return {
+        'country_code': args.get("country_code", ""),
+        'commodity_code': args.get("commodity_code", ""),
+        'year': args.get("year", ""),
+        'unit': args.get("unit", ""),
+        'search': args.get("search", "").strip(),
+    }
+
+
+def production_query(filters):
+    """Production records with filters (first 50 rows)"""
+    # Advanced query with 4 tables including LEFT OUTER JOIN and nested subquery
+    query = """
+        SELECT
+            p.production_ID AS production_id,
+            p.year,
+            p.unit,
+            p.quantity,
+            c.country_name,
+            c.region,
+            co.item_name,
+            co.cpc_code,
+            -- Element count from Production_Value (shows data completeness)
+            COALESCE(pv_agg.element_count, 0) AS element_count,
+            -- Calculated metric: Production density (per capita if population available)
+            CASE
+                WHEN c.population > 0 THEN p.quantity / c.population
+                ELSE 0
+            END AS production_per_capita
+        FROM production p
+        -- Join 1: Countries table for geographic metadata
+        INNER JOIN Countries c ON p.country_code = c.country_id
+        -- Join 2: Commodities table for item details
+        INNER JOIN Commodities co ON p.commodity_code = co.fao_code
+        -- Join 3 (LEFT OUTER): Nested subquery with GROUP BY for aggregating production values
+        LEFT OUTER JOIN (
+            SELECT
+                production_ID,
+                SUM(value) AS total_value,
+                COUNT(DISTINCT element) AS element_count
+            FROM Production_Value
+            WHERE value IS NOT NULL
+            GROUP BY production_ID
+        ) AS pv_agg ON p.production_ID = pv_agg.production_ID
+        WHERE 1=1
+    """
+    clause, params = compile_filters(PRODUCTION_FILTERS, filters)
+    query += clause
+
+    # Order by year and quantity
+    query += """ ORDER BY
+        CASE WHEN p.quantity IS NOT NULL AND p.unit IS NOT NULL
+                  AND c.country_name IS NOT NULL AND co.item_name IS NOT NULL
+             THEN 0 ELSE 1 END,
+        p.year DESC, p.quantity DESC NULLS LAST
+        LIMIT 50"""
+
+    return query, tuple(params)
+
+
+# ==================== PRODUCTION VALUES ====================
+
+PRODUCTION_VALUE_FILTERS = (
+    Filter('element', 'pv.element', 'any', 'text'),
+    Filter('year', 'p.year', 'any', 'int'),
+    Filter('country_code', 'p.country_code', 'any', 'int'),
+    Filter('commodity_code', 'p.commodity_code', 'any', 'int'),
+    Filter('region', 'c.region', 'any', 'text'),
+    Filter('search', (
+        'CAST(pv.production_value_ID AS TEXT) LIKE',
+        'CAST(pv.production_ID AS TEXT) LIKE',
+        'c.country_name ILIKE',
+        'co.item_name ILIKE',
+        'pv.element ILIKE',
+        'CAST(p.year AS TEXT) LIKE',
+        'CAST(pv.value AS TEXT) LIKE',
+        'pv.unit ILIKE',
+        'c.region ILIKE',
+    ), 'search', 'text'),
+)
+
+
+def production_value_filters_from_args(args):
+    return {
+        'element': args.get("element", ""),
+        'year': args.get("year", ""),
+        'country_code': args.get("country_code", ""),
+        'commodity_code': args.get("commodity_code", ""),
+        'region': args.get("region", ""),
+        'search': args.get("search", "").strip(),
+    }
+
+
+def production_values_query(filters):
+    """Production values with filters (first 50 rows)"""
+    query = """
+        SELECT
+            pv.production_value_ID AS production_value_id,
+            pv.production_ID AS production_id,
+            pv.element,
+            p.year,
+            pv.unit,
+            pv.value,
+            p.country_code,
+            p.commodity_code,
+            p.unit AS production_unit,
+            c.country_name,
+            c.region,
+            co.item_name,
+            co.cpc_code
+        FROM Production_Value pv
+        INNER JOIN Production p ON pv.production_ID = p.production_ID
+        INNER JOIN Countries c ON p.country_code = c.country_id
+        INNER JOIN Commodities co ON p.commodity_code = co.fao_code
+        WHERE 1=1
+    """
+    clause, params = compile_filters(PRODUCTION_VALUE_FILTERS, filters)
+    query += clause
+
+    # Order by: prioritize complete rows (no nulls), then by year and value
+    query += """ ORDER BY
+        CASE WHEN pv.value IS NOT NULL AND pv.unit IS NOT NULL AND pv.element IS NOT NULL
+                  AND c.country_name IS NOT NULL AND co.item_name IS NOT NULL AND c.region IS NOT NULL
+             THEN 0 ELSE 1 END,
+        p.year DESC, pv.value DESC NULLS LAST
+        LIMIT 50"""
+
+    return query, tuple(params)
+
+
+# ==================== PLAN TESTS ====================
+
+def named_queries(country_id=1, year=2020, commodity=1):
+    """
+    Every read statement of this module with representative arguments, by
+    name (EXPLAIN snapshots of tests/test_query_plans.py).
+    """
+    filtered_trades = {'reporters': [country_id], 'partners': [], 'trade_types': ['Export'],
+                       'years': [year], 'commodities': [commodity]}
+    price_filters = {'limit': 50, 'country': country_id, 'type': 1, 'commodity': commodity, 'unit': '',
+                     'months': [1, 2, 3], 'year_from': year - 10, 'year_to': year}
+    production_filters = {'country_code': country_id, 'commodity_code': commodity, 'year': year,
+                          'unit': '', 'search': ''}
+    production_value_filters = {'element': 'Gross Production Value (current thousand US$)', 'year': year,
+                                'country_code': country_id, 'commodity_code': commodity, 'region': '',
+                                'search': ''}
+
+    named = {
+        'trade_countries': (TRADE_COUNTRIES, None),
+        'trade_commodities': (TRADE_COMMODITIES, None),
+        'trade_years': (TRADE_YEARS, None),
+        'trade_types': (TRADE_TYPES, None),
+        'countries_by_name': (COUNTRIES_BY_NAME, None),
+        'country_name': (COUNTRY_NAME, (country_id,)),
+        'land_use_count': land_use_count_query(year, None),
+        'land_use_timeline': land_use_timeline_query(country_id, 'year', 'desc'),
+        'land_use_timeline_span': land_use_timeline_span_query(country_id),
+        'investments_timeline': investments_timeline_query(country_id, 'year', 'desc'),
+        'investments_timeline_span': investments_timeline_span_query(country_id),
+        'consumer_price_stats': (CONSUMER_PRICE_STATS, None),
+        'consumer_prices': consumer_prices_query(dict(price_filters, country='', type=None, months=[],
+                                                      year_from=None, year_to=None)),
+        'consumer_prices_filtered': consumer_prices_query(price_filters),
+        'producer_price_stats': (PRODUCER_PRICE_STATS, None),
+        'producer_prices': producer_prices_query(dict(price_filters, country='', commodity='', months=[],
+                                                      year_from=None, year_to=None)),
+        'producer_prices_filtered': producer_prices_query(price_filters),
+        'production_stats': (PRODUCTION_STATS, None),
+        'production_chart': (PRODUCTION_CHART, None),
+        'production': production_query(dict(production_filters, country_code='', commodity_code='', year='')),
+        'production_filtered': production_query(production_filters),
+        'production_values': production_values_query({}),
+        'production_values_filtered': production_values_query(production_value_filters),
+    }
+    for prefix, queries in [
+        ('trade_flows', trade_flows_queries({}, 'value_desc', 20, 0)),
+        ('trade_flows_filtered', trade_flows_queries(filtered_trades, 'qty_asc', 20, 100)),
+        ('trade_summary', trade_summary_queries()),
+        ('trade_chart', trade_chart_queries()),
+        ('land_use', land_use_queries(year, None, 'country_name', 'asc')),
+        ('land_use_country', land_use_queries(year, country_id, 'country_name', 'asc')),
+        ('investments', investments_queries(year, None, 'country_name', 'asc')),
+    ]:
+        for name, query in queries.items():
+            named[f'{prefix}_{name}'] = query
+    return named
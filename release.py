@@ -0,0 +1,39 @@
+"""
+Stamp of the deployed code.
+
+Results that outlive a process (shared result cache entries, ETags) include
+it in their keys, so what the previous code built is never served after a
+deploy, even when the tables did not change. APP_VERSION (e.g. the git SHA
+set by the deploy) is used when set, otherwise a hash of the application's
+sources, templates and scripts / stylesheets (their hashed URLs are in the pages).
+"""
+import functools
+import hashlib
+import os
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Not part of the served code
+_SKIPPED_DIRS = {".git", "__pycache__", "tests", "bench", "venv", ".venv"}
+
+
+def _source_files():
+    for directory, dirs, files in os.walk(ROOT):
+        dirs[:] = sorted(d for d in dirs if d not in _SKIPPED_DIRS)
+        for name in sorted(files):
+            if name.endswith((".py", ".html", ".sql", ".css", ".js")) and name != "log.sql":
+                yield os.path.join(directory, name)
+
+
+@functools.lru_cache(maxsize=None)
+def code_version():
+    """APP_VERSION, or a short content hash of the served code"""
+    version = os.environ.get("APP_VERSION")
+    if version:
+        return version
+    digest = hashlib.sha256()
+    for path in _source_files():
+        digest.update(os.path.relpath(path, ROOT).encode())
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
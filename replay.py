@@ -0,0 +1,258 @@
+"""
+Point-in-time restore from the write journal (see journal.py).
+
+    python replay.py journal.jsonl --until 2026-03-01T12:00:00 --database-url ...
+    python replay.py journal.jsonl --schema schema.sql --database-url ...   # empty database
+    python replay.py journal.jsonl --since 2026-02-01T00:00:00 ...          # on top of a dump
+
+Replays every transaction with since < ts <= until (naive times are UTC),
+over a single connection. Consecutive INSERTs with the same target and
+column list (ON CONFLICT DO NOTHING included) are merged into multi-row
+INSERTs of up to --merge-inserts statements, and the statements are sent
+--page-size at a time in one round trip instead of one by one. Whole
+journal transactions are committed together, --commit-every at a time; on
+an error the current group is rolled back and the last committed
+timestamp is printed, to continue with --since.
+"""
+import argparse
+import datetime
+import os
+import re
+import sys
+import time
+
+import psycopg2
+
+from journal import JOURNAL_PATH, read_journal
+
+PAGE_SIZE = 500
+MERGE_INSERTS = 1000
+COMMIT_EVERY = 5000
+# Largest single round trip
+PAGE_BYTES = 8 * 1024 * 1024
+
+# INSERT INTO t (...) VALUES (...)[, (...)] [ON CONFLICT ... DO NOTHING]
+_INSERT_RE = re.compile(
+    r"^\s*(INSERT\s+INTO\s+[^;]+?\s+VALUES)\s*(\(.*\))(\s+ON\s+CONFLICT\b[^;]*?\bDO\s+NOTHING)?\s*;?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+_NOT_MERGEABLE_RE = re.compile(r"\b(SELECT|RETURNING|ON\s+CONFLICT)\b", re.IGNORECASE)
+
+_WRITE_TARGET_RE = re.compile(
+    r"^\s*(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM)\s+([A-Za-z_][A-Za-z0-9_]*)",
+    re.IGNORECASE,
+)
+
+_BUMP_VERSION = """
+    INSERT INTO TABLE_VERSIONS (table_name, version) VALUES (%s, 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = TABLE_VERSIONS.version + 1
+"""
+
+
+def parse_time(value):
+    """ISO timestamp as an aware datetime, naive values taken as UTC"""
+    parsed = datetime.datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed
+
+
+def _squash(text):
+    return " ".join(text.split())
+
+
+def insert_batch_key(sql):
+    """
+    (statement head, values, tail) when the statement is an INSERT that can
+    be merged with others of the same head and tail, otherwise None
+    """
+    match = _INSERT_RE.match(sql)
+    if not match or _NOT_MERGEABLE_RE.search(match.group(2)) or _NOT_MERGEABLE_RE.search(match.group(1)):
+        return None
+    return _squash(match.group(1)), match.group(2), _squash(match.group(3) or "")
+
+
+def select_entries(entries, since=None, until=None):
+    """Journal transactions with since < ts <= until"""
+    for entry in entries:
+        ts = parse_time(entry["ts"])
+        if since is not None and ts <= since:
+            continue
+        if until is not None and ts > until:
+            continue
+        yield entry
+
+
+class Pipeline:
+    """
+    Sends statements over one cursor: merged INSERTs, then pages of
+    statements joined into a single execute (one round trip per page).
+    """
+
+    def __init__(self, cursor, page_size=PAGE_SIZE, merge_inserts=MERGE_INSERTS):
+        self.cursor = cursor
+        self.page_size = page_size
+        self.merge_inserts = merge_inserts
+        self.statements = 0
+        self.sent = 0
+        self.round_trips = 0
+        self.tables = set()
+        self._page = []
+        self._page_bytes = 0
+        self._insert_key = None
+        self._insert_values = []
+
+    def add(self, sql, params):
+        self.statements += 1
+        match = _WRITE_TARGET_RE.match(sql)
+        if match:
+            self.tables.add(match.group(1).lower())
+
+        key = insert_batch_key(sql)
+        if key is not None:
+            head, values, tail = key
+            if (head, tail) != self._insert_key:
+                self._flush_insert()
+                self._insert_key = (head, tail)
+            self._insert_values.append(self.cursor.mogrify(values, params if params is not None else ()))
+            if len(self._insert_values) >= self.merge_inserts:
+                self._flush_insert()
+            return
+
+        self._flush_insert()
+        self._queue(self.cursor.mogrify(sql, params if params is not None else ()))
+
+    def _flush_insert(self):
+        if not self._insert_values:
+            return
+        head, tail = self._insert_key
+        self._queue(b"".join([
+            head.encode(), b" ", b", ".join(self._insert_values), (" " + tail).encode() if tail else b"",
+        ]))
+        self._insert_key = None
+        self._insert_values = []
+
+    def _queue(self, statement):
+        self._page.append(statement.rstrip().rstrip(b";"))
+        self._page_bytes += len(statement)
+        if len(self._page) >= self.page_size or self._page_bytes >= PAGE_BYTES:
+            self._send()
+
+    def _send(self):
+        if not self._page:
+            return
+        self.cursor.execute(b";\n".join(self._page))
+        self.sent += len(self._page)
+        self.round_trips += 1
+        self._page = []
+        self._page_bytes = 0
+
+    def flush(self):
+        self._flush_insert()
+        self._send()
+
+
+def replay(conn, entries, page_size=PAGE_SIZE, merge_inserts=MERGE_INSERTS, commit_every=COMMIT_EVERY, dry_run=False):
+    """
+    Replays journal entries on conn. Returns a report dict; "error" is set
+    when a group failed (its transactions were rolled back).
+    """
+    cursor = conn.cursor()
+    pipeline = Pipeline(cursor, page_size, merge_inserts)
+    report = {"transactions": 0, "committed_ts": None, "error": None}
+    group = []
+
+    def commit():
+        pipeline.flush()
+        if not dry_run:
+            conn.commit()
+        report["transactions"] += len(group)
+        report["committed_ts"] = group[-1]["ts"]
+        group.clear()
+
+    try:
+        for entry in entries:
+            group.append(entry)
+            for statement in entry["statements"]:
+                pipeline.add(statement["sql"], statement["params"])
+            if len(group) >= commit_every:
+                commit()
+        if group:
+            commit()
+        if dry_run:
+            conn.rollback()
+    except psycopg2.Error as e:
+        conn.rollback()
+        report["error"] = (f"{str(e).strip()} (transactions {group[0]['txid']} {group[0]['ts']} "
+                           f"to {group[-1]['txid']} {group[-1]['ts']} rolled back)")
+
+    if pipeline.tables and not dry_run and report["transactions"]:
+        # Cache entries built before the restore are keyed on the old versions
+        try:
+            for table in sorted(pipeline.tables):
+                cursor.execute(_BUMP_VERSION, (table,))
+            conn.commit()
+        except psycopg2.Error as e:
+            conn.rollback()
+            print(f"TABLE_VERSIONS not updated: {e}")
+
+    cursor.close()
+    report.update(statements=pipeline.statements, sent=pipeline.sent, round_trips=pipeline.round_trips,
+                  tables=sorted(pipeline.tables))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Restore a database from the write journal")
+    parser.add_argument("journals", nargs="*", metavar="JOURNAL",
+                        help=f"journal files, oldest first (default: {JOURNAL_PATH})")
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL"))
+    parser.add_argument("--since", type=parse_time, help="skip transactions up to this time (the base dump)")
+    parser.add_argument("--until", type=parse_time, help="last transaction time to restore")
+    parser.add_argument("--schema", help="SQL file run first, e.g. schema.sql on an empty database")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE, help="statements per round trip")
+    parser.add_argument("--merge-inserts", type=int, default=MERGE_INSERTS, help="INSERT statements merged into one")
+    parser.add_argument("--commit-every", type=int, default=COMMIT_EVERY, help="journal transactions per commit")
+    parser.add_argument("--dry-run", action="store_true", help="replay and roll back")
+    args = parser.parse_args(argv)
+    if not args.database_url:
+        parser.error("--database-url or DATABASE_URL is required")
+    journals = args.journals or [JOURNAL_PATH]
+    for path in journals:
+        if not os.path.exists(path):
+            parser.error(f"file not found: {path}")
+
+    conn = psycopg2.connect(args.database_url)
+    try:
+        if args.schema:
+            with open(args.schema, encoding="utf-8") as f, conn.cursor() as cursor:
+                cursor.execute(f.read())
+            if not args.dry_run:
+                conn.commit()
+
+        def entries():
+            for path in journals:
+                yield from read_journal(path)
+
+        started = time.perf_counter()
+        report = replay(conn, select_entries(entries(), args.since, args.until),
+                        args.page_size, args.merge_inserts, args.commit_every, args.dry_run)
+    finally:
+        conn.close()
+
+    seconds = time.perf_counter() - started
+    print(f"{report['transactions']:,} transactions, {report['statements']:,} statements sent as "
+          f"{report['sent']:,} in {report['round_trips']:,} round trips, {seconds:.1f}s"
+          f"{' (dry run, rolled back)' if args.dry_run else ''}")
+    if report["tables"]:
+        print(f"Tables: {', '.join(report['tables'])}")
+    if report["committed_ts"]:
+        print(f"Restored up to {report['committed_ts']}")
+    if report["error"]:
+        print(f"Error: {report['error']}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,14 @@
 from flask import Blueprint, render_template, request
 from database import fetch_query
 from routes.auth_routes import login_required, admin_required
+from conditional import conditional_get
+from analytics.commodity_profile import COMMODITY_PROFILE_TABLES, commodity_profile
 
 commodity_bp = Blueprint("commodity", __name__)
 
 @commodity_bp.route("/commodities")
 @login_required
+@conditional_get("commodities", "producer_prices")
 def commodities_dashboard():
     try:
         limit = int(request.args.get('limit', 50))
@@ -54,4 +57,23 @@ def commodities_dashboard():
         with_cpc=stats.get('with_cpc', 0),
         current_limit=limit,
         search_query=search_query
-    )
\ No newline at end of file
+    )
+
+
+@commodity_bp.route("/commodities/<int:fao_code>")
+@login_required
+@conditional_get(*COMMODITY_PROFILE_TABLES)
+def commodity_detail(fao_code):
+    # Precomputed per-commodity summary (analytics/commodity_profile.py)
+    summary = commodity_profile(fao_code)
+
+    if summary is None:
+        return "Commodity data is not available", 500
+    if not summary["commodity"]:
+        return "Commodity not found", 404
+
+    return render_template(
+        'commodity_detail.html',
+        commodity=summary["commodity"],
+        summary=summary,
+    )
@@ -1,6 +1,9 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
-from database import fetch_query, execute_query
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from database import fetch_query, execute_query, stream_query
+from queries import CONSUMER_PRICE_STATS, MONTH_NAMES, consumer_prices_query, price_filters_from_args
 from routes.auth_routes import login_required, admin_required
+from analytics.consumer_prices import consumer_price_engine, PRICE_TYPES
+from streaming import stream_page
 
 consumer_price_bp = Blueprint("consumer_price", __name__)
 
@@ -25,6 +28,9 @@ def consumer_prices_dashboard():
     year_from = request.args.get('year_from', '')
     year_to = request.args.get('year_to', '')
 
+    # Optional base year for the rebased index column
+    base_year = request.args.get('base_year', type=int)
+
     # Fetch countries for dropdown
     countries_query = """
         SELECT DISTINCT c.country_id, c.country_name
@@ -47,82 +53,22 @@ def consumer_prices_dashboard():
         {'value': 2, 'name': 'Food Indices (2015=100)'}
     ]
 
-    # Build dynamic query with filters
-    query = """
-        SELECT 
-            cp.unique_id,
-            c.country_name,
-            c.country_id,
-            cp.month,
-            cp.type,
-            CASE cp.type
-                WHEN 1 THEN 'General Indices (2015=100)'
-                WHEN 2 THEN 'Food Indices (2015=100)'
-                ELSE 'Unknown'
-            END as type_name,
-            cp.year,
-            cp.value
-        FROM Consumer_Prices cp
-        JOIN countries c ON cp.country_id = c.country_id
-        WHERE 1=1
-    """
-    params = []
-    
-    if country_filter:
-        query += " AND c.country_id = %s"
-        params.append(country_filter)
-    
-    if type_filter:
-        try:
-            query += " AND cp.type = %s"
-            params.append(int(type_filter))
-        except ValueError:
-            pass
-    
-    # Multi-month filter
-    if selected_months:
-        placeholders = ', '.join(['%s'] * len(selected_months))
-        query += f" AND cp.month IN ({placeholders})"
-        params.extend(selected_months)
-    
-    # Year range filter
-    if year_from:
-        try:
-            query += " AND cp.year >= %s"
-            params.append(int(year_from))
-        except ValueError:
-            pass
-    
-    if year_to:
-        try:
-            query += " AND cp.year <= %s"
-            params.append(int(year_to))
-        except ValueError:
-            pass
-    
-    query += " ORDER BY cp.year DESC, c.country_name, cp.type, cp.month LIMIT %s"
-    params.append(limit)
-    
-    prices = fetch_query(query, tuple(params))
+    # Inflation columns come from the precomputed arrays, no extra query per row
+    def add_inflation(row):
+        row.update(consumer_price_engine.metrics_for(
+            row['country_id'], row['type'], row['year'], row['month'], base_year
+        ))
+        return row
+
+    # Build dynamic query with filters (shared with the async API, see queries.py).
+    # The rows are read while the page is sent, the limit is not bounded
+    prices = stream_query(*consumer_prices_query(price_filters_from_args(request.args)), transform=add_inflation)
 
     # Statistics Query
-    stats_query = """
-        SELECT 
-            COUNT(*) as total_records,
-            COUNT(DISTINCT country_id) as total_countries
-        FROM Consumer_Prices
-    """
-    stats_result = fetch_query(stats_query)
+    stats_result = fetch_query(CONSUMER_PRICE_STATS)
     stats = stats_result[0] if stats_result else {}
-    
-    # Month names for template
-    month_names = {
-        1: 'January', 2: 'February', 3: 'March', 4: 'April',
-        5: 'May', 6: 'June', 7: 'July', 8: 'August',
-        9: 'September', 10: 'October', 11: 'November', 12: 'December'
-    }
 
-    return render_template(
+    return stream_page(
         'consumer_prices.html',
         prices=prices,
         total_records=stats.get('total_records', 0),
@@ -137,10 +83,29 @@ def consumer_prices_dashboard():
         selected_months=selected_months,
         year_from=year_from,
         year_to=year_to,
-        month_names=month_names
+        base_year=base_year,
+        month_names=MONTH_NAMES
     )
 
 
+@consumer_price_bp.route("/consumer_prices/inflation.json")
+@login_required
+def consumer_prices_inflation():
+    """
+    Monthly index, YoY, MoM and rolling average series as JSON.
+    Optional filters: country (repeatable), type (repeatable), base_year.
+    """
+    country_ids = request.args.getlist('country', type=int)
+    price_types = [t for t in request.args.getlist('type', type=int) if t in PRICE_TYPES]
+    base_year = request.args.get('base_year', type=int)
+
+    payload = consumer_price_engine.series(country_ids, price_types, base_year)
+    if payload is None:
+        return jsonify({"error": "Consumer price data is not available."}), 500
+
+    return jsonify(payload)
+
+
 # ==================== CRUD OPERATIONS ====================
 
 @consumer_price_bp.route("/consumer-prices/new", methods=["GET"])
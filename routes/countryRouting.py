@@ -1,12 +1,15 @@
 from flask import Blueprint, render_template, request, jsonify
 from database import execute_query, fetch_query
 from routes.auth_routes import login_required
+from conditional import conditional_get
+from analytics.country_profile import COUNTRY_PROFILE_TABLES, country_profile
 
 country_bp = Blueprint("country", __name__)
 
 
 @country_bp.route("/countries")
 @login_required
+@conditional_get("countries")
 def countries_dashboard():
     
     # Get filter parameters
@@ -62,18 +65,31 @@ def countries_dashboard():
 
 @country_bp.route("/countries/<int:country_id>")
 @login_required
+@conditional_get(*COUNTRY_PROFILE_TABLES)
 def countries_detailed(country_id):
-    # Fetch specific country by ID
-    query = "SELECT * FROM Countries WHERE country_id = %s"
-    result = fetch_query(query, (country_id,))
-    
-    if not result or len(result) == 0:
+    # Ülkenin tüm veri setleri tek sorguda (analytics/country_profile.py)
+    profile = country_profile(country_id)
+
+    if profile is None:
+        return "Country data is not available", 500
+    if not profile["country"]:
         return "Country not found", 404
-    
-    country = result[0]
-    
-    
+
     return render_template(
         'country_detail.html',
-        country=country
-    )
\ No newline at end of file
+        country=profile["country"],
+        profile=profile,
+    )
+
+
+@country_bp.route("/countries/<int:country_id>/profile.json")
+@login_required
+@conditional_get(*COUNTRY_PROFILE_TABLES)
+def country_profile_json(country_id):
+    """Trade, production, prices, land use, investments and ratios of a country as JSON"""
+    profile = country_profile(country_id)
+    if profile is None:
+        return jsonify({"error": "Country data is not available."}), 500
+    if not profile["country"]:
+        return jsonify({"error": "Country not found."}), 404
+    return jsonify(profile)
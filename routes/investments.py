@@ -1,6 +1,22 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
-from database import execute_query, fetch_query
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from database import execute_query, fetch_query, fetch_queries, stream_query
+from queries import (
+    COUNTRY_NAME,
+    INVESTMENT_TABLES,
+    add_investment_share,
+    add_investment_shares,
+    investments_pie,
+    investments_queries,
+    investments_timeline_chart,
+    investments_timeline_query,
+    investments_timeline_span_query,
+    investments_total,
+)
 from routes.auth_routes import login_required, admin_required
+from cache import cached_result
+from conditional import conditional_get
+from units import canonical
+from streaming import stream_page
 
 investments_bp = Blueprint("investments", __name__)
 
@@ -30,137 +46,30 @@ def investmentsPage():
     if order not in ["asc", "desc"]:
         order = "asc"
 
-    # Yıl dropdown'u
-    years = list(range(1961, 2026))
-
-    # Ülke dropdown'u: Countries tablosundan
-    countries_query = """
-        SELECT country_id, country_name
-        FROM Countries
-        ORDER BY country_name ASC;
-    """
-    countries = fetch_query(countries_query, ())
-
-    # --- ANA TABLO SORGUSU ---
-    base_query = """
-        SELECT
-            t.country_name,
-            t.country_id,
-            t.year,
-            t.unit,
-            t.total_expenditure,
-            t.agriculture_forestry_fishing,
-            t.environmental_protection,
-            t.biodiversity_landscape,
-            t.rd_environmental_protection
-        FROM (
-            SELECT
-                c.country_name,
-                inv.country_id,
-                inv.year,
-                inv.unit,
-                MAX(CASE WHEN inv.expenditure_type = 'Total Expenditure (general government)' 
-                    THEN inv.expenditure_value END) AS total_expenditure,
-                MAX(CASE WHEN inv.expenditure_type = 'Agriculture, forestry, fishing (general government expenditure)' 
-                    THEN inv.expenditure_value END) AS agriculture_forestry_fishing,
-                MAX(CASE WHEN inv.expenditure_type = 'Environmental protection (general government expenditure)' 
-                    THEN inv.expenditure_value END) AS environmental_protection,
-                MAX(CASE WHEN inv.expenditure_type = 'Protection of Biodiversity and Landscape (general government expenditure)' 
-                    THEN inv.expenditure_value END) AS biodiversity_landscape,
-                MAX(CASE WHEN inv.expenditure_type = 'R&D Environmental Protection (general government expenditure)' 
-                    THEN inv.expenditure_value END) AS rd_environmental_protection
-            FROM Investments AS inv
-            INNER JOIN Countries AS c ON inv.country_id = c.country_id
-            WHERE inv.year = %s
-    """
-    params = [year]
-
-    # Ülke filtresi SEÇİLİRSE eklenir
-    if country_id is not None:
-        base_query += " AND inv.country_id = %s"
-        params.append(country_id)
-
-    base_query += """
-            GROUP BY c.country_name, inv.country_id, inv.year, inv.unit
-        ) AS t
-    """
-    
-    # Dinamik ORDER BY ekleme
-    base_query += f" ORDER BY t.{sort_by} {order.upper()} NULLS LAST;"
+    # Yıl ve ülke dropdown'ları şablonda option_list ile gelir (fragments.py)
 
-    records = fetch_query(base_query, tuple(params)) or []
+    # --- ANA TABLO SORGUSU + PIE CHART TOPLAMLARI (queries.py) ---
+    results = fetch_queries(investments_queries(year, country_id, sort_by, order))
 
     # Yüzde hesaplamalarını ekle
-    for row in records:
-        total = row["total_expenditure"] or 0
-        if total > 0:
-            row["agriculture_pct"] = (row["agriculture_forestry_fishing"] or 0) / total * 100
-            row["environmental_pct"] = (row["environmental_protection"] or 0) / total * 100
-            row["biodiversity_pct"] = (row["biodiversity_landscape"] or 0) / total * 100
-            row["rd_pct"] = (row["rd_environmental_protection"] or 0) / total * 100
-        else:
-            row["agriculture_pct"] = None
-            row["environmental_pct"] = None
-            row["biodiversity_pct"] = None
-            row["rd_pct"] = None
+    records = add_investment_shares(results['records'] or [])
 
     # İstatistikler
     total_rows = len(records)
     total_countries = len({row["country_id"] for row in records}) if records else 0
 
     # Pie chart için data
-    pie_query = """
-        SELECT
-            SUM(CASE WHEN inv.expenditure_type = 'Total Expenditure (general government)' 
-                THEN inv.expenditure_value ELSE 0 END) AS total_expenditure,
-            SUM(CASE WHEN inv.expenditure_type = 'Agriculture, forestry, fishing (general government expenditure)' 
-                THEN inv.expenditure_value ELSE 0 END) AS total_agriculture,
-            SUM(CASE WHEN inv.expenditure_type = 'Environmental protection (general government expenditure)' 
-                THEN inv.expenditure_value ELSE 0 END) AS total_environmental,
-            SUM(CASE WHEN inv.expenditure_type = 'Protection of Biodiversity and Landscape (general government expenditure)' 
-                THEN inv.expenditure_value ELSE 0 END) AS total_biodiversity,
-            SUM(CASE WHEN inv.expenditure_type = 'R&D Environmental Protection (general government expenditure)' 
-                THEN inv.expenditure_value ELSE 0 END) AS total_rd
-        FROM Investments AS inv
-        WHERE inv.year = %s
-    """
-    
-    pie_params = [year]
-    
-    if country_id is not None:
-        pie_query += " AND inv.country_id = %s"
-        pie_params.append(country_id)
-    
-    pie_data_row = fetch_query(pie_query, tuple(pie_params))
-    
-    if pie_data_row and pie_data_row[0]:
-        pie_row = pie_data_row[0]
-        
-        pie_chart_data = {
-            'agriculture_forestry_fishing': pie_row['total_agriculture'] or 0,
-            'environmental_protection': pie_row['total_environmental'] or 0,
-            'biodiversity_landscape': pie_row['total_biodiversity'] or 0,
-            'rd_environmental_protection': pie_row['total_rd'] or 0
-        }
-    else:
-        pie_chart_data = {
-            'agriculture_forestry_fishing': 0,
-            'environmental_protection': 0,
-            'biodiversity_landscape': 0,
-            'rd_environmental_protection': 0
-        }
-
-    # Total expenditure sum
-    total_expenditure_sum = sum(row["total_expenditure"] or 0 for row in records)
+    pie_chart_data = investments_pie(results['pie'])
+
+    # Total expenditure sum (Million USD; satırlar farklı birimlerde olabilir)
+    total_expenditure_sum = investments_total(results['pie'])
 
     return render_template(
         "investments.html",
         records=records,
         year=year,
-        years=years,
         total_countries=total_countries,
         total_rows=total_rows,
-        countries=countries,
         selected_country_id=country_id,
         pie_chart_data=pie_chart_data,
         total_expenditure_sum=total_expenditure_sum,
@@ -320,9 +229,9 @@ def add_investment():
     # INSERT
     params = []
     for et, v in values.items():
-        params.extend([et, unit, v, year, country_id])
+        params.extend([et, unit, v, canonical("investments", unit, v), year, country_id])
 
-    values_sql = ", ".join(["(%s, %s, %s, %s, %s)"] * len(values))
+    values_sql = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(values))
 
     execute_query(
         f"""
@@ -330,6 +239,7 @@ def add_investment():
             expenditure_type,
             unit,
             expenditure_value,
+            expenditure_musd,
             year,
             country_id
         )
@@ -554,12 +464,13 @@ def update_investment():
                 """
                 UPDATE Investments
                 SET expenditure_value = %s,
-                    unit = %s
+                    unit = %s,
+                    expenditure_musd = %s
                 WHERE country_id = %s
                   AND year = %s
                   AND expenditure_type = %s;
                 """,
-                (v, unit, country_id, year, et),
+                (v, unit, canonical("investments", unit, v), country_id, year, et),
             )
         else:
             # INSERT
@@ -569,12 +480,13 @@ def update_investment():
                     expenditure_type,
                     unit,
                     expenditure_value,
+                    expenditure_musd,
                     year,
                     country_id
                 )
-                VALUES (%s, %s, %s, %s, %s);
+                VALUES (%s, %s, %s, %s, %s, %s);
                 """,
-                (et, unit, v, year, country_id),
+                (et, unit, v, canonical("investments", unit, v), year, country_id),
             )
 
     flash("Records updated successfully.", "success")
@@ -609,19 +521,12 @@ def country_timeline():
     if order not in ["asc", "desc"]:
         order = "desc"
 
-    # Ülke dropdown'u için Countries tablosu
-    countries_query = """
-        SELECT country_id, country_name
-        FROM Countries
-        ORDER BY country_name ASC;
-    """
-    countries = fetch_query(countries_query, ())
+    # Ülke dropdown'u şablonda option_list ile gelir (fragments.py)
 
     # Eğer ülke seçilmemişse sadece form göster
     if not country_id:
         return render_template(
             "investments_timeline.html",
-            countries=countries,
             selected_country_id=None,
             country_name=None,
             records=[],
@@ -630,10 +535,7 @@ def country_timeline():
         )
 
     # Seçilen ülkenin adını al
-    country_row = fetch_query(
-        "SELECT country_name FROM Countries WHERE country_id = %s;",
-        (country_id,)
-    )
+    country_row = fetch_query(COUNTRY_NAME, (country_id,))
     
     if not country_row:
         flash("Selected country not found.", "error")
@@ -641,88 +543,45 @@ def country_timeline():
     
     country_name = country_row[0]["country_name"]
 
-    # Seçilen ülkenin TÜM yıllar için investments verilerini çek
-    base_query = """
-        SELECT
-            t.year,
-            t.unit,
-            t.total_expenditure,
-            t.agriculture_forestry_fishing,
-            t.environmental_protection,
-            t.biodiversity_landscape,
-            t.rd_environmental_protection
-        FROM (
-            SELECT
-                inv.year,
-                inv.unit,
-                MAX(CASE WHEN inv.expenditure_type = 'Total Expenditure (general government)' 
-                    THEN inv.expenditure_value END) AS total_expenditure,
-                MAX(CASE WHEN inv.expenditure_type = 'Agriculture, forestry, fishing (general government expenditure)' 
-                    THEN inv.expenditure_value END) AS agriculture_forestry_fishing,
-                MAX(CASE WHEN inv.expenditure_type = 'Environmental protection (general government expenditure)' 
-                    THEN inv.expenditure_value END) AS environmental_protection,
-                MAX(CASE WHEN inv.expenditure_type = 'Protection of Biodiversity and Landscape (general government expenditure)' 
-                    THEN inv.expenditure_value END) AS biodiversity_landscape,
-                MAX(CASE WHEN inv.expenditure_type = 'R&D Environmental Protection (general government expenditure)' 
-                    THEN inv.expenditure_value END) AS rd_environmental_protection
-            FROM Investments AS inv
-            WHERE inv.country_id = %s
-            GROUP BY inv.year, inv.unit
-        ) AS t
-    """
-    
-    # Dinamik ORDER BY ekleme
-    base_query += f" ORDER BY t.{sort_by} {order.upper()} NULLS LAST;"
-
-    records = fetch_query(base_query, (country_id,)) or []
+    # Seçilen ülkenin TÜM yılları, sayfa gönderilirken okunur (streaming.py);
+    # yüzde hesaplamaları her satıra okunurken eklenir
+    records = stream_query(*investments_timeline_query(country_id, sort_by, order), transform=add_investment_share)
 
-    # Yüzde hesaplamalarını ekle
-    for row in records:
-        total = row["total_expenditure"] or 0
-        if total > 0:
-            row["agriculture_pct"] = (row["agriculture_forestry_fishing"] or 0) / total * 100
-            row["environmental_pct"] = (row["environmental_protection"] or 0) / total * 100
-            row["biodiversity_pct"] = (row["biodiversity_landscape"] or 0) / total * 100
-            row["rd_pct"] = (row["rd_environmental_protection"] or 0) / total * 100
-        else:
-            row["agriculture_pct"] = None
-            row["environmental_pct"] = None
-            row["biodiversity_pct"] = None
-            row["rd_pct"] = None
-
-    # İstatistikler
-    total_years = len(records)
-    
-    # Grafik için veri hazırla (sadece 2001 ve sonrası)
-    chart_data = {
-        'years': [],
-        'total_expenditure': [],
-        'agriculture_forestry_fishing': [],
-        'environmental_protection': [],
-        'biodiversity_landscape': [],
-        'rd_environmental_protection': [],
-    }
-    
-    # Grafik için kayıtları yıla göre sırala ve 2001+ filtrele
-    sorted_records = sorted(records, key=lambda x: x['year'])
-    filtered_records = [r for r in sorted_records if r['year'] >= 2001]
+    # İstatistikler (satırları beklemeden, SQL ile)
+    span = fetch_query(*investments_timeline_span_query(country_id))
+    span = span[0] if span else {}
     
-    for row in filtered_records:
-        chart_data['years'].append(row['year'])
-        chart_data['total_expenditure'].append(row['total_expenditure'] or 0)
-        chart_data['agriculture_forestry_fishing'].append(row['agriculture_forestry_fishing'] or 0)
-        chart_data['environmental_protection'].append(row['environmental_protection'] or 0)
-        chart_data['biodiversity_landscape'].append(row['biodiversity_landscape'] or 0)
-        chart_data['rd_environmental_protection'].append(row['rd_environmental_protection'] or 0)
+    # Grafik verisi sayfa açıldıktan sonra ayrıca çekilir (country_timeline_chart)
 
-    return render_template(
+    return stream_page(
         "investments_timeline.html",
-        countries=countries,
         selected_country_id=country_id,
         country_name=country_name,
         records=records,
-        total_years=total_years,
+        total_years=span.get('total_years', 0),
+        min_year=span.get('min_year'),
+        max_year=span.get('max_year'),
         sort_by=sort_by,
         order=order,
-        chart_data=chart_data,
-    )
\ No newline at end of file
+    )
+
+
+@investments_bp.route('/investments/country-timeline/chart')
+@login_required
+@conditional_get(*INVESTMENT_TABLES)
+def country_timeline_chart():
+    """
+    Timeline grafiklerinin verisi (JSON), sayfa yüklendikten sonra JS tarafından çekilir.
+    """
+    country_id = request.args.get("country_id", type=int)
+    if not country_id:
+        return jsonify({"error": "country_id is required."}), 400
+
+    def compute():
+        records = fetch_query(*investments_timeline_query(country_id, "year", "asc"))
+        return None if records is None else investments_timeline_chart(records)
+
+    chart_data = cached_result("investments_timeline_chart", {"country_id": country_id}, INVESTMENT_TABLES, compute)
+    if chart_data is None:
+        return jsonify({"error": "Chart data is not available."}), 500
+    return jsonify(chart_data)
\ No newline at end of file
@@ -1,10 +1,30 @@
 from flask import Blueprint
-from flask import Flask, render_template,request,redirect,url_for,flash
-from database import execute_query, fetch_query
+from flask import Flask, render_template,request,redirect,url_for,flash,jsonify
+from database import execute_query, fetch_query, fetch_queries, stream_query
+from queries import (
+    COUNTRY_NAME,
+    LAND_USE_TABLES,
+    land_use_agri_share,
+    land_use_count_query,
+    land_use_pie,
+    land_use_queries,
+    land_use_timeline_chart,
+    land_use_timeline_query,
+    land_use_timeline_span_query,
+)
 from routes.auth_routes import login_required, admin_required
+from cache import cached_result
+from conditional import conditional_get
+from streaming import stream_page
+from keepalive import warmup_task
+from analytics.land_efficiency import land_efficiency_store, YearResult, SORT_COLUMNS
+from units import canonical
 
 landuse_bp = Blueprint("landuse", __name__)
 
+# Verimlilik analizinin varsayılan yılı
+EFFICIENCY_DEFAULT_YEAR = 2023
+
 @landuse_bp.route('/landuse')
 @login_required
 def landUsePage():
@@ -32,166 +52,35 @@ def landUsePage():
     if order not in ["asc", "desc"]:
         order = "asc"
 
-    # Yıl dropdown'u
-    years = list(range(1961, 2026))
-
-    # Ülke dropdown'u: Countries tablosundan
-    countries_query = """
-        SELECT country_id, country_name
-        FROM Countries
-        ORDER BY country_name ASC;
-    """
-    countries = fetch_query(countries_query, ())
+    # Yıl ve ülke dropdown'ları şablonda option_list ile gelir (fragments.py)
 
-    # --- ANA TABLO SORGUSU ---
-    base_query = """
-        SELECT
-            t.country_name,
-            t.country_id,
-            t.year,
-            t.unit,
-            t.country_area,
-            t.land_area,
-            t.inland_waters,
-            t.arable_land,
-            t.permanent_crops,
-            t.permanent_meadows_and_pastures,
-            t.forest_land,
-            (
-                t.land_area
-                - COALESCE(t.arable_land, 0)
-                - COALESCE(t.permanent_crops, 0)
-                - COALESCE(t.permanent_meadows_and_pastures, 0)
-                - COALESCE(t.forest_land, 0)
-            ) AS other_land
-        FROM (
-            SELECT
-                c.country_name,
-                lu.country_id,
-                lu.year,
-                lu.unit,
-                MAX(CASE WHEN lu.land_type = 'Country area' THEN lu.land_usage_value END) AS country_area,
-                MAX(CASE WHEN lu.land_type = 'Land area' THEN lu.land_usage_value END) AS land_area,
-                MAX(CASE WHEN lu.land_type = 'Inland waters' THEN lu.land_usage_value END) AS inland_waters,
-                MAX(CASE WHEN lu.land_type = 'Arable land' THEN lu.land_usage_value END) AS arable_land,
-                MAX(CASE WHEN lu.land_type = 'Permanent crops' THEN lu.land_usage_value END) AS permanent_crops,
-                MAX(CASE WHEN lu.land_type = 'Permanent meadows and pastures' THEN lu.land_usage_value END)
-                    AS permanent_meadows_and_pastures,
-                MAX(CASE WHEN lu.land_type = 'Forest land' THEN lu.land_usage_value END) AS forest_land
-            FROM Land_Use AS lu
-            INNER JOIN Countries AS c ON lu.country_id = c.country_id
-            WHERE lu.year = %s
-    """
-    params = [year]
+    # --- ANA TABLO SORGUSU + PIE CHART TOPLAMLARI (queries.py) ---
+    queries = land_use_queries(year, country_id, sort_by, order)
+    results = fetch_queries({
+        'pie': queries['pie'],
+        'counts': land_use_count_query(year, country_id),
+    })
 
-    # Ülke filtresi SEÇİLİRSE eklenir
-    if country_id is not None:
-        base_query += " AND lu.country_id = %s"
-        params.append(country_id)
+    # Tablo satırları sayfa gönderilirken okunur (streaming.py)
+    records = stream_query(*queries['records'])
 
-    base_query += """
-            GROUP BY c.country_name, lu.country_id, lu.year, lu.unit
-        ) AS t
-    """
-    
-    # Dinamik ORDER BY ekleme
-    # "other_land" hesaplanmış bir alan olduğu için özel işlem
-    if sort_by == "other_land":
-        # Hesaplanmış alanı doğrudan ORDER BY'da kullan
-        base_query += f"""
-        ORDER BY (
-            t.land_area
-            - COALESCE(t.arable_land, 0)
-            - COALESCE(t.permanent_crops, 0)
-            - COALESCE(t.permanent_meadows_and_pastures, 0)
-            - COALESCE(t.forest_land, 0)
-        ) {order.upper()} NULLS LAST;
-        """
-    else:
-        # Diğer sütunlar için normal sıralama
-        base_query += f" ORDER BY t.{sort_by} {order.upper()} NULLS LAST;"
+    # İstatistikler (satırları beklemeden, SQL ile)
+    counts = results['counts'][0] if results['counts'] else {}
+    total_rows = counts.get('total_rows', 0)
+    total_countries = counts.get('total_countries', 0)
 
-    records = fetch_query(base_query, tuple(params)) or []
+    # Tarımsal arazi oranı pie chart toplamlarından (1000 ha)
+    agri_share = land_use_agri_share(results['pie'])
 
-    # İstatistikler
-    total_rows = len(records)
-    total_countries = len({row["country_id"] for row in records}) if records else 0
-
-    # Tarımsal arazi oranı:
-    # (arable + permanent crops + permanent meadows & pastures) / land_area
-    total_agri_land = 0.0
-    total_land_area = 0.0
-
-    for row in records:
-        land_area = row["land_area"] or 0
-        agri = (row["arable_land"] or 0) \
-             + (row["permanent_crops"] or 0) \
-             + (row["permanent_meadows_and_pastures"] or 0)
-
-        total_land_area += land_area
-        total_agri_land += agri
-
-    agri_share = (total_agri_land / total_land_area * 100) if total_land_area > 0 else None
-
-    pie_query = """
-        SELECT
-            SUM(CASE WHEN lu.land_type = 'Arable land' THEN lu.land_usage_value ELSE 0 END) AS total_arable,
-            SUM(CASE WHEN lu.land_type = 'Permanent crops' THEN lu.land_usage_value ELSE 0 END) AS total_permanent_crops,
-            SUM(CASE WHEN lu.land_type = 'Permanent meadows and pastures' THEN lu.land_usage_value ELSE 0 END) AS total_meadows,
-            SUM(CASE WHEN lu.land_type = 'Forest land' THEN lu.land_usage_value ELSE 0 END) AS total_forest,
-            SUM(CASE WHEN lu.land_type = 'Inland waters' THEN lu.land_usage_value ELSE 0 END) AS total_inland_waters,
-            SUM(CASE WHEN lu.land_type = 'Land area' THEN lu.land_usage_value ELSE 0 END) AS total_land_area
-        FROM Land_Use AS lu
-        WHERE lu.year = %s
-    """
-    
-    pie_params = [year]
-    
-    if country_id is not None:
-        pie_query += " AND lu.country_id = %s"
-        pie_params.append(country_id)
-    
-    pie_data_row = fetch_query(pie_query, tuple(pie_params))
-    
-    if pie_data_row and pie_data_row[0]:
-        pie_row = pie_data_row[0]
-        total_land = pie_row['total_land_area'] or 0
-        
-        # Other land hesaplama
-        other_land = total_land - (
-            (pie_row['total_arable'] or 0) +
-            (pie_row['total_permanent_crops'] or 0) +
-            (pie_row['total_meadows'] or 0) +
-            (pie_row['total_forest'] or 0)
-        )
-        
-        pie_chart_data = {
-            'arable_land': pie_row['total_arable'] or 0,
-            'permanent_crops': pie_row['total_permanent_crops'] or 0,
-            'meadows_pastures': pie_row['total_meadows'] or 0,
-            'forest_land': pie_row['total_forest'] or 0,
-            'other_land': other_land,
-            'inland_waters': pie_row['total_inland_waters'] or 0
-        }
-    else:
-        pie_chart_data = {
-            'arable_land': 0,
-            'permanent_crops': 0,
-            'meadows_pastures': 0,
-            'forest_land': 0,
-            'other_land': 0,
-            'inland_waters': 0
-        }
+    pie_chart_data = land_use_pie(results['pie'])
 
-    return render_template(
+    return stream_page(
         "land_use.html",
         records=records,
         year=year,
-        years=years,
         total_countries=total_countries,
         total_rows=total_rows,
         agri_share=agri_share,
-        countries=countries,
         selected_country_id=country_id,
         pie_chart_data=pie_chart_data,
         sort_by=sort_by,
@@ -344,9 +233,9 @@ def add_land_use():
     # INSERT
     params = []
     for lt, v in values.items():
-        params.extend([lt, unit, v, year, country_id])
+        params.extend([lt, unit, v, canonical("land_use", unit, v), year, country_id])
 
-    values_sql = ", ".join(["(%s, %s, %s, %s, %s)"] * len(values))
+    values_sql = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(values))
 
     execute_query(
         f"""
@@ -354,6 +243,7 @@ def add_land_use():
             land_type,
             unit,
             land_usage_value,
+            land_usage_1000ha,
             year,
             country_id
         )
@@ -361,6 +251,7 @@ def add_land_use():
         """,
         tuple(params),
     )
+    land_efficiency_store.invalidate_year(year)
 
     flash("Land use records added successfully.", "success")
 
@@ -387,6 +278,7 @@ def delete_land_use():
         """,
         (country_id, year),
     )
+    land_efficiency_store.invalidate_year(year)
 
     flash("Deleted Successfully.", "success")
 
@@ -596,12 +488,13 @@ def update_land_use():
                 """
                 UPDATE Land_Use
                 SET land_usage_value = %s,
-                    unit = %s
+                    unit = %s,
+                    land_usage_1000ha = %s
                 WHERE country_id = %s
                   AND year = %s
                   AND land_type = %s;
                 """,
-                (v, unit, country_id, year, lt),
+                (v, unit, canonical("land_use", unit, v), country_id, year, lt),
             )
         else:
             # INSERT
@@ -611,13 +504,15 @@ def update_land_use():
                     land_type,
                     unit,
                     land_usage_value,
+                    land_usage_1000ha,
                     year,
                     country_id
                 )
-                VALUES (%s, %s, %s, %s, %s);
+                VALUES (%s, %s, %s, %s, %s, %s);
                 """,
-                (lt, unit, v, year, country_id),
+                (lt, unit, v, canonical("land_use", unit, v), year, country_id),
             )
+    land_efficiency_store.invalidate_year(year)
 
     flash("Records updated successfully.", "success")
 
@@ -652,19 +547,12 @@ def country_timeline():
     if order not in ["asc", "desc"]:
         order = "desc"
 
-    # Ülke dropdown'u için Countries tablosu
-    countries_query = """
-        SELECT country_id, country_name
-        FROM Countries
-        ORDER BY country_name ASC;
-    """
-    countries = fetch_query(countries_query, ())
+    # Ülke dropdown'u şablonda option_list ile gelir (fragments.py)
 
     # Eğer ülke seçilmemişse sadece form göster
     if not country_id:
         return render_template(
             "land_use_timeline.html",
-            countries=countries,
             selected_country_id=None,
             country_name=None,
             records=[],
@@ -673,10 +561,7 @@ def country_timeline():
         )
 
     # Seçilen ülkenin adını al
-    country_row = fetch_query(
-        "SELECT country_name FROM Countries WHERE country_id = %s;",
-        (country_id,)
-    )
+    country_row = fetch_query(COUNTRY_NAME, (country_id,))
     
     if not country_row:
         flash("Selected country not found.", "error")
@@ -684,96 +569,55 @@ def country_timeline():
     
     country_name = country_row[0]["country_name"]
 
-    # Seçilen ülkenin TÜM yıllar için land use verilerini çek
-    base_query = """
-        SELECT
-            t.year,
-            t.unit,
-            t.country_area,
-            t.land_area,
-            t.inland_waters,
-            t.arable_land,
-            t.permanent_crops,
-            t.permanent_meadows_and_pastures,
-            t.forest_land,
-            (
-                t.land_area
-                - COALESCE(t.arable_land, 0)
-                - COALESCE(t.permanent_crops, 0)
-                - COALESCE(t.permanent_meadows_and_pastures, 0)
-                - COALESCE(t.forest_land, 0)
-            ) AS other_land
-        FROM (
-            SELECT
-                lu.year,
-                lu.unit,
-                MAX(CASE WHEN lu.land_type = 'Country area' THEN lu.land_usage_value END) AS country_area,
-                MAX(CASE WHEN lu.land_type = 'Land area' THEN lu.land_usage_value END) AS land_area,
-                MAX(CASE WHEN lu.land_type = 'Inland waters' THEN lu.land_usage_value END) AS inland_waters,
-                MAX(CASE WHEN lu.land_type = 'Arable land' THEN lu.land_usage_value END) AS arable_land,
-                MAX(CASE WHEN lu.land_type = 'Permanent crops' THEN lu.land_usage_value END) AS permanent_crops,
-                MAX(CASE WHEN lu.land_type = 'Permanent meadows and pastures' THEN lu.land_usage_value END)
-                    AS permanent_meadows_and_pastures,
-                MAX(CASE WHEN lu.land_type = 'Forest land' THEN lu.land_usage_value END) AS forest_land
-            FROM Land_Use AS lu
-            WHERE lu.country_id = %s
-            GROUP BY lu.year, lu.unit
-        ) AS t
-    """
-    
-    # Dinamik ORDER BY ekleme
-    if sort_by == "other_land":
-        base_query += f"""
-        ORDER BY (
-            t.land_area
-            - COALESCE(t.arable_land, 0)
-            - COALESCE(t.permanent_crops, 0)
-            - COALESCE(t.permanent_meadows_and_pastures, 0)
-            - COALESCE(t.forest_land, 0)
-        ) {order.upper()} NULLS LAST;
-        """
-    else:
-        base_query += f" ORDER BY t.{sort_by} {order.upper()} NULLS LAST;"
-
-    records = fetch_query(base_query, (country_id,)) or []
+    # Seçilen ülkenin TÜM yılları, sayfa gönderilirken okunur (streaming.py)
+    records = stream_query(*land_use_timeline_query(country_id, sort_by, order))
 
-    # İstatistikler
-    total_years = len(records)
-    
-    # Grafik için veri hazırla (sadece 1990 ve sonrası)
-    chart_data = {
-        'years': [],
-        'arable_land': [],
-        'permanent_crops': [],
-        'meadows_pastures': [],
-        'forest_land': [],
-        'other_land': [],
-    }
-    
-    # Grafik için kayıtları yıla göre sırala ve 1990+ filtrele
-    sorted_records = sorted(records, key=lambda x: x['year'])
-    filtered_records = [r for r in sorted_records if r['year'] >= 1990]
+    # İstatistikler (satırları beklemeden, SQL ile)
+    span = fetch_query(*land_use_timeline_span_query(country_id))
+    span = span[0] if span else {}
     
-    for row in filtered_records:
-        chart_data['years'].append(row['year'])
-        chart_data['arable_land'].append(row['arable_land'] or 0)
-        chart_data['permanent_crops'].append(row['permanent_crops'] or 0)
-        chart_data['meadows_pastures'].append(row['permanent_meadows_and_pastures'] or 0)
-        chart_data['forest_land'].append(row['forest_land'] or 0)
-        chart_data['other_land'].append(row['other_land'] if row['other_land'] is not None else 0)
+    # Grafik verisi sayfa açıldıktan sonra ayrıca çekilir (country_timeline_chart)
 
-    return render_template(
+    return stream_page(
         "land_use_timeline.html",
-        countries=countries,
         selected_country_id=country_id,
         country_name=country_name,
         records=records,
-        total_years=total_years,
+        total_years=span.get('total_years', 0),
+        min_year=span.get('min_year'),
+        max_year=span.get('max_year'),
         sort_by=sort_by,
         order=order,
-        chart_data=chart_data,
     )
 
+
+@landuse_bp.route('/landuse/country-timeline/chart')
+@login_required
+@conditional_get(*LAND_USE_TABLES)
+def country_timeline_chart():
+    """
+    Timeline grafiğinin verisi (JSON), sayfa yüklendikten sonra JS tarafından çekilir.
+    """
+    country_id = request.args.get("country_id", type=int)
+    if not country_id:
+        return jsonify({"error": "country_id is required."}), 400
+
+    def compute():
+        records = fetch_query(*land_use_timeline_query(country_id, "year", "asc"))
+        return None if records is None else land_use_timeline_chart(records)
+
+    chart_data = cached_result("land_use_timeline_chart", {"country_id": country_id}, LAND_USE_TABLES, compute)
+    if chart_data is None:
+        return jsonify({"error": "Chart data is not available."}), 500
+    return jsonify(chart_data)
+
+
+@warmup_task("land_efficiency")
+def _warm_land_efficiency():
+    # Varsayılan yıl ilk ziyaretten önce hesaplanır
+    land_efficiency_store.get(EFFICIENCY_DEFAULT_YEAR)
+
+
 @landuse_bp.route('/landuse/land-efficiency-analysis')
 @login_required
 def land_efficiency_analysis():
@@ -781,321 +625,34 @@ def land_efficiency_analysis():
     Land Use Efficiency Analysis: Sadece Land Use, Production, Commodities, Countries
     Investments verisi olmadan güvenilir land use analizi
     """
-    year = request.args.get("year", 2023, type=int)
+    year = request.args.get("year", EFFICIENCY_DEFAULT_YEAR, type=int)
     
     # Sıralama parametreleri
     sort_by = request.args.get("sort", "country_name")
     order = request.args.get("order", "asc")
     
-    valid_sort_columns = [
-        "country_name", "region", "agricultural_land_total", "forest_land",
-        "land_productivity_index", "production_density", "crop_diversity_score"
-    ]
-    
-    if sort_by not in valid_sort_columns:
+    if sort_by not in SORT_COLUMNS:
         sort_by = "country_name"
     
     if order not in ["asc", "desc"]:
         order = "asc"
     
     # LAND USE FOCUSED QUERY: 4 tables (NO Investments)
-    land_efficiency_query = f"""
-        WITH LandTypeBreakdown AS (
-            -- Nested Query 1: Her ülkenin detaylı land type dağılımı
-            SELECT
-                lu.country_id,
-                lu.year,
-                MAX(CASE WHEN lu.land_type = 'Country area' THEN lu.land_usage_value END) AS country_area,
-                MAX(CASE WHEN lu.land_type = 'Land area' THEN lu.land_usage_value END) AS land_area,
-                MAX(CASE WHEN lu.land_type = 'Inland waters' THEN lu.land_usage_value END) AS inland_waters,
-                MAX(CASE WHEN lu.land_type = 'Arable land' THEN lu.land_usage_value END) AS arable_land,
-                MAX(CASE WHEN lu.land_type = 'Permanent crops' THEN lu.land_usage_value END) AS permanent_crops,
-                MAX(CASE WHEN lu.land_type = 'Permanent meadows and pastures' THEN lu.land_usage_value END) AS meadows_pastures,
-                MAX(CASE WHEN lu.land_type = 'Forest land' THEN lu.land_usage_value END) AS forest_land,
-                -- Agricultural land toplamı
-                COALESCE(MAX(CASE WHEN lu.land_type = 'Arable land' THEN lu.land_usage_value END), 0) +
-                COALESCE(MAX(CASE WHEN lu.land_type = 'Permanent crops' THEN lu.land_usage_value END), 0) +
-                COALESCE(MAX(CASE WHEN lu.land_type = 'Permanent meadows and pastures' THEN lu.land_usage_value END), 0) 
-                    AS agricultural_land_total,
-                -- Other land hesaplama
-                COALESCE(MAX(CASE WHEN lu.land_type = 'Land area' THEN lu.land_usage_value END), 0) -
-                COALESCE(MAX(CASE WHEN lu.land_type = 'Arable land' THEN lu.land_usage_value END), 0) -
-                COALESCE(MAX(CASE WHEN lu.land_type = 'Permanent crops' THEN lu.land_usage_value END), 0) -
-                COALESCE(MAX(CASE WHEN lu.land_type = 'Permanent meadows and pastures' THEN lu.land_usage_value END), 0) -
-                COALESCE(MAX(CASE WHEN lu.land_type = 'Forest land' THEN lu.land_usage_value END), 0)
-                    AS other_land
-            FROM Land_Use lu
-            WHERE lu.year = %s
-            GROUP BY lu.country_id, lu.year
-        ),
-        AgriculturalProduction AS (
-            -- Nested Query 2: Tarımsal üretim detayları
-            SELECT
-                p.country_code AS country_id,
-                p.year,
-                SUM(p.quantity) AS total_agricultural_production,
-                COUNT(DISTINCT p.commodity_code) AS crop_diversity,
-                AVG(p.quantity) AS avg_crop_yield,
-                MAX(p.quantity) AS max_single_crop_production,
-                MIN(p.quantity) AS min_crop_production
-            FROM Production p
-            WHERE p.year = %s
-                AND p.quantity IS NOT NULL
-                AND p.quantity > 0
-            GROUP BY p.country_code, p.year
-        ),
-        TopCommodityPerCountry AS (
-            -- Nested Query 3: Her ülkenin en çok ürettiği ürün
-            SELECT DISTINCT ON (p.country_code)
-                p.country_code AS country_id,
-                p.year,
-                c.item_name AS top_commodity,
-                p.quantity AS top_commodity_quantity,
-                c.cpc_code
-            FROM Production p
-            INNER JOIN Commodities c ON p.commodity_code = c.fao_code
-            WHERE p.year = %s
-                AND p.quantity IS NOT NULL
-                AND p.quantity > 0
-            ORDER BY p.country_code, p.quantity DESC
-        ),
-        RegionalLandStats AS (
-            -- Nested Query 4: Bölgesel land use ortalamaları
-            SELECT
-                c.region,
-                AVG(lt.agricultural_land_total) AS region_avg_agri_land,
-                AVG(lt.forest_land) AS region_avg_forest,
-                AVG(lt.land_area) AS region_avg_land_area,
-                COUNT(DISTINCT lt.country_id) AS countries_in_region
-            FROM Countries c
-            LEFT JOIN LandTypeBreakdown lt ON c.country_id = lt.country_id
-            WHERE c.region IS NOT NULL
-                AND lt.agricultural_land_total >= 10  -- Bölgesel ortalama için de filtre
-            GROUP BY c.region
-        )
-        -- MAIN QUERY: 4 main tables joined
-        SELECT
-            c.country_id,
-            c.country_name,
-            c.region,
-            c.population,
-            
-            -- LAND USE DATA (CORE)
-            COALESCE(lt.country_area, 0) AS country_area,
-            COALESCE(lt.land_area, 0) AS land_area,
-            COALESCE(lt.inland_waters, 0) AS inland_waters,
-            COALESCE(lt.arable_land, 0) AS arable_land,
-            COALESCE(lt.permanent_crops, 0) AS permanent_crops,
-            COALESCE(lt.meadows_pastures, 0) AS meadows_pastures,
-            COALESCE(lt.forest_land, 0) AS forest_land,
-            COALESCE(lt.other_land, 0) AS other_land,
-            COALESCE(lt.agricultural_land_total, 0) AS agricultural_land_total,
-            
-            -- PRODUCTION DATA
-            COALESCE(ap.total_agricultural_production, 0) AS total_agricultural_production,
-            COALESCE(ap.crop_diversity, 0) AS crop_diversity,
-            COALESCE(ap.avg_crop_yield, 0) AS avg_crop_yield,
-            COALESCE(ap.max_single_crop_production, 0) AS max_single_crop_production,
-            
-            -- TOP COMMODITY
-            COALESCE(tcp.top_commodity, 'N/A') AS top_commodity,
-            COALESCE(tcp.top_commodity_quantity, 0) AS top_commodity_quantity,
-            
-            -- REGIONAL COMPARISON
-            COALESCE(rls.region_avg_agri_land, 0) AS region_avg_agri_land,
-            COALESCE(rls.region_avg_forest, 0) AS region_avg_forest,
-            COALESCE(rls.countries_in_region, 0) AS countries_in_region,
-            
-            -- LAND USE PERCENTAGES
-            CASE 
-                WHEN lt.land_area > 0 
-                THEN (lt.agricultural_land_total / lt.land_area * 100)
-                ELSE 0
-            END AS agricultural_land_percentage,
-            
-            CASE 
-                WHEN lt.land_area > 0 
-                THEN (lt.forest_land / lt.land_area * 100)
-                ELSE 0
-            END AS forest_land_percentage,
-            
-            CASE 
-                WHEN lt.land_area > 0 
-                THEN (lt.arable_land / lt.land_area * 100)
-                ELSE 0
-            END AS arable_land_percentage,
-            
-            CASE 
-                WHEN lt.agricultural_land_total > 0 
-                THEN (lt.arable_land / lt.agricultural_land_total * 100)
-                ELSE 0
-            END AS arable_of_agricultural,
-            
-            CASE 
-                WHEN lt.agricultural_land_total > 0 
-                THEN (lt.permanent_crops / lt.agricultural_land_total * 100)
-                ELSE 0
-            END AS crops_of_agricultural,
-            
-            -- PRODUCTION EFFICIENCY METRICS
-            CASE 
-                WHEN lt.agricultural_land_total > 0 AND ap.total_agricultural_production > 0
-                THEN (ap.total_agricultural_production / lt.agricultural_land_total)
-                ELSE 0
-            END AS production_density,
-            
-            CASE 
-                WHEN lt.arable_land > 0 AND ap.total_agricultural_production > 0
-                THEN (ap.total_agricultural_production / lt.arable_land)
-                ELSE 0
-            END AS production_per_arable_land,
-            
-            -- CROP DIVERSITY SCORE (diversity * production density)
-            CASE 
-                WHEN lt.agricultural_land_total > 0 AND ap.crop_diversity > 0
-                THEN (ap.crop_diversity * LN((ap.total_agricultural_production / lt.agricultural_land_total) + 1))
-                ELSE 0
-            END AS crop_diversity_score,
-            
-            -- LAND PRODUCTIVITY INDEX (without investment data)
-            CASE 
-                WHEN lt.agricultural_land_total > 0 AND ap.total_agricultural_production > 0
-                THEN (
-                    (ap.total_agricultural_production / lt.agricultural_land_total) * 0.75 +
-                    (ap.crop_diversity * 100) * 0.25
-                )
-                ELSE 0
-            END AS land_productivity_index,
-            
-            -- PER CAPITA METRICS
-            CASE
-                WHEN c.population > 0
-                THEN (lt.agricultural_land_total * 1000 / c.population)
-                ELSE 0
-            END AS agricultural_land_per_capita,
-            
-            CASE
-                WHEN c.population > 0
-                THEN (lt.arable_land * 1000 / c.population)
-                ELSE 0
-            END AS arable_land_per_capita,
-            
-            CASE
-                WHEN c.population > 0
-                THEN (lt.forest_land * 1000 / c.population)
-                ELSE 0
-            END AS forest_land_per_capita,
-            
-            CASE
-                WHEN c.population > 0 AND ap.total_agricultural_production > 0
-                THEN (ap.total_agricultural_production / c.population)
-                ELSE 0
-            END AS production_per_capita,
-            
-            -- REGIONAL PERFORMANCE (vs regional average)
-            CASE
-                WHEN rls.region_avg_agri_land > 0
-                THEN (lt.agricultural_land_total / rls.region_avg_agri_land * 100)
-                ELSE 0
-            END AS agri_land_vs_region_avg,
-            
-            CASE
-                WHEN rls.region_avg_forest > 0
-                THEN (lt.forest_land / rls.region_avg_forest * 100)
-                ELSE 0
-            END AS forest_vs_region_avg
-            
-        FROM Countries c
-        
-        -- LEFT OUTER JOIN 1: Land Type Breakdown (PRIMARY DATA)
-        LEFT OUTER JOIN LandTypeBreakdown lt 
-            ON c.country_id = lt.country_id
-        
-        -- LEFT OUTER JOIN 2: Agricultural Production
-        LEFT OUTER JOIN AgriculturalProduction ap 
-            ON c.country_id = ap.country_id
-        
-        -- LEFT OUTER JOIN 3: Top Commodity Details
-        LEFT OUTER JOIN TopCommodityPerCountry tcp 
-            ON c.country_id = tcp.country_id
-        
-        -- LEFT OUTER JOIN 4: Regional Statistics
-        LEFT OUTER JOIN RegionalLandStats rls 
-            ON c.region = rls.region
-        
-        WHERE c.country_id IS NOT NULL
-            AND COALESCE(lt.agricultural_land_total, 0) >= 200  -- critic part for agricultural land minimum 100
-        ORDER BY {sort_by} {order.upper()} NULLS LAST;
-    """
-    
-    records = fetch_query(land_efficiency_query, (year, year, year)) or []
-    
+    # Sonuçlar yıl bazında önceden hesaplanır; sıralama ve top-10 listeleri
+    # veritabanına gitmeden bellekteki dizilerden gelir
+    result = land_efficiency_store.get(year) or YearResult(year, [])
+    records = result.sorted_records(sort_by, order)
+
     # İstatistikler
     total_countries = len(records)
-    
-    # Global land use totals
-    global_stats = {
-        'total_land_area': sum((row["land_area"] or 0) for row in records),
-        'total_agricultural_land': sum((row["agricultural_land_total"] or 0) for row in records),
-        'total_arable_land': sum((row["arable_land"] or 0) for row in records),
-        'total_forest_land': sum((row["forest_land"] or 0) for row in records),
-        'total_production': sum((row["total_agricultural_production"] or 0) for row in records),
-        'avg_crop_diversity': sum((row["crop_diversity"] or 0) for row in records) / total_countries if total_countries > 0 else 0,
-    }
-    
-    # Sıfır bölme hatasını önle
-    if global_stats['total_land_area'] > 0:
-        global_stats['global_agricultural_percentage'] = (global_stats['total_agricultural_land'] / global_stats['total_land_area'] * 100)
-        global_stats['global_forest_percentage'] = (global_stats['total_forest_land'] / global_stats['total_land_area'] * 100)
-    else:
-        global_stats['global_agricultural_percentage'] = 0
-        global_stats['global_forest_percentage'] = 0
-    
-    # Top performers
-    top_by_productivity = sorted(
-        [r for r in records if (r.get("land_productivity_index") or 0) > 0],
-        key=lambda x: (x.get("land_productivity_index") or 0),
-        reverse=True
-    )[:10]
-    
-    top_by_production_density = sorted(
-        [r for r in records if (r.get("production_density") or 0) > 0],
-        key=lambda x: (x.get("production_density") or 0),
-        reverse=True
-    )[:10]
-    
-    top_by_crop_diversity = sorted(
-        [r for r in records if (r.get("crop_diversity") or 0) > 0],
-        key=lambda x: (x.get("crop_diversity") or 0),
-        reverse=True
-    )[:10]
-    
-    top_by_diversity_score = sorted(
-        [r for r in records if (r.get("crop_diversity_score") or 0) > 0],
-        key=lambda x: (x.get("crop_diversity_score") or 0),
-        reverse=True
-    )[:10]
-    
-    top_by_agricultural_percentage = sorted(
-        [r for r in records if (r.get("agricultural_land_percentage") or 0) > 0],
-        key=lambda x: (x.get("agricultural_land_percentage") or 0),
-        reverse=True
-    )[:10]
-    
-    years = list(range(1961, 2026))
-    
+
     return render_template(
         "landuse_efficiency.html",
         records=records,
         year=year,
-        years=years,
         total_countries=total_countries,
-        global_stats=global_stats,
-        top_by_productivity=top_by_productivity,
-        top_by_production_density=top_by_production_density,
-        top_by_crop_diversity=top_by_crop_diversity,
-        top_by_diversity_score=top_by_diversity_score,
-        top_by_agricultural_percentage=top_by_agricultural_percentage,
+        global_stats=result.global_stats,
+        **result.top_lists,
         sort_by=sort_by,
         order=order,
     )
\ No newline at end of file
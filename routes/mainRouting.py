@@ -1,29 +1,37 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, jsonify, abort, flash, redirect, url_for
 from database import fetch_query
-from routes.auth_routes import login_required
+from routes.auth_routes import login_required, admin_required
+from cache import cached_result, result_cache
+from conditional import conditional_get
+from keepalive import keepalive, warmup_task
+from profiler import CATEGORIES, flame_graph, load_profile, recent_profiles
+from validation import data_quality_status, start_data_quality_job
 
 main_bp = Blueprint("main", __name__)
 
 
-@main_bp.route("/")
-@login_required
-def dashboard():
-    
-    try:
-        # Fetch summary statistics for the dashboard
+# Tables counted on the dashboard (cache key, see cache.py)
+DASHBOARD_TABLES = (
+    "countries", "production", "trade_data_final", "producer_prices",
+    "consumer_prices", "land_use", "production_value",
+)
+
 
+def _dashboard_counts():
+    """Summary statistics of every table, None if one of the queries failed"""
+    results = {
         # Countries statistics
-        country_stats = fetch_query("""
+        'country_stats': fetch_query("""
             SELECT
                 COUNT(*) as total_countries,
                 SUM(population) as total_population,
                 SUM(land_area_sq_km) as total_land_area,
                 COUNT(DISTINCT region) as total_regions
             FROM Countries
-        """)
+        """),
 
         # Production statistics
-        production_stats = fetch_query("""
+        'production_stats': fetch_query("""
             SELECT
                 COUNT(*) as total_records,
                 COUNT(DISTINCT country_code) as countries_with_production,
@@ -31,51 +39,136 @@ def dashboard():
                 MIN(year) as min_year,
                 MAX(year) as max_year
             FROM Production
-        """)
+        """),
 
         # Trade statistics
-        trade_stats = fetch_query("""
+        'trade_stats': fetch_query("""
             SELECT COUNT(*) as total_trade_records
             FROM trade_data_final
-        """)
+        """),
 
         # Producer prices count
-        producer_price_stats = fetch_query("""
+        'producer_price_stats': fetch_query("""
             SELECT COUNT(*) as total_producer_prices
             FROM Producer_prices
-        """)
+        """),
 
         # Consumer prices count
-        consumer_price_stats = fetch_query("""
+        'consumer_price_stats': fetch_query("""
             SELECT COUNT(*) as total_consumer_prices
             FROM Consumer_prices
-        """)
+        """),
 
         # Land use count
-        land_use_stats = fetch_query("""
+        'land_use_stats': fetch_query("""
             SELECT COUNT(*) as total_land_use
             FROM Land_use
-        """)
+        """),
 
         # Production value count
-        production_value_stats = fetch_query("""
+        'production_value_stats': fetch_query("""
             SELECT COUNT(*) as total_production_values
             FROM Production_value
-        """)
+        """),
+    }
+    # Failed queries are not cached
+    if any(rows is None for rows in results.values()):
+        return None
+    return results
+
+
+@warmup_task("dashboard")
+def _cached_dashboard_counts():
+    """Dashboard statistics, cached until one of the tables is written"""
+    return cached_result("dashboard", None, DASHBOARD_TABLES, _dashboard_counts)
+
+
+@main_bp.route("/")
+@login_required
+@conditional_get(*DASHBOARD_TABLES)
+def dashboard():
+    
+    try:
+        # Fetch summary statistics for the dashboard (cached until one of the tables is written)
+        results = _cached_dashboard_counts() or {}
 
         # Combine all stats
         stats = {
-            'country_stats': country_stats[0] if country_stats else {},
-            'production_stats': production_stats[0] if production_stats else {},
-            'trade_stats': trade_stats[0] if trade_stats else {},
-            'producer_price_stats': producer_price_stats[0] if producer_price_stats else {},
-            'consumer_price_stats': consumer_price_stats[0] if consumer_price_stats else {},
-            'land_use_stats': land_use_stats[0] if land_use_stats else {},
-            'production_value_stats': production_value_stats[0] if production_value_stats else {},
+            name: rows[0] if rows else {}
+            for name, rows in ((name, results.get(name)) for name in (
+                'country_stats', 'production_stats', 'trade_stats', 'producer_price_stats',
+                'consumer_price_stats', 'land_use_stats', 'production_value_stats',
+            ))
         }
 
         return render_template("dashboard.html", stats=stats)
 
     except Exception as e:
         print(f"Dashboard Error: {e}")
-        return render_template("dashboard.html", stats=None, error=str(e))
\ No newline at end of file
+        return render_template("dashboard.html", stats=None, error=str(e))
+
+
+@main_bp.route("/admin/cache-stats")
+@admin_required
+def cache_stats():
+    """Hit / miss counters and size of the result cache"""
+    return jsonify(result_cache.stats())
+
+
+@main_bp.route("/admin/keepalive-stats")
+@admin_required
+def keepalive_stats():
+    """Heartbeat / cold start latencies and warm-up durations of this worker"""
+    return jsonify(keepalive.stats())
+
+
+@main_bp.route("/_profile/")
+@admin_required
+def profiles():
+    """Last profiled requests (?_profile=1 as admin, see profiler.py)"""
+    return render_template("profiles.html", profiles=recent_profiles(), categories=CATEGORIES)
+
+
+@main_bp.route("/_profile/<profile_id>")
+@admin_required
+def profile(profile_id):
+    """SQL / Python / template split and flame graph of one profiled request"""
+    result = load_profile(profile_id)
+    if result is None:
+        abort(404)
+    return render_template(
+        "profile.html",
+        profile=result,
+        categories=CATEGORIES,
+        root=flame_graph(result["stacks"]),
+    )
+
+
+# Edit form of a flagged country-year, per table
+DATA_QUALITY_EDIT_FORMS = {
+    "land_use": "landuse.edit_land_use_form",
+    "investments": "investments.edit_investment_form",
+}
+
+
+@main_bp.route("/admin/data-quality")
+@admin_required
+def data_quality():
+    """Last business rule check of the land use and investment tables"""
+    status = data_quality_status()
+    return render_template(
+        "data_quality.html",
+        running=status["running"],
+        report=status["report"],
+        edit_forms=DATA_QUALITY_EDIT_FORMS,
+    )
+
+
+@main_bp.route("/admin/data-quality", methods=["POST"])
+@admin_required
+def run_data_quality_check():
+    if start_data_quality_job():
+        flash("Data quality check started, reload the page to see the results.", "success")
+    else:
+        flash("A data quality check is already running.", "error")
+    return redirect(url_for("main.data_quality"))
@@ -1,61 +1,29 @@
 from flask import Blueprint, render_template, request
 from database import fetch_query
 from routes.auth_routes import login_required
+from analytics.producer_prices import producer_price_store
+from analytics.price_production import refresh_in_background
+from cache import cached_result
+from conditional import conditional_get, mark_incomplete
+from keepalive import warmup_task
 
 price_statistics_bp = Blueprint("price_statistics", __name__)
 
-@price_statistics_bp.route("/prices/statistics")
-@login_required
-def price_statistics_dashboard():
-    """
-    Price Statistics Dashboard
-    - Nested query (derived table)
-    - 4-table complex join with commodity filter
-    """
-    
-    # Get commodity filter parameter
-    commodity_filter = request.args.get('commodity', '')
-    
-    # Fetch commodities for dropdown
-    commodities_query = """
-        SELECT DISTINCT cm.fao_code, cm.item_name
-        FROM Commodities cm
-        JOIN Producer_Prices pp ON cm.fao_code = pp.commodity_id
-        ORDER BY cm.item_name
-    """
-    commodities = fetch_query(commodities_query)
-    
-    # ==================== NESTED QUERY (Derived Table) ====================
-    commodity_stats_query = """
-        SELECT 
-            cm.item_name as commodity_name,
-            commodity_stats.total_records,
-            commodity_stats.country_count,
-            ROUND(commodity_stats.avg_price::numeric, 2) as avg_price
-        FROM (
-            SELECT 
-                commodity_id,
-                COUNT(*) as total_records,
-                COUNT(DISTINCT country_id) as country_count,
-                AVG(value) as avg_price
-            FROM Producer_Prices
-            WHERE value IS NOT NULL
-            GROUP BY commodity_id
-        ) commodity_stats
-        JOIN Commodities cm ON cm.fao_code = commodity_stats.commodity_id
-        ORDER BY commodity_stats.avg_price DESC
-        LIMIT 5
-    """
-    commodity_stats = fetch_query(commodity_stats_query)
-    
-    # ==================== 4-TABLE JOIN (with GROUP BY for yearly avg) ====================
-    four_table_query = """
+MONTH_NAMES = {
+    1: 'Jan', 2: 'Feb', 3: 'Mar', 4: 'Apr', 5: 'May', 6: 'Jun',
+    7: 'Jul', 8: 'Aug', 9: 'Sep', 10: 'Oct', 11: 'Nov', 12: 'Dec'
+}
+
+def _live_join_query(commodity_filter):
+    """4-table join computed at request time (used when the fact view is missing)"""
+    query = """
         SELECT 
             c.country_name,
             cm.item_name as commodity_name,
             pp.year,
             ROUND(AVG(pp.value)::numeric, 2) as avg_price,
-            ROUND(MAX(p.quantity)::numeric, 0) as production_qty
+            ROUND(MAX(p.quantity)::numeric, 0) as production_qty,
+            NULL as production_value
         FROM Producer_Prices pp
         JOIN Countries c ON c.country_id = pp.country_id
         JOIN Commodities cm ON cm.fao_code = pp.commodity_id
@@ -64,24 +32,166 @@ def price_statistics_dashboard():
                           AND p.year = pp.year
         WHERE pp.value IS NOT NULL AND p.quantity IS NOT NULL
     """
-    params = []
-    
     if commodity_filter:
-        four_table_query += " AND cm.fao_code = %s"
-        params.append(commodity_filter)
-    
-    four_table_query += """
+        query += " AND cm.fao_code = %s"
+
+    query += """
         GROUP BY c.country_name, cm.item_name, pp.year
         ORDER BY pp.year DESC, avg_price DESC
         LIMIT 10
     """
+    return query
+
+
+# Tables read by the database part of the dashboard (cache key)
+DASHBOARD_TABLES = (
+    "commodities", "countries", "producer_prices", "production",
+    "price_production_facts", "price_quantity_elasticities",
+)
+
+
+def _dashboard_data(commodity_filter):
+    """
+    Dropdown, price / production facts and elasticities of the dashboard;
+    "degraded" is set when a query failed or the live join stood in for
+    the fact view
+    """
+    params = (commodity_filter,) if commodity_filter else None
+
+    # Fetch commodities for dropdown
+    commodities_query = """
+        SELECT DISTINCT cm.fao_code, cm.item_name
+        FROM Commodities cm
+        JOIN Producer_Prices pp ON cm.fao_code = pp.commodity_id
+        ORDER BY cm.item_name
+    """
+    commodities = fetch_query(commodities_query)
+
+    # ==================== PRICE / PRODUCTION FACTS (indexed lookup) ====================
+    # PRICE_PRODUCTION_FACTS already holds the (country, commodity, year) join,
+    # so any commodity filter is an index range scan on (commodity_id, year, avg_price)
+    facts_query = """
+        SELECT 
+            c.country_name,
+            cm.item_name as commodity_name,
+            f.year,
+            ROUND(f.avg_price::numeric, 2) as avg_price,
+            ROUND(f.production_qty::numeric, 0) as production_qty,
+            f.production_value
+        FROM Price_Production_Facts f
+        JOIN Countries c ON c.country_id = f.country_id
+        JOIN Commodities cm ON cm.fao_code = f.commodity_id
+    """
+
+    if commodity_filter:
+        facts_query += " WHERE f.commodity_id = %s"
+
+    facts_query += """
+        ORDER BY f.year DESC, f.avg_price DESC
+        LIMIT 10
+    """
+
+    four_table_data = fetch_query(facts_query, params)
+    degraded = four_table_data is None
+
+    if four_table_data is None:
+        # Fact view not created yet: fall back to the live 4-table join
+        four_table_data = fetch_query(_live_join_query(commodity_filter), params)
+
+    # ==================== PRICE-QUANTITY ELASTICITIES ====================
+    elasticity_query = """
+        SELECT cm.item_name as commodity_name, e.elasticity, e.r_squared, e.observations, e.countries
+        FROM Price_Quantity_Elasticities e
+        JOIN Commodities cm ON cm.fao_code = e.commodity_id
+    """
+    if commodity_filter:
+        elasticity_query += " WHERE e.commodity_id = %s"
+    elasticity_query += " ORDER BY e.observations DESC LIMIT 10"
+
+    elasticities = fetch_query(elasticity_query, params)
+
+    return {
+        'commodities': commodities,
+        'four_table_data': four_table_data,
+        'elasticities': elasticities or [],
+        'degraded': degraded or commodities is None or elasticities is None,
+    }
+
+
+def _cached_dashboard_data(commodity_filter):
+    """
+    Dashboard data cached per filter. A degraded result is returned but not
+    cached, so the next request queries again instead of serving it until
+    the next write.
+    """
+    computed = []
+
+    def compute():
+        data = _dashboard_data(commodity_filter)
+        computed.append(data)
+        return None if data['degraded'] else data
+
+    data = cached_result("price_statistics", {"commodity": commodity_filter}, DASHBOARD_TABLES, compute)
+    if data is None:
+        # Degraded: the result of this request, or its own when another request computed it
+        data = computed[0] if computed else _dashboard_data(commodity_filter)
+    return data
+
+
+@warmup_task("price_statistics")
+def _warm_price_statistics():
+    """Unfiltered dashboard and the per-commodity producer price aggregates"""
+    _cached_dashboard_data('')
+    producer_price_store.commodity_summary()
+
+
+@price_statistics_bp.route("/prices/statistics")
+@login_required
+@conditional_get(*DASHBOARD_TABLES)
+def price_statistics_dashboard():
+    """
+    Price Statistics Dashboard
+    - Precomputed per-commodity price, volatility and seasonality metrics
+    - Price / production fact view with commodity filter and elasticities
+    """
     
-    four_table_data = fetch_query(four_table_query, tuple(params) if params else None)
+    # Get commodity filter parameter
+    commodity_filter = request.args.get('commodity', '')
+
+    # The fact view is refreshed in the background when its sources changed
+    refresh_in_background()
+
+    # Cached per filter until one of the tables is written (see cache.py)
+    data = _cached_dashboard_data(commodity_filter)
+    if data['degraded']:
+        # Shows the live join or misses a section: not a page to revalidate
+        mark_incomplete()
+    commodities = data['commodities']
     
+    # ==================== PRECOMPUTED PRODUCER PRICE ANALYTICS ====================
+    # Per-commodity aggregates come from the producer price store instead of
+    # re-grouping the whole Producer_Prices table on every request
+    commodity_names = {cm['fao_code']: cm['item_name'] for cm in (commodities or [])}
+    summary = [
+        dict(row, commodity_name=commodity_names.get(row['commodity_id'], str(row['commodity_id'])))
+        for row in (producer_price_store.commodity_summary() or [])
+    ]
+
+    commodity_stats = sorted(summary, key=lambda r: r['avg_price'], reverse=True)[:5]
+
+    volatility_stats = sorted(
+        [r for r in summary if r['volatility'] is not None],
+        key=lambda r: r['volatility'],
+        reverse=True
+    )[:10]
+
     return render_template(
         'price_statistics.html',
         commodity_stats=commodity_stats,
-        four_table_data=four_table_data,
+        volatility_stats=volatility_stats,
+        month_names=MONTH_NAMES,
+        four_table_data=data['four_table_data'],
+        elasticities=data['elasticities'],
         commodities=commodities,
         selected_commodity=commodity_filter,
     )
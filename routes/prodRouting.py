@@ -1,6 +1,10 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
-from database import fetch_query, execute_query
+from database import execute_transaction, fetch_query
+from queries import PRODUCTION_CHART, PRODUCTION_STATS, production_filters_from_args, production_query
 from routes.auth_routes import admin_required
+from analytics.commodity_profile import mark_row_stale_query, mark_stale_query
+from analytics.land_efficiency import land_efficiency_store
+from units import canonical
 
 prod_bp = Blueprint("prod", __name__)
 
@@ -15,78 +19,8 @@ def production():
         unit = request.args.get("unit", "")
         search = request.args.get("search", "").strip()
 
-        # Advanced query with 4 tables including LEFT OUTER JOIN and nested subquery
-        query = """
-            SELECT 
-                p.production_ID AS production_id,
-                p.year,
-                p.unit,
-                p.quantity,
-                c.country_name,
-                c.region,
-                co.item_name,
-                co.cpc_code,
-                -- Element count from Production_Value (shows data completeness)
-                COALESCE(pv_agg.element_count, 0) AS element_count,
-                -- Calculated metric: Production density (per capita if population available)
-                CASE 
-                    WHEN c.population > 0 THEN p.quantity / c.population
-                    ELSE 0 
-                END AS production_per_capita
-            FROM production p
-            -- Join 1: Countries table for geographic metadata
-            INNER JOIN Countries c ON p.country_code = c.country_id
-            -- Join 2: Commodities table for item details
-            INNER JOIN Commodities co ON p.commodity_code = co.fao_code
-            -- Join 3 (LEFT OUTER): Nested subquery with GROUP BY for aggregating production values
-            LEFT OUTER JOIN (
-                SELECT 
-                    production_ID,
-                    SUM(value) AS total_value,
-                    COUNT(DISTINCT element) AS element_count
-                FROM Production_Value
-                WHERE value IS NOT NULL
-                GROUP BY production_ID
-            ) AS pv_agg ON p.production_ID = pv_agg.production_ID
-            WHERE 1=1
-        """
-        params = []
-
-        if country_code:
-            query += " AND p.country_code = %s"
-            params.append(country_code)
-
-        if commodity_code:
-            query += " AND p.commodity_code = %s"
-            params.append(commodity_code)
-
-        if year:
-            query += " AND p.year = %s"
-            params.append(year)
-        
-        if unit:
-            query += " AND p.unit = %s"
-            params.append(unit)
-        
-        if search:
-            query += """ AND (
-                CAST(p.production_ID AS TEXT) LIKE %s 
-                OR c.country_name ILIKE %s
-                OR co.item_name ILIKE %s
-                OR CAST(p.year AS TEXT) LIKE %s
-                OR CAST(p.quantity AS TEXT) LIKE %s
-                OR p.unit ILIKE %s
-            )"""
-            search_param = f"%{search}%"
-            params.extend([search_param] * 6)
-
-        # Order by year and quantity
-        query += """ ORDER BY 
-            CASE WHEN p.quantity IS NOT NULL AND p.unit IS NOT NULL 
-                      AND c.country_name IS NOT NULL AND co.item_name IS NOT NULL 
-                 THEN 0 ELSE 1 END,
-            p.year DESC, p.quantity DESC NULLS LAST
-            LIMIT 50"""
+        # Advanced query with 4 tables including LEFT OUTER JOIN and nested subquery (queries.py)
+        query, params = production_query(production_filters_from_args(request.args))
 
         production_list = fetch_query(query, params)
 
@@ -102,17 +36,7 @@ def production():
             )
 
         # High-level stats for overview cards
-        stats_result = fetch_query(
-            """
-            SELECT 
-                COUNT(*) AS total_records,
-                COUNT(DISTINCT country_code) AS total_countries,
-                COUNT(DISTINCT commodity_code) AS total_commodities,
-                MIN(year) AS min_year,
-                MAX(year) AS max_year
-            FROM production
-            """
-        )
+        stats_result = fetch_query(PRODUCTION_STATS)
         stats = stats_result[0] if stats_result else {}
 
         # Get filter options
@@ -129,15 +53,7 @@ def production():
         units = fetch_query("SELECT DISTINCT unit FROM production WHERE unit IS NOT NULL ORDER BY unit")
         
         # Chart: Top 10 countries by number of distinct items produced
-        chart_query = """
-            SELECT c.country_name, COUNT(DISTINCT p.commodity_code) as item_count
-            FROM production p
-            INNER JOIN Countries c ON p.country_code = c.country_id
-            GROUP BY c.country_name
-            ORDER BY item_count DESC
-            LIMIT 10
-        """
-        chart_result = fetch_query(chart_query)
+        chart_result = fetch_query(PRODUCTION_CHART)
         chart_data = []
         if chart_result:
             chart_data = [{"country": row["country_name"], "quantity": int(row["item_count"] or 0)} for row in chart_result]
@@ -325,10 +241,15 @@ def add_production():
         
         # Insert new record
         insert_query = """
-            INSERT INTO Production (country_code, commodity_code, year, unit, quantity)
-            VALUES (%s, %s, %s, %s, %s)
+            INSERT INTO Production (country_code, commodity_code, year, unit, quantity, quantity_tonnes)
+            VALUES (%s, %s, %s, %s, %s, %s)
         """
-        execute_query(insert_query, (country_code, commodity_code, year, unit, quantity))
+        execute_transaction([
+            (insert_query, (country_code, commodity_code, year, unit, quantity,
+                            canonical("production", unit, quantity))),
+            mark_stale_query([commodity_code]),
+        ])
+        land_efficiency_store.invalidate_year(year)
         
         flash("Production record added successfully!", "success")
         return redirect(url_for("prod.production"))
@@ -387,10 +308,20 @@ def edit_production(production_id):
         # Update the record (only unit and quantity can be edited)
         update_query = """
             UPDATE Production 
-            SET unit = %s, quantity = %s
+            SET unit = %s, quantity = %s, quantity_tonnes = %s
             WHERE production_ID = %s
         """
-        execute_query(update_query, (unit, quantity, production_id))
+        execute_transaction([
+            (update_query, (unit, quantity, canonical("production", unit, quantity), production_id)),
+            mark_row_stale_query("production", "production_ID", production_id),
+        ])
+
+        year_row = fetch_query(
+            "SELECT year FROM Production WHERE production_ID = %s",
+            [production_id]
+        )
+        if year_row:
+            land_efficiency_store.invalidate_year(year_row[0]["year"])
         
         flash("Production record updated successfully!", "success")
         return redirect(url_for("prod.production"))
@@ -407,7 +338,7 @@ def delete_production(production_id):
     try:
         # Check if record exists
         existing = fetch_query(
-            "SELECT production_ID FROM Production WHERE production_ID = %s",
+            "SELECT production_ID, year FROM Production WHERE production_ID = %s",
             [production_id]
         )
         
@@ -417,7 +348,11 @@ def delete_production(production_id):
         
         # Delete the record (Production_Value records are CASCADE deleted)
         delete_query = "DELETE FROM Production WHERE production_ID = %s"
-        execute_query(delete_query, [production_id])
+        execute_transaction([
+            mark_row_stale_query("production", "production_ID", production_id),
+            (delete_query, [production_id]),
+        ])
+        land_efficiency_store.invalidate_year(existing[0]["year"])
         
         flash("Production record deleted successfully! Related production values were also removed.", "success")
         return redirect(url_for("prod.production"))
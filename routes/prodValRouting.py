@@ -1,5 +1,6 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from database import fetch_query, execute_query
+from queries import production_value_filters_from_args, production_values_query
 from routes.auth_routes import admin_required
 
 prod_val_bp = Blueprint("prod_val", __name__)
@@ -9,79 +10,8 @@ prod_val_bp = Blueprint("prod_val", __name__)
 def production_values():
     """Browse production values with enhanced joins"""
     try:
-        selected_element = request.args.get("element", "")
-        selected_year = request.args.get("year", "")
-        country_code = request.args.get("country_code", "")
-        commodity_code = request.args.get("commodity_code", "")
-        region = request.args.get("region", "")
-        search = request.args.get("search", "").strip()
-
-        query = """
-            SELECT 
-                pv.production_value_ID AS production_value_id,
-                pv.production_ID AS production_id,
-                pv.element,
-                p.year,
-                pv.unit,
-                pv.value,
-                p.country_code,
-                p.commodity_code,
-                p.unit AS production_unit,
-                c.country_name,
-                c.region,
-                co.item_name,
-                co.cpc_code
-            FROM Production_Value pv
-            INNER JOIN Production p ON pv.production_ID = p.production_ID
-            INNER JOIN Countries c ON p.country_code = c.country_id
-            INNER JOIN Commodities co ON p.commodity_code = co.fao_code
-            WHERE 1=1
-        """
-        params = []
-
-        if selected_element:
-            query += " AND pv.element = %s"
-            params.append(selected_element)
-
-        if selected_year:
-            query += " AND p.year = %s"
-            params.append(selected_year)
-
-        if country_code:
-            query += " AND p.country_code = %s"
-            params.append(country_code)
-        
-        if commodity_code:
-            query += " AND p.commodity_code = %s"
-            params.append(commodity_code)
-        
-        if region:
-            query += " AND c.region = %s"
-            params.append(region)
-        
-        if search:
-            query += """ AND (
-                CAST(pv.production_value_ID AS TEXT) LIKE %s
-                OR CAST(pv.production_ID AS TEXT) LIKE %s
-                OR c.country_name ILIKE %s
-                OR co.item_name ILIKE %s
-                OR pv.element ILIKE %s
-                OR CAST(p.year AS TEXT) LIKE %s
-                OR CAST(pv.value AS TEXT) LIKE %s
-                OR pv.unit ILIKE %s
-                OR c.region ILIKE %s
-            )"""
-            search_param = f"%{search}%"
-            params.extend([search_param] * 9)
-
-        # Order by: prioritize complete rows (no nulls), then by year and value
-        query += """ ORDER BY 
-            CASE WHEN pv.value IS NOT NULL AND pv.unit IS NOT NULL AND pv.element IS NOT NULL
-                      AND c.country_name IS NOT NULL AND co.item_name IS NOT NULL AND c.region IS NOT NULL
-                 THEN 0 ELSE 1 END,
-            p.year DESC, pv.value DESC NULLS LAST
-            LIMIT 50"""
-
+        filters = production_value_filters_from_args(request.args)
+        query, params = production_values_query(filters)
         production_values_list = fetch_query(query, params)
 
         if production_values_list is None:
@@ -160,12 +90,12 @@ def production_values():
             countries=countries,
             commodities=commodities,
             regions=regions,
-            selected_element=selected_element,
-            selected_year=selected_year,
-            selected_country=country_code,
-            selected_commodity=commodity_code,
-            selected_region=region,
-            search=search,
+            selected_element=filters["element"],
+            selected_year=filters["year"],
+            selected_country=filters["country_code"],
+            selected_commodity=filters["commodity_code"],
+            selected_region=filters["region"],
+            search=filters["search"],
             # Add pagination variables for template compatibility
             page=1,
             per_page=50,
@@ -1,9 +1,22 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
-from database import fetch_query, execute_query
+from database import fetch_query, execute_transaction, stream_query
+from queries import MONTH_NAMES, PRODUCER_PRICE_STATS, price_filters_from_args, producer_prices_query
 from routes.auth_routes import login_required, admin_required
+from analytics.commodity_profile import mark_row_stale_query, mark_stale_query
+from analytics.producer_prices import producer_price_store
+from streaming import stream_page
 
 producer_price_bp = Blueprint("producer_price", __name__)
 
+
+def _series_of_record(unique_id):
+    """(country_id, commodity_id) of a producer price record, or None"""
+    row = fetch_query(
+        "SELECT country_id, commodity_id FROM Producer_Prices WHERE unique_id = %s;",
+        (unique_id,),
+    )
+    return (row[0]["country_id"], row[0]["commodity_id"]) if row else None
+
 @producer_price_bp.route("/producer_prices")
 @login_required
 def producer_prices_dashboard():
@@ -62,82 +75,15 @@ def producer_prices_dashboard():
     # Only show unit filter if more than 1 distinct unit
     show_unit_filter = len(available_units) > 1
 
-    # Build dynamic query with filters
-    query = """
-        SELECT 
-            p.unique_id,
-            c.country_id,
-            c.country_name,
-            cm.item_name,
-            p.month,
-            p.year,
-            p.unit,
-            p.value
-        FROM Producer_Prices p
-        JOIN countries c ON p.country_id = c.country_id
-        JOIN commodities cm ON p.commodity_id = cm.fao_code
-        WHERE 1=1
-    """
-    params = []
-    
-    if country_filter:
-        query += " AND c.country_id = %s"
-        params.append(country_filter)
-    
-    if commodity_filter:
-        query += " AND cm.fao_code = %s"
-        params.append(commodity_filter)
-    
-    # Multi-month filter
-    if selected_months:
-        placeholders = ', '.join(['%s'] * len(selected_months))
-        query += f" AND p.month IN ({placeholders})"
-        params.extend(selected_months)
-    
-    # Year range filter
-    if year_from:
-        try:
-            query += " AND p.year >= %s"
-            params.append(int(year_from))
-        except ValueError:
-            pass
-    
-    if year_to:
-        try:
-            query += " AND p.year <= %s"
-            params.append(int(year_to))
-        except ValueError:
-            pass
-    
-    # Unit filter
-    if unit_filter:
-        query += " AND p.unit = %s"
-        params.append(unit_filter)
-    
-    query += " ORDER BY p.year DESC, c.country_name, cm.item_name, p.month LIMIT %s"
-    params.append(limit)
-    
-    prices = fetch_query(query, tuple(params))
+    # Build dynamic query with filters (shared with the async API, see queries.py).
+    # The rows are read while the page is sent, the limit is not bounded
+    prices = stream_query(*producer_prices_query(price_filters_from_args(request.args)))
 
     # Statistics Query
-    stats_query = """
-        SELECT 
-            COUNT(*) as total_records,
-            COUNT(DISTINCT country_id) as total_countries,
-            COUNT(DISTINCT commodity_id) as total_commodities
-        FROM Producer_Prices
-    """
-    stats_result = fetch_query(stats_query)
+    stats_result = fetch_query(PRODUCER_PRICE_STATS)
     stats = stats_result[0] if stats_result else {}
-    
-    # Month names for template
-    month_names = {
-        1: 'January', 2: 'February', 3: 'March', 4: 'April',
-        5: 'May', 6: 'June', 7: 'July', 8: 'August',
-        9: 'September', 10: 'October', 11: 'November', 12: 'December'
-    }
 
-    return render_template(
+    return stream_page(
         'producer_prices.html',
         prices=prices,
         countries=countries,
@@ -153,7 +99,7 @@ def producer_prices_dashboard():
         selected_months=selected_months,
         year_from=year_from,
         year_to=year_to,
-        month_names=month_names,
+        month_names=MONTH_NAMES,
         available_units=available_units,
         show_unit_filter=show_unit_filter,
         selected_unit=unit_filter
@@ -243,13 +189,17 @@ def add_producer_price():
         return redirect(url_for("producer_price.add_producer_price_form"))
 
     # Insert new record
-    execute_query(
-        """
-        INSERT INTO Producer_Prices (country_id, commodity_id, year, month, unit, value)
-        VALUES (%s, %s, %s, %s, %s, %s);
-        """,
-        (country_id, commodity_id, year, month, unit, value),
-    )
+    execute_transaction([
+        (
+            """
+            INSERT INTO Producer_Prices (country_id, commodity_id, year, month, unit, value)
+            VALUES (%s, %s, %s, %s, %s, %s);
+            """,
+            (country_id, commodity_id, year, month, unit, value),
+        ),
+        mark_stale_query([commodity_id]),
+    ])
+    producer_price_store.refresh_series(country_id, commodity_id)
 
     flash("Producer price record added successfully.", "success")
     return redirect(url_for("producer_price.add_producer_price_form"))
@@ -318,14 +268,20 @@ def update_producer_price():
         return redirect(url_for("producer_price.producer_prices_dashboard"))
 
     # Update record
-    execute_query(
-        """
-        UPDATE Producer_Prices
-        SET unit = %s, value = %s
-        WHERE unique_id = %s;
-        """,
-        (unit, value, unique_id),
-    )
+    execute_transaction([
+        (
+            """
+            UPDATE Producer_Prices
+            SET unit = %s, value = %s
+            WHERE unique_id = %s;
+            """,
+            (unit, value, unique_id),
+        ),
+        mark_row_stale_query("producer_prices", "unique_id", unique_id),
+    ])
+    series = _series_of_record(unique_id)
+    if series:
+        producer_price_store.refresh_series(*series)
 
     flash("Producer price record updated successfully.", "success")
     return redirect(url_for("producer_price.edit_producer_price_form", id=unique_id))
@@ -341,14 +297,22 @@ def delete_producer_price():
         flash("Invalid record ID.", "error")
         return redirect(url_for("producer_price.producer_prices_dashboard"))
 
+    # Remember which series the record belongs to before it is gone
+    series = _series_of_record(unique_id)
+
     # Delete record
-    execute_query(
-        """
-        DELETE FROM Producer_Prices
-        WHERE unique_id = %s;
-        """,
-        (unique_id,),
-    )
+    execute_transaction([
+        mark_row_stale_query("producer_prices", "unique_id", unique_id),
+        (
+            """
+            DELETE FROM Producer_Prices
+            WHERE unique_id = %s;
+            """,
+            (unique_id,),
+        ),
+    ])
+    if series:
+        producer_price_store.refresh_series(*series)
 
     flash("Producer price record deleted successfully.", "success")
     return redirect(url_for("producer_price.producer_prices_dashboard"))
\ No newline at end of file
@@ -119,4 +119,142 @@ ALTER TABLE TRADE_DATA_FINAL ADD CONSTRAINT fk_trade_partner
     FOREIGN KEY (partner_code) REFERENCES COUNTRIES(country_id);
 
 ALTER TABLE TRADE_DATA_FINAL ADD CONSTRAINT fk_trade_item 
-    FOREIGN KEY (item_code) REFERENCES COMMODITIES(fao_code);
\ No newline at end of file
+    FOREIGN KEY (item_code) REFERENCES COMMODITIES(fao_code);
+
+-- ==================== PRICE / PRODUCTION FACTS ====================
+-- One row per (country, commodity, year) combining the average annual
+-- producer price with production quantity and value.
+-- Refreshed by: python -m analytics.price_production
+CREATE MATERIALIZED VIEW IF NOT EXISTS PRICE_PRODUCTION_FACTS AS
+SELECT
+    pp.country_id,
+    pp.commodity_id,
+    pp.year,
+    pp.avg_price,
+    pp.price_records,
+    p.production_qty,
+    pv.production_value
+FROM (
+    SELECT country_id, commodity_id, year, AVG(value) AS avg_price, COUNT(*) AS price_records
+    FROM PRODUCER_PRICES
+    WHERE value IS NOT NULL
+    GROUP BY country_id, commodity_id, year
+) pp
+JOIN (
+    SELECT country_code, commodity_code, year, MAX(quantity) AS production_qty
+    FROM PRODUCTION
+    WHERE quantity IS NOT NULL
+    GROUP BY country_code, commodity_code, year
+) p ON p.country_code = pp.country_id
+   AND p.commodity_code = pp.commodity_id
+   AND p.year = pp.year
+LEFT JOIN (
+    SELECT p.country_code, p.commodity_code, p.year, SUM(v.value) AS production_value
+    FROM PRODUCTION_VALUE v
+    JOIN PRODUCTION p ON p.production_id = v.production_id
+    WHERE v.element = 'Gross Production Value (current thousand US$)'
+    GROUP BY p.country_code, p.commodity_code, p.year
+) pv ON pv.country_code = pp.country_id
+    AND pv.commodity_code = pp.commodity_id
+    AND pv.year = pp.year;
+
+-- Unique key (required for REFRESH ... CONCURRENTLY)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_ppf_key
+    ON PRICE_PRODUCTION_FACTS (country_id, commodity_id, year);
+
+-- Commodity filter on the price statistics page
+CREATE INDEX IF NOT EXISTS idx_ppf_commodity_year
+    ON PRICE_PRODUCTION_FACTS (commodity_id, year DESC, avg_price DESC);
+
+-- Unfiltered "latest years first" listing
+CREATE INDEX IF NOT EXISTS idx_ppf_year_price
+    ON PRICE_PRODUCTION_FACTS (year DESC, avg_price DESC);
+
+-- Source side indexes used by the refresh
+CREATE INDEX IF NOT EXISTS idx_producer_prices_series
+    ON PRODUCER_PRICES (country_id, commodity_id, year);
+
+CREATE INDEX IF NOT EXISTS idx_production_series
+    ON PRODUCTION (country_code, commodity_code, year);
+
+-- Price-quantity elasticity per commodity, written by the same batch job
+CREATE TABLE IF NOT EXISTS PRICE_QUANTITY_ELASTICITIES (
+    commodity_id INTEGER PRIMARY KEY REFERENCES COMMODITIES(fao_code),
+    elasticity DOUBLE PRECISION,
+    r_squared DOUBLE PRECISION,
+    observations INTEGER,
+    countries INTEGER,
+    computed_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Write counters shared by all worker processes (database.use_shared_table_versions)
+CREATE TABLE IF NOT EXISTS TABLE_VERSIONS (
+    table_name VARCHAR(63) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+-- Results handed over between worker processes by singleflight.py (short lived)
+CREATE UNLOGGED TABLE IF NOT EXISTS SINGLE_FLIGHT_RESULTS (
+    flight_key TEXT PRIMARY KEY,
+    payload BYTEA NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- ==================== CANONICAL UNITS ====================
+-- Values converted to one unit per table (units.py), written next to the
+-- entered value by the forms and the bulk loader; python -m units fills
+-- existing rows. NULL when the unit is not in the registry.
+ALTER TABLE LAND_USE ADD COLUMN IF NOT EXISTS land_usage_1000ha DOUBLE PRECISION;
+ALTER TABLE INVESTMENTS ADD COLUMN IF NOT EXISTS expenditure_musd DOUBLE PRECISION;
+ALTER TABLE PRODUCTION ADD COLUMN IF NOT EXISTS quantity_tonnes NUMERIC;
+
+-- Per-year totals read the canonical column from the index alone
+CREATE INDEX IF NOT EXISTS idx_land_use_year_type
+    ON LAND_USE (year, land_type) INCLUDE (country_id, land_usage_1000ha);
+
+CREATE INDEX IF NOT EXISTS idx_investments_year_type
+    ON INVESTMENTS (year, expenditure_type) INCLUDE (country_id, expenditure_musd);
+
+CREATE INDEX IF NOT EXISTS idx_production_year_tonnes
+    ON PRODUCTION (year, country_code) INCLUDE (commodity_code, quantity_tonnes);
+
+-- ==================== COUNTRY PROFILE ====================
+-- Per-country lookups of analytics/country_profile.py (and the timelines)
+CREATE INDEX IF NOT EXISTS idx_trade_reporter_year
+    ON TRADE_DATA_FINAL (reporter_code, year);
+
+CREATE INDEX IF NOT EXISTS idx_consumer_prices_country_year
+    ON CONSUMER_PRICES (country_id, year);
+
+CREATE INDEX IF NOT EXISTS idx_land_use_country_year
+    ON LAND_USE (country_id, year);
+
+CREATE INDEX IF NOT EXISTS idx_investments_country_year
+    ON INVESTMENTS (country_id, year);
+
+CREATE INDEX IF NOT EXISTS idx_production_value_production
+    ON PRODUCTION_VALUE (production_id, element);
+
+-- ==================== COMMODITY SUMMARIES ====================
+-- Precomputed summary of every commodity (analytics/commodity_profile.py).
+-- version is bumped by the writes to trade, production and producer prices
+-- of the commodity, summary_version is the version the summary was built
+-- from: they differ while the summary is stale.
+-- Refreshed by: python -m analytics.commodity_profile
+CREATE TABLE IF NOT EXISTS COMMODITY_SUMMARIES (
+    commodity_id INTEGER PRIMARY KEY REFERENCES COMMODITIES(fao_code) ON DELETE CASCADE,
+    version BIGINT NOT NULL DEFAULT 0,
+    summary JSONB,
+    summary_version BIGINT,
+    computed_at TIMESTAMP
+);
+
+-- Per-commodity lookups of the refresh
+CREATE INDEX IF NOT EXISTS idx_trade_item_year
+    ON TRADE_DATA_FINAL (item_code, year);
+
+CREATE INDEX IF NOT EXISTS idx_production_commodity_year
+    ON PRODUCTION (commodity_code, year) INCLUDE (country_code, quantity_tonnes);
+
+CREATE INDEX IF NOT EXISTS idx_producer_prices_commodity_year
+    ON PRODUCER_PRICES (commodity_id, year) INCLUDE (country_id, unit, value);
@@ -0,0 +1,224 @@
+"""
+Single-flight execution of expensive dashboard computations.
+
+Concurrent requests with the same key (endpoint, normalized query args and
+the write versions of the tables they read) share one computation instead
+of each launching the same query set:
+
+- within a process the first caller computes, the others wait for its result;
+- across worker processes (when table versions are shared, see
+  database.use_shared_table_versions) the leaders take a Postgres advisory
+  lock on the key and the result is handed over through SINGLE_FLIGHT_RESULTS.
+
+Results cross processes pickled, so the waiting processes get the same
+types (Decimals, dates) as the computing one.
+"""
+import hashlib
+import json
+import pickle
+import threading
+from contextlib import ExitStack
+
+import psycopg2
+
+from database import (
+    get_table_version,
+    pooled_connection,
+    read_failures,
+    record_read_failures,
+    shared_table_versions_enabled,
+)
+
+# How long a process waits for another one computing the same key
+LOCK_TIMEOUT = "30s"
+
+# Seconds a shared result stays readable for processes that waited on the lock
+RESULT_TTL = 60
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        # Reads that failed while computing: the result is incomplete
+        self.failed_reads = 0
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def _normalize(value):
+    if isinstance(value, (list, tuple, set)):
+        return sorted(str(v) for v in value)
+    return str(value)
+
+
+def flight_key(endpoint, args=None, tables=()):
+    """
+    Key of a computation: endpoint, non-empty args (order independent) and
+    the current versions of the tables it reads.
+    """
+    normalized = sorted(
+        (str(name), _normalize(value))
+        for name, value in (args or {}).items()
+        if value not in (None, '', [], ())
+    )
+    versions = [(table.lower(), get_table_version(table)) for table in sorted(tables)]
+    return json.dumps([endpoint, normalized, versions], separators=(",", ":"))
+
+
+def single_flight(endpoint, args, tables, compute):
+    """
+    Returns compute(), sharing the call with concurrent identical requests.
+    Exceptions of the computing request are raised in every waiting request.
+    """
+    key = flight_key(endpoint, args, tables)
+
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+
+    if not leader:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        record_read_failures(flight.failed_reads)
+        return flight.result
+
+    failures = read_failures()
+    try:
+        if shared_table_versions_enabled():
+            flight.result = _shared_flight(key, compute)
+        else:
+            flight.result = compute()
+        return flight.result
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        flight.failed_reads = read_failures() - failures
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight.done.set()
+
+
+def _lock_id(key):
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big", signed=True)
+
+
+def _read_shared_result(cursor, key):
+    try:
+        cursor.execute(
+            """
+            SELECT payload FROM SINGLE_FLIGHT_RESULTS
+            WHERE flight_key = %s AND created_at > NOW() - %s * INTERVAL '1 second'
+            """,
+            (key, RESULT_TTL),
+        )
+        row = cursor.fetchone()
+    except psycopg2.Error as e:
+        print(f"Single-flight read error: {e}")
+        return None
+    return pickle.loads(row[0]) if row else None
+
+
+def _write_shared_result(cursor, key, result):
+    try:
+        cursor.execute(
+            "DELETE FROM SINGLE_FLIGHT_RESULTS WHERE created_at < NOW() - %s * INTERVAL '1 second'",
+            (RESULT_TTL,),
+        )
+        cursor.execute(
+            """
+            INSERT INTO SINGLE_FLIGHT_RESULTS (flight_key, payload, created_at)
+            VALUES (%s, %s, NOW())
+            ON CONFLICT (flight_key) DO UPDATE SET payload = EXCLUDED.payload, created_at = EXCLUDED.created_at
+            """,
+            (key, psycopg2.Binary(pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))),
+        )
+    except (psycopg2.Error, pickle.PicklingError, TypeError, AttributeError) as e:
+        print(f"Single-flight write error: {e}")
+
+
+def _has_waiters(cursor, lock_id):
+    """Whether another session is waiting for the advisory lock lock_id"""
+    unsigned = lock_id & 0xFFFFFFFFFFFFFFFF
+    try:
+        cursor.execute(
+            """
+            SELECT EXISTS (
+                SELECT 1 FROM pg_locks
+                WHERE locktype = 'advisory' AND NOT granted
+                  AND classid = %s::bigint::oid AND objid = %s::bigint::oid AND objsubid = 1
+            )
+            """,
+            (unsigned >> 32, unsigned & 0xFFFFFFFF),
+        )
+        return cursor.fetchone()[0]
+    except psycopg2.Error as e:
+        print(f"Single-flight read error: {e}")
+        return True
+
+
+def _shared_flight(key, compute):
+    """
+    Cross-process part: the first process takes the advisory lock without
+    waiting and computes; only when the lock is contended does a process
+    wait for it and read the result handed over in SINGLE_FLIGHT_RESULTS.
+    Falls back to computing locally when the lock cannot be taken.
+    """
+    lock_id = _lock_id(key)
+    with ExitStack() as stack:
+        try:
+            conn = stack.enter_context(pooled_connection())
+            conn.autocommit = True
+        except Exception as e:
+            print(f"Single-flight lock error: {e}")
+            return compute()
+
+        try:
+            return _locked_flight(conn.cursor(), key, lock_id, compute)
+        finally:
+            # Back to the pool in the state the other requests expect
+            if not conn.closed:
+                try:
+                    conn.cursor().execute("RESET lock_timeout")
+                    conn.autocommit = False
+                except psycopg2.Error:
+                    conn.close()
+
+
+def _locked_flight(cursor, key, lock_id, compute):
+    try:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", (lock_id,))
+        contended = not cursor.fetchone()[0]
+        if contended:
+            cursor.execute(f"SET lock_timeout = '{LOCK_TIMEOUT}'")
+            cursor.execute("SELECT pg_advisory_lock(%s)", (lock_id,))
+    except psycopg2.Error as e:
+        print(f"Single-flight lock error: {e}")
+        return compute()
+
+    try:
+        if contended:
+            result = _read_shared_result(cursor, key)
+            if result is not None:
+                return result
+
+        failures = read_failures()
+        result = compute()
+        # The result is handed over only to the processes queued on the lock,
+        # and only when complete: otherwise they compute their own
+        complete = read_failures() == failures
+        if result is not None and complete and _has_waiters(cursor, lock_id):
+            _write_shared_result(cursor, key, result)
+        return result
+    finally:
+        try:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (lock_id,))
+        except psycopg2.Error:
+            pass  # closing the session releases the lock anyway
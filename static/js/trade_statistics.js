@@ -1,10 +1,20 @@
+// Chart data is fetched after the page is shown (/trades/statistics/charts/<name>).
+// All requests start at once, so a slow chart does not hold back the others.
+function loadChart(canvasId, render) {
+  const canvas = document.getElementById(canvasId);
+  if (!canvas || !canvas.dataset.chartUrl) {
+    return;
+  }
+  fetch(canvas.dataset.chartUrl, { credentials: 'same-origin' })
+    .then(response => response.ok ? response.json() : Promise.reject(response.status))
+    .then(data => render(canvas, data))
+    .catch(error => console.error('Could not load ' + canvasId + ':', error));
+}
+
 document.addEventListener('DOMContentLoaded', function() {
 
   // Chart 1: Exports vs Imports Over Time (Line Chart)
-  const exportsImportsCtx = document.getElementById('exportsImportsChart');
-  if (exportsImportsCtx && exportsImportsCtx.dataset.chart) {
-    const timeSeriesData = JSON.parse(exportsImportsCtx.dataset.chart);
-
+  loadChart('exportsImportsChart', function(exportsImportsCtx, timeSeriesData) {
     new Chart(exportsImportsCtx, {
       type: 'line',
       data: {
@@ -65,13 +75,10 @@ document.addEventListener('DOMContentLoaded', function() {
         }
       }
     });
-  }
+  });
 
   // Chart 2: Top Trading Countries (Horizontal Bar Chart)
-  const topCountriesCtx = document.getElementById('topCountriesChart');
-  if (topCountriesCtx && topCountriesCtx.dataset.chart) {
-    const topCountriesData = JSON.parse(topCountriesCtx.dataset.chart);
-
+  loadChart('topCountriesChart', function(topCountriesCtx, topCountriesData) {
     new Chart(topCountriesCtx, {
       type: 'bar',
       data: {
@@ -112,12 +119,10 @@ document.addEventListener('DOMContentLoaded', function() {
         }
       }
     });
-  }
+  });
 
   // Chart 3: Trade Balance by Country (Bar Chart with Positive/Negative)
-  const tradeBalanceCtx = document.getElementById('tradeBalanceChart');
-  if (tradeBalanceCtx && tradeBalanceCtx.dataset.chart) {
-    const tradeBalanceData = JSON.parse(tradeBalanceCtx.dataset.chart);
+  loadChart('tradeBalanceChart', function(tradeBalanceCtx, tradeBalanceData) {
 
     // Color bars based on positive (surplus) or negative (deficit)
     const backgroundColors = tradeBalanceData.balance.map(val =>
@@ -168,13 +173,10 @@ document.addEventListener('DOMContentLoaded', function() {
         }
       }
     });
-  }
+  });
 
   // Chart 4: Top Commodities Traded (Doughnut Chart)
-  const commoditiesCtx = document.getElementById('commoditiesChart');
-  if (commoditiesCtx && commoditiesCtx.dataset.chart) {
-    const commoditiesData = JSON.parse(commoditiesCtx.dataset.chart);
-
+  loadChart('commoditiesChart', function(commoditiesCtx, commoditiesData) {
     new Chart(commoditiesCtx, {
       type: 'doughnut',
       data: {
@@ -237,13 +239,10 @@ document.addEventListener('DOMContentLoaded', function() {
         }
       }
     });
-  }
+  });
 
   // Chart 5: Regional Trade Distribution (Pie Chart)
-  const regionalCtx = document.getElementById('regionalChart');
-  if (regionalCtx && regionalCtx.dataset.chart) {
-    const regionalData = JSON.parse(regionalCtx.dataset.chart);
-
+  loadChart('regionalChart', function(regionalCtx, regionalData) {
     new Chart(regionalCtx, {
       type: 'pie',
       data: {
@@ -304,13 +303,10 @@ document.addEventListener('DOMContentLoaded', function() {
         }
       }
     });
-  }
+  });
 
   // Chart 6: Trade Volume Over Time (Area Chart)
-  const volumeCtx = document.getElementById('volumeChart');
-  if (volumeCtx && volumeCtx.dataset.chart) {
-    const volumeData = JSON.parse(volumeCtx.dataset.chart);
-
+  loadChart('volumeChart', function(volumeCtx, volumeData) {
     new Chart(volumeCtx, {
       type: 'line',
       data: {
@@ -360,5 +356,5 @@ document.addEventListener('DOMContentLoaded', function() {
         }
       }
     });
-  }
+  });
 });
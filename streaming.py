@@ -0,0 +1,52 @@
+"""
+Streamed rendering of listing pages.
+
+The page header and filters are sent as soon as they are rendered and the
+rows follow while they are fetched (database.stream_query), so the first
+byte does not wait for the whole result and memory stays bounded per request.
+"""
+from flask import Response, get_flashed_messages, stream_template
+
+from database import RowStream
+
+# Rendered output is sent in chunks of at least this many characters
+CHUNK_SIZE = 16 * 1024
+
+# Until the rows are requested (the page head) chunks are this small, so the
+# first byte does not wait for a full chunk
+FIRST_CHUNK_SIZE = 1024
+
+
+def _chunks(parts, streams=(), size=CHUNK_SIZE, first_size=FIRST_CHUNK_SIZE):
+    buffer = []
+    length = 0
+    head = True
+    for part in parts:
+        buffer.append(part)
+        length += len(part)
+        # The part that requested the first rows has waited for them: send
+        # what is buffered now rather than after a full chunk of rows
+        rows_requested = head and any(stream.started for stream in streams)
+        if rows_requested or length >= (first_size if head else size):
+            yield "".join(buffer)
+            buffer = []
+            length = 0
+            if rows_requested or not streams:
+                head = False
+    if buffer:
+        yield "".join(buffer)
+
+
+def stream_page(template_name, **context):
+    """
+    Like render_template, but sends the page while it is rendered.
+    RowStreams in the context are closed when the response ends.
+    """
+    # The session cookie is sent with the headers, before the template reads
+    # the flashed messages: take them out of the session now
+    get_flashed_messages(with_categories=True)
+
+    streams = [value for value in context.values() if isinstance(value, RowStream)]
+    response = Response(_chunks(stream_template(template_name, **context), streams), mimetype="text/html")
+    response.call_on_close(lambda: [stream.close() for stream in streams])
+    return response
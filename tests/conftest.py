@@ -0,0 +1,172 @@
+"""
+Shared fixtures: the Flask app with a fake database that records every
+statement (query-count tests), and a real database for the plan tests.
+"""
+import copy
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# No background thread may query while statements are counted
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ["DB_KEEPALIVE_PER_WORKER"] = "1"
+os.environ["DB_WARMUP"] = "0"
+os.environ["RESULT_CACHE_BACKEND"] = "memory"
+
+import database  # noqa: E402
+import journal  # noqa: E402
+
+
+class FakeRow(dict):
+    """Row of any query: unknown columns read as 0"""
+
+    def __missing__(self, key):
+        return 0
+
+
+FAKE_ROW = FakeRow(
+    country_id=1, country_name="Country 001", country_code=1, region="Europe", population=1000,
+    fao_code=1, item_name="Commodity 0001", commodity_name="Commodity 0001", commodity_id=1,
+    year=2020, month=1, min_year=2000, max_year=2020, trade_type="Export", unit="t",
+    value=1.0, total=1, count=1, total_value=1.0, avg_value=1.0, production_id=1, production_value_id=1,
+    # Country profile document (analytics/country_profile.py) with the gaps of
+    # real series: missing values, missing years and empty sections
+    profile={
+        "country": {"country_id": 1, "country_name": "Country 001", "region": None,
+                    "population": None, "land_area_sq_km": None},
+        "trade": [
+            {"year": 2019, "export_value": 10.0, "import_value": 0, "export_qty": None, "import_qty": None},
+            {"year": 2020, "export_value": None, "import_value": 5.0, "export_qty": 1.0, "import_qty": None},
+        ],
+        "partners": [{"trade_type": "Export", "country_id": 2, "country_name": "Country 002",
+                      "value": None, "qty": None, "rank": 1}],
+        "production": [
+            {"year": 2019, "quantity_tonnes": 3.0, "commodities": 1, "production_value": None},
+            {"year": 2020, "quantity_tonnes": None, "commodities": 0, "production_value": None},
+        ],
+        "top_commodities": [],
+        "price_indices": [
+            {"year": 2019, "general": None, "food": None},
+            {"year": 2020, "general": 101.0, "food": 104.0},
+        ],
+        "land_use": [{"year": 2019, "land_area": 0, "agricultural_land": None,
+                      "arable_land": None, "forest_land": None}],
+        "investments": [{"year": 2020, "total_expenditure": None, "agriculture_forestry_fishing": 1.0,
+                         "environmental_protection": None}],
+    },
+)
+
+
+class FakeCursor:
+    def __init__(self, statements, named=False):
+        self.statements = statements
+        self.named = named
+        self.description = None
+        self.rowcount = 1
+        self.itersize = 500
+        self._fetched = False
+
+    def execute(self, query, params=None):
+        # Statements of background threads are not part of the request
+        if threading.current_thread() is threading.main_thread():
+            self.statements.append(" ".join(query.split()))
+        self.description = [("column",)]
+        self._fetched = False
+
+    def fetchall(self):
+        return [FakeRow(copy.deepcopy(FAKE_ROW))]
+
+    def fetchone(self):
+        return (1,)
+
+    def fetchmany(self, size=None):
+        if self._fetched:
+            return []
+        self._fetched = True
+        return [FakeRow(copy.deepcopy(FAKE_ROW))]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    closed = 0
+
+    def __init__(self, statements):
+        self.statements = statements
+
+    def cursor(self, name=None, cursor_factory=None):
+        return FakeCursor(self.statements, named=name is not None)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app import create_app
+
+    return create_app()
+
+
+@pytest.fixture
+def statements(monkeypatch, tmp_path):
+    """Statements sent to the (fake) database during the test"""
+    executed = []
+    # Writes go to log.sql and the journal, not to the tracked files of the repository
+    monkeypatch.setattr(database, "SQL_LOG_PATH", str(tmp_path / "log.sql"))
+    monkeypatch.setattr(journal, "JOURNAL_PATH", str(tmp_path / "journal.jsonl"))
+    monkeypatch.setattr(database, "_acquire_connection", lambda: (FakeConnection(executed), False))
+    monkeypatch.setattr(database, "_release_connection", lambda conn, pooled: None)
+    monkeypatch.setattr(database, "get_db_connection", lambda: FakeConnection(executed))
+    # The fact view refresh would invalidate the cached dashboard between two requests
+    import routes.priceStatisticsRouting
+    monkeypatch.setattr(routes.priceStatisticsRouting, "refresh_in_background", lambda: False)
+    return executed
+
+
+@pytest.fixture
+def cold_caches():
+    """Invalidates every versioned cache, so a request runs all of its queries"""
+    from cache import result_cache
+
+    result_cache.clear()
+    for table in ("countries", "commodities", "trade_data_final", "production", "production_value",
+                  "producer_prices", "consumer_prices", "land_use", "investments"):
+        database.bump_table_version(table)
+
+
+@pytest.fixture
+def admin_client(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["logged_in"] = True
+        session["username"] = "admin"
+        session["is_admin"] = True
+    return client
+
+
+@pytest.fixture(scope="session")
+def plan_db():
+    """
+    Connection to a database loaded with bench.datagen (PLAN_TEST_DATABASE_URL),
+    the plan tests are skipped without it.
+    """
+    url = os.environ.get("PLAN_TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("PLAN_TEST_DATABASE_URL is not set")
+    import psycopg2
+
+    conn = psycopg2.connect(url)
+    yield conn
+    conn.close()
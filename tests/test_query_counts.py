@@ -0,0 +1,99 @@
+"""
+Statement budgets of every GET page.
+
+Each page is requested twice against a fake database that records the
+statements it receives: once with every cache invalidated (cold) and once
+right after (warm). A page sending more statements than its budget fails,
+which catches N+1 loops and cached results that are no longer reused.
+Lower a budget when a page gets cheaper; a new page needs an entry.
+"""
+import pytest
+
+from bench.run import bench_targets
+
+SAMPLES = {"country": "1", "year": "2020", "commodity": "1"}
+
+# URL -> (max statements cold, max statements warm)
+QUERY_BUDGETS = {
+    "/": (7, 0),
+    "/_profile/": (0, 0),
+    "/admin/cache-stats": (0, 0),
+    "/admin/data-quality": (0, 0),
+    "/admin/keepalive-stats": (0, 0),
+    "/commodities": (2, 2),
+    "/commodities/1": (3, 0),
+    "/consumer-prices/edit?id=1": (1, 1),
+    "/consumer-prices/new": (1, 1),
+    "/consumer_prices": (5, 4),
+    "/consumer_prices?country=1&year_from=2020": (5, 4),
+    "/consumer_prices/inflation.json?country=1": (1, 0),
+    "/countries": (2, 2),
+    "/countries/1": (1, 0),
+    "/countries/1/profile.json": (1, 0),
+    "/investments?year=2020": (3, 2),
+    "/investments/country-timeline?country_id=1": (4, 3),
+    "/investments/country-timeline/chart?country_id=1": (1, 0),
+    "/investments/edit?country_id=1&year=2020": (2, 2),
+    "/investments/new": (1, 1),
+    "/land-use/edit?country_id=1&year=2020": (2, 2),
+    "/land-use/new": (1, 1),
+    "/landuse?year=2020": (4, 3),
+    "/landuse?year=2020&country_id=1": (4, 3),
+    "/landuse/country-timeline?country_id=1": (4, 3),
+    "/landuse/country-timeline/chart?country_id=1": (1, 0),
+    "/landuse/land-efficiency-analysis?year=2020": (1, 0),
+    "/login": (0, 0),
+    "/prices/statistics": (7, 0),
+    "/prices/statistics?commodity=1": (7, 0),
+    "/producer-prices/edit?id=1": (1, 1),
+    "/producer-prices/new": (2, 2),
+    "/producer_prices": (6, 6),
+    "/producer_prices?commodity=1": (6, 6),
+    "/production": (7, 7),
+    "/production-value/1/edit": (2, 2),
+    "/production-values": (8, 8),
+    "/production-values/new": (5, 5),
+    "/production/1/edit": (1, 1),
+    "/production/new": (2, 2),
+    "/trades": (10, 6),
+    "/trades?reporter_country=1&year=2020": (10, 6),
+    "/trades?commodity=1&sort=qty_asc&page=5": (10, 6),
+    "/trades/statistics": (4, 0),
+    "/trades/statistics/charts/commodities": (1, 0),
+    "/trades/statistics/charts/regional": (1, 0),
+    "/trades/statistics/charts/time_series": (1, 0),
+    "/trades/statistics/charts/top_countries": (1, 0),
+    "/trades/statistics/charts/trade_balance": (1, 0),
+    "/trades/statistics/charts/volume": (1, 0),
+}
+
+
+def _request(client, url):
+    response = client.get(url)
+    # Streamed pages run their queries while the body is read
+    response.get_data()
+    response.close()
+    assert response.status_code == 200, f"{url} returned {response.status_code}"
+    return response
+
+
+def test_every_page_has_a_budget(app):
+    urls = {url for _, url in bench_targets(app, SAMPLES)}
+    missing = sorted(urls - set(QUERY_BUDGETS))
+    assert not missing, f"Pages without a statement budget: {missing}"
+
+
+@pytest.mark.parametrize("url", sorted(QUERY_BUDGETS))
+def test_statement_budget(url, admin_client, statements, cold_caches):
+    cold_budget, warm_budget = QUERY_BUDGETS[url]
+
+    _request(admin_client, url)
+    cold = list(statements)
+    assert len(cold) <= cold_budget, (
+        f"{url} sent {len(cold)} statements (budget {cold_budget}):\n" + "\n".join(cold))
+
+    del statements[:]
+    _request(admin_client, url)
+    assert len(statements) <= warm_budget, (
+        f"{url} sent {len(statements)} statements on a repeated request (budget {warm_budget}):\n"
+        + "\n".join(statements))
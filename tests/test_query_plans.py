@@ -0,0 +1,113 @@
+"""
+Plan snapshots of the named queries (queries.named_queries).
+
+Needs a database loaded with bench.datagen, e.g.
+
+    python -m bench.datagen --preset small --database-url $PLAN_TEST_DATABASE_URL
+    PLAN_TEST_DATABASE_URL=... python -m pytest tests/test_query_plans.py
+
+The plan of every query is summarized (total estimated cost, tables read
+by a sequential scan) and compared with tests/plans/<name>.json, generated
+from the "small" preset. A query fails when it scans a large table
+sequentially (unless ALLOWED_SEQ_SCANS lists it), when its estimated cost
+grows beyond COST_FACTOR, or when it has no snapshot.
+UPDATE_PLAN_SNAPSHOTS=1 (re)writes the snapshots after an intended change
+or for a new query; commit them with the change.
+"""
+import json
+import os
+
+import pytest
+
+from queries import named_queries
+
+PLANS_DIR = os.path.join(os.path.dirname(__file__), "plans")
+
+# Tables with more rows are "large", a sequential scan on them is a regression
+LARGE_TABLE_ROWS = int(os.environ.get("PLAN_LARGE_TABLE_ROWS", 100000))
+COST_FACTOR = float(os.environ.get("PLAN_COST_FACTOR", 2.0))
+
+SEQ_SCANS = {"Seq Scan", "Parallel Seq Scan"}
+
+# Large tables a query is meant to read whole: aggregates over the unfiltered
+# table and unfiltered listings ordered by an expression no index provides.
+# These pages are served from the result cache (cache.py) between writes.
+ALLOWED_SEQ_SCANS = {
+    # Unfiltered producer price listing, sorted by year then the joined names
+    "producer_prices": {"producer_prices"},
+    # Trade statistics charts aggregate every trade row
+    "trade_chart_commodities": {"trade_data_final"},
+    "trade_chart_regional": {"trade_data_final"},
+    "trade_chart_time_series": {"trade_data_final"},
+    "trade_chart_top_countries": {"trade_data_final"},
+    "trade_chart_trade_balance": {"trade_data_final"},
+    "trade_chart_volume": {"trade_data_final"},
+    # Unfiltered trade listing: row count, trade types and the top rows by value
+    "trade_flows_total": {"trade_data_final"},
+    "trade_flows_trade_flows": {"trade_data_final"},
+    "trade_flows_trade_types": {"trade_data_final"},
+    "trade_types": {"trade_data_final"},
+    # Trade summary of the home page, over every trade row
+    "trade_summary_top_partners": {"trade_data_final"},
+    "trade_summary_trade_types": {"trade_data_final"},
+}
+
+
+def _seq_scans(node, tables):
+    if node.get("Node Type") in SEQ_SCANS and "Relation Name" in node:
+        tables.add(node["Relation Name"])
+    for child in node.get("Plans", []):
+        _seq_scans(child, tables)
+    return tables
+
+
+def plan_summary(conn, query, params):
+    """Total estimated cost and sequentially scanned tables of a query"""
+    with conn.cursor() as cursor:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + query, params)
+        plan = cursor.fetchone()[0][0]["Plan"]
+    conn.rollback()
+    return {"total_cost": plan["Total Cost"], "seq_scans": sorted(_seq_scans(plan, set()))}
+
+
+@pytest.fixture(scope="session")
+def large_tables(plan_db):
+    with plan_db.cursor() as cursor:
+        cursor.execute("""
+            SELECT relname FROM pg_class
+            WHERE relkind IN ('r', 'm') AND reltuples > %s
+        """, (LARGE_TABLE_ROWS,))
+        tables = {row[0] for row in cursor.fetchall()}
+    plan_db.rollback()
+    return tables
+
+
+def test_allowed_seq_scans_are_named_queries():
+    unknown = sorted(set(ALLOWED_SEQ_SCANS) - set(named_queries()))
+    assert not unknown, f"ALLOWED_SEQ_SCANS lists unknown queries: {unknown}"
+
+
+@pytest.mark.parametrize("name", sorted(named_queries()))
+def test_query_plan(name, plan_db, large_tables):
+    query, params = named_queries()[name]
+    summary = plan_summary(plan_db, query, params)
+    path = os.path.join(PLANS_DIR, f"{name}.json")
+
+    if os.environ.get("UPDATE_PLAN_SNAPSHOTS") == "1":
+        os.makedirs(PLANS_DIR, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(summary, f, indent=2, sort_keys=True)
+            f.write("\n")
+        pytest.skip(f"plan snapshot written to {path}")
+
+    assert os.path.exists(path), (
+        f"{name}: no plan snapshot, write it with UPDATE_PLAN_SNAPSHOTS=1 and commit {path}")
+    with open(path) as f:
+        snapshot = json.load(f)
+
+    scans = set(summary["seq_scans"]) & large_tables
+    unexpected = scans - ALLOWED_SEQ_SCANS.get(name, set())
+    assert not unexpected, f"{name}: sequential scan of {sorted(unexpected)}"
+    assert summary["total_cost"] <= snapshot["total_cost"] * COST_FACTOR, (
+        f"{name}: estimated cost {summary['total_cost']:.0f}, snapshot {snapshot['total_cost']:.0f}"
+    )
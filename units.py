@@ -0,0 +1,141 @@
+"""
+Unit registry of land use, investments and production.
+
+The tables keep the value in the unit it was entered in (LAND_USE mixes
+"1000 ha" and "km^2", INVESTMENTS "Million USD" and "Billion USD",
+PRODUCTION has free-text units). The forms and the bulk loader also store
+the value converted to one canonical unit per table, in a column of its own:
+
+    LAND_USE.land_usage_1000ha      1000 ha
+    INVESTMENTS.expenditure_musd    Million USD
+    PRODUCTION.quantity_tonnes      t (mass units only)
+
+Totals sum that column. A unit missing from the registry gives NULL, so the
+row is left out of the totals instead of being added in another unit.
+
+    python -m units      # fill the columns of existing rows, list unknown units
+"""
+import sys
+from collections import namedtuple
+
+from database import execute_transaction, fetch_query
+
+# table:     table holding the measure
+# value:     column with the value as entered
+# column:    column with the value in the canonical unit
+# unit:      canonical unit
+# factors:   normalized unit -> multiplier to the canonical unit
+Measure = namedtuple("Measure", ["table", "value", "column", "unit", "factors"])
+
+MEASURES = {
+    "land_use": Measure("land_use", "land_usage_value", "land_usage_1000ha", "1000 ha", {
+        "1000 ha": 1.0,
+        "ha": 0.001,
+        "km^2": 0.1,
+        "km2": 0.1,
+        "sq km": 0.1,
+    }),
+    "investments": Measure("investments", "expenditure_value", "expenditure_musd", "Million USD", {
+        "million usd": 1.0,
+        "billion usd": 1000.0,
+        "thousand usd": 0.001,
+        "usd": 0.000001,
+    }),
+    "production": Measure("production", "quantity", "quantity_tonnes", "t", {
+        "t": 1.0,
+        "tonnes": 1.0,
+        "1000 t": 1000.0,
+        "kg": 0.001,
+        "g": 0.000001,
+    }),
+}
+
+# Same normalization as normalize() (trim, single spaces, lower case)
+_SQL_UNIT = "lower(regexp_replace(trim({unit}), '\\s+', ' ', 'g'))"
+
+
+def normalize(unit):
+    return " ".join((unit or "").split()).lower()
+
+
+def factor(table, unit):
+    """Multiplier from unit to the canonical unit of table, None if unknown"""
+    return MEASURES[table].factors.get(normalize(unit))
+
+
+def canonical(table, unit, value):
+    """value (in unit) in the canonical unit of table, None if it cannot be converted"""
+    multiplier = factor(table, unit)
+    if multiplier is None or value is None:
+        return None
+    return float(value) * multiplier
+
+
+def backfill_queries(table):
+    """
+    (query, params) pair setting the canonical column of every row where it
+    is out of date: converted for known units, NULL for the others
+    """
+    measure = MEASURES[table]
+    values = ", ".join(["(%s, %s::double precision)"] * len(measure.factors))
+    placeholders = ", ".join(["%s"] * len(measure.factors))
+    unit = _SQL_UNIT.format(unit="t.unit")
+    convert = f"""
+        UPDATE {measure.table} AS t
+        SET {measure.column} = t.{measure.value} * f.factor
+        FROM (VALUES {values}) AS f(unit, factor)
+        WHERE {unit} = f.unit
+          AND t.{measure.column} IS DISTINCT FROM t.{measure.value} * f.factor
+    """
+    clear = f"""
+        UPDATE {measure.table} AS t
+        SET {measure.column} = NULL
+        WHERE t.{measure.column} IS NOT NULL
+          AND ({unit} NOT IN ({placeholders}) OR t.unit IS NULL)
+    """
+    return [
+        (convert, tuple(item for pair in measure.factors.items() for item in pair)),
+        (clear, tuple(measure.factors)),
+    ]
+
+
+def unknown_units_query(table):
+    """Units of table that are not in the registry, with their row counts"""
+    measure = MEASURES[table]
+    placeholders = ", ".join(["%s"] * len(measure.factors))
+    query = f"""
+        SELECT unit, COUNT(*) AS row_count
+        FROM {measure.table}
+        WHERE {measure.value} IS NOT NULL
+          AND ({_SQL_UNIT.format(unit="unit")} NOT IN ({placeholders}) OR unit IS NULL)
+        GROUP BY unit
+        ORDER BY row_count DESC
+    """
+    return query, tuple(measure.factors)
+
+
+def backfill(tables=None):
+    """Fills the canonical columns; returns {table: (updated rows, unknown units)}"""
+    report = {}
+    for table in tables or MEASURES:
+        updated = sum(execute_transaction(backfill_queries(table)))
+        report[table] = (updated, fetch_query(*unknown_units_query(table)) or [])
+    return report
+
+
+def main(argv=None):
+    tables = (argv if argv is not None else sys.argv[1:]) or list(MEASURES)
+    unknown = [table for table in tables if table not in MEASURES]
+    if unknown:
+        print(f"Unknown table: {', '.join(unknown)} (expected {', '.join(MEASURES)})")
+        return 2
+    for table, (updated, units) in backfill(tables).items():
+        measure = MEASURES[table]
+        print(f"{table}: {updated:,} rows set in {measure.unit} ({measure.column})")
+        for row in units:
+            print(f"    unknown unit {row['unit']!r}: {row['row_count']:,} rows left NULL")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
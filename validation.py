@@ -0,0 +1,324 @@
+"""
+Business rules of the land use and investment forms, checked on whole tables.
+
+add_land_use / update_land_use and add_investment / update_investment
+validate one country-year form at a time. The same rules are applied here
+to many rows at once: the rows are read as column arrays, pivoted to one
+row per (country, year) and every rule is a numpy expression over the
+pivot, so millions of rows take seconds. Used by /admin/data-quality and by
+the bulk loader on its staging tables (ingest.load).
+"""
+import pickle
+import threading
+import time
+
+import numpy as np
+
+from cache import MemoryBackend, result_cache
+from database import fetch_columns
+
+# Same tolerance as the forms (rounding of the entered values)
+TOLERANCE = 0.01
+
+# Violations listed per rule in a report (all of them are counted)
+SAMPLE_LIMIT = 200
+
+LAND_TYPES = [
+    "Country area", "Land area", "Inland waters", "Arable land",
+    "Permanent crops", "Permanent meadows and pastures", "Forest land",
+]
+AGRI_FOREST_TYPES = LAND_TYPES[3:]
+
+EXPENDITURE_TYPES = [
+    "Total Expenditure (general government)",
+    "Agriculture, forestry, fishing (general government expenditure)",
+    "Environmental protection (general government expenditure)",
+    "Protection of Biodiversity and Landscape (general government expenditure)",
+    "R&D Environmental Protection (general government expenditure)",
+]
+SECTOR_TYPES = EXPENDITURE_TYPES[1:]
+
+RULES = {
+    "land_use": {
+        "missing_key": "Rows have a country and a year",
+        "negative_value": "Values must be >= 0",
+        "mixed_units": "All land types of a country-year use the same unit",
+        "country_area": "Country area = Land area + Inland waters",
+        "agri_forest_exceeds_land": "Arable + Permanent crops + Meadows & pastures + Forest land <= Land area",
+    },
+    "investments": {
+        "missing_key": "Rows have a country and a year",
+        "negative_value": "Values must be >= 0",
+        "mixed_units": "All expenditure types of a country-year use the same unit",
+        "sectors_exceed_total": "Sectoral expenditures <= Total expenditure",
+    },
+}
+
+# (row reference, country, year, type, unit, value) of each table; a staging
+# table of the bulk loader has the same columns but no reference
+TABLE_QUERIES = {
+    "land_use": """
+        SELECT {row_id} AS row_id, country_id, year, land_type AS kind, unit, land_usage_value AS value
+        FROM {source}
+    """,
+    "investments": """
+        SELECT {row_id} AS row_id, country_id, year, expenditure_type AS kind, unit, expenditure_value AS value
+        FROM {source}
+    """,
+}
+
+
+def _split_missing_keys(columns):
+    """
+    (columns of the rows with a country and a year, the other rows as dicts):
+    a NULL key cannot be grouped, those rows are only reported
+    """
+    keys = list(zip(columns["country_id"], columns["year"]))
+    missing = [i for i, (country, year) in enumerate(keys) if country is None or year is None]
+    if not missing:
+        return columns, []
+    skipped = set(missing)
+    kept = {name: [v for i, v in enumerate(values) if i not in skipped] for name, values in columns.items()}
+    rows = [{name: values[i] for name, values in columns.items()} for i in missing]
+    return kept, rows
+
+
+class Batch:
+    """Rows of one table as numpy columns, grouped by (country, year)"""
+
+    def __init__(self, columns, kinds):
+        count = len(columns["country_id"])
+        self.row_count = count
+        self.row_id = np.array(columns.get("row_id") or [None] * count, dtype=object)
+        self.country = np.array(columns["country_id"], dtype=np.int64)
+        self.year = np.array(columns["year"], dtype=np.int64)
+        self.value = np.array(columns["value"], dtype=float)  # None -> NaN
+
+        # (country, year) as one integer key: 1-d unique is much faster than rows
+        keys, self.group = np.unique(self.country * 10000 + self.year, return_inverse=True)
+        self.group = self.group.ravel()
+        self.groups = np.stack([keys // 10000, keys % 10000], axis=1)
+
+        # Type of every row as a column index of the pivot (-1: not one of kinds)
+        index = {kind: i for i, kind in enumerate(kinds)}
+        self.kind = np.fromiter((index.get(kind, -1) for kind in columns["kind"]), dtype=np.int64, count=count)
+        self.kinds = kinds
+
+        # One column per type, NaN where a country-year has no such row
+        self.pivot = np.full((len(self.groups), len(kinds)), np.nan)
+        known = self.kind >= 0
+        self.pivot[self.group[known], self.kind[known]] = self.value[known]
+
+        units = {}
+        unit = np.fromiter((units.setdefault(u, len(units)) for u in columns["unit"]), dtype=np.int64, count=count)
+        pairs = np.unique(self.group * (len(units) + 1) + unit)
+        self.mixed_units = np.bincount(pairs // (len(units) + 1), minlength=len(self.groups)) > 1
+
+        self._order = np.argsort(self.group, kind="stable")
+        self._starts = np.searchsorted(self.group[self._order], np.arange(len(self.groups) + 1))
+
+    def column(self, kind):
+        return self.pivot[:, self.kinds.index(kind)]
+
+    def rows(self, group):
+        """Row indices of a country-year"""
+        return self._order[self._starts[group]:self._starts[group + 1]]
+
+    def row_ids(self, group):
+        return [row_id for row_id in self.row_id[self.rows(group)].tolist() if row_id is not None]
+
+
+class Report:
+    """Violation counts and samples of one table"""
+
+    def __init__(self, table, batch, missing_keys=()):
+        self.table = table
+        self.batch = batch
+        self.rules = {}
+        self.missing_keys = missing_keys
+        self._add_missing_keys()
+
+    def _add_missing_keys(self):
+        self.rules["missing_key"] = {
+            "description": RULES[self.table]["missing_key"],
+            "count": len(self.missing_keys),
+            "samples": [
+                {
+                    "country_id": row["country_id"],
+                    "year": row["year"],
+                    "detail": f"{row['kind']}: no " + " and no ".join(
+                        key for key in ("country_id", "year") if row[key] is None),
+                    "row_ids": [row["row_id"]] if row.get("row_id") is not None else [],
+                }
+                for row in self.missing_keys[:SAMPLE_LIMIT]
+            ],
+        }
+
+    def add(self, rule, groups, detail):
+        """groups: indices of the violating country-years, detail(group) -> text"""
+        groups = np.unique(groups)
+        self.rules[rule] = {
+            "description": RULES[self.table][rule],
+            "count": int(len(groups)),
+            "samples": [
+                {
+                    "country_id": int(self.batch.groups[g][0]),
+                    "year": int(self.batch.groups[g][1]),
+                    "detail": detail(g),
+                    "row_ids": self.batch.row_ids(g),
+                }
+                for g in groups[:SAMPLE_LIMIT].tolist()
+            ],
+        }
+
+    def as_dict(self, seconds):
+        return {
+            "table": self.table,
+            "rows": self.batch.row_count + len(self.missing_keys),
+            "groups": len(self.batch.groups),
+            "violations": sum(rule["count"] for rule in self.rules.values()),
+            "seconds": round(seconds, 3),
+            "rules": self.rules,
+        }
+
+
+def _fmt(value):
+    return "-" if np.isnan(value) else f"{value:,.2f}"
+
+
+def _negative(report, batch):
+    groups = batch.group[batch.value < 0]
+    report.add("negative_value", groups, lambda g: "; ".join(
+        f"{batch.kinds[batch.kind[row]] if batch.kind[row] >= 0 else 'other'}: {_fmt(batch.value[row])}"
+        for row in batch.rows(g) if batch.value[row] < 0
+    ))
+
+
+def _mixed_units(report, batch):
+    report.add("mixed_units", np.flatnonzero(batch.mixed_units), lambda g: "different units in one country-year")
+
+
+def check_land_use(columns):
+    """Violation report of land use rows given as columns (see TABLE_QUERIES)"""
+    started = time.perf_counter()
+    columns, missing_keys = _split_missing_keys(columns)
+    batch = Batch(columns, LAND_TYPES)
+    report = Report("land_use", batch, missing_keys)
+    _negative(report, batch)
+    _mixed_units(report, batch)
+
+    country, land, water = batch.column("Country area"), batch.column("Land area"), batch.column("Inland waters")
+    with np.errstate(invalid="ignore"):
+        mismatch = np.abs(country - (land + water)) > TOLERANCE
+    mismatch &= ~batch.mixed_units
+    report.add("country_area", np.flatnonzero(mismatch), lambda g: (
+        f"Country area {_fmt(country[g])} != Land area {_fmt(land[g])} + Inland waters {_fmt(water[g])}"
+    ))
+
+    parts = np.stack([batch.column(kind) for kind in AGRI_FOREST_TYPES], axis=1)
+    has_parts = ~np.isnan(parts).all(axis=1)
+    total = np.nansum(parts, axis=1)
+    with np.errstate(invalid="ignore"):
+        exceeds = has_parts & (total > land + TOLERANCE) & ~batch.mixed_units
+    report.add("agri_forest_exceeds_land", np.flatnonzero(exceeds), lambda g: (
+        f"Agricultural + forest land {_fmt(total[g])} > Land area {_fmt(land[g])}"
+    ))
+    return report.as_dict(time.perf_counter() - started)
+
+
+def check_investments(columns):
+    """Violation report of investment rows given as columns (see TABLE_QUERIES)"""
+    started = time.perf_counter()
+    columns, missing_keys = _split_missing_keys(columns)
+    batch = Batch(columns, EXPENDITURE_TYPES)
+    report = Report("investments", batch, missing_keys)
+    _negative(report, batch)
+    _mixed_units(report, batch)
+
+    total = batch.column(EXPENDITURE_TYPES[0])
+    sectors = np.stack([batch.column(kind) for kind in SECTOR_TYPES], axis=1)
+    has_sectors = ~np.isnan(sectors).all(axis=1)
+    sectoral = np.nansum(sectors, axis=1)
+    with np.errstate(invalid="ignore"):
+        exceeds = has_sectors & (sectoral > total + TOLERANCE) & ~batch.mixed_units
+    report.add("sectors_exceed_total", np.flatnonzero(exceeds), lambda g: (
+        f"Sectoral expenditures {_fmt(sectoral[g])} > Total expenditure {_fmt(total[g])}"
+    ))
+    return report.as_dict(time.perf_counter() - started)
+
+
+CHECKS = {"land_use": check_land_use, "investments": check_investments}
+
+
+def check_table(table):
+    """Violation report of a whole table, None if it could not be read"""
+    columns = fetch_columns(TABLE_QUERIES[table].format(row_id="unique_id", source=table))
+    if columns is None:
+        return None
+    return CHECKS[table](columns)
+
+
+def check_staging(cursor, table, staging):
+    """Violation report of a staging table, read through the loader's cursor (uncommitted rows)"""
+    cursor.execute(TABLE_QUERIES[table].format(row_id="NULL", source=staging))
+    names = [column[0] for column in cursor.description]
+    rows = cursor.fetchall()
+    columns = {name: list(values) for name, values in zip(names, zip(*rows))} if rows else {n: [] for n in names}
+    return CHECKS[table](columns)
+
+
+# ==================== /admin/data-quality JOB ====================
+# The last report is kept in the result cache backend (shared by the
+# workers with disk / redis), the running flag only in this process.
+
+_REPORT_KEY = "data-quality-report"
+_REPORT_TTL = 30 * 24 * 3600
+_store = result_cache.backend or MemoryBackend(8 * 1024 * 1024)
+_job_lock = threading.Lock()
+_job_running = False
+
+
+def run_data_quality():
+    """Checks every table and stores the report"""
+    started = time.perf_counter()
+    report = {"checked_at": time.strftime("%Y-%m-%d %H:%M:%S"), "tables": {}}
+    for table in CHECKS:
+        result = check_table(table)
+        report["tables"][table] = result if result is not None else {"table": table, "error": "could not be read"}
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    try:
+        _store.set(_REPORT_KEY, pickle.dumps(report), _REPORT_TTL)
+    except Exception as e:
+        print(f"Data quality report store error: {e}")
+    return report
+
+
+def start_data_quality_job():
+    """Runs run_data_quality in a background thread, False if one is already running"""
+    global _job_running
+    with _job_lock:
+        if _job_running:
+            return False
+        _job_running = True
+
+    def run():
+        global _job_running
+        try:
+            run_data_quality()
+        except Exception as e:
+            print(f"Data quality job error: {e}")
+        finally:
+            _job_running = False
+
+    threading.Thread(target=run, name="data-quality", daemon=True).start()
+    return True
+
+
+def data_quality_status():
+    """{"running": bool, "report": last stored report or None}"""
+    try:
+        value = _store.get(_REPORT_KEY)
+    except Exception as e:
+        print(f"Data quality report read error: {e}")
+        value = None
+    return {"running": _job_running, "report": pickle.loads(value) if value is not None else None}